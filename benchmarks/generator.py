@@ -0,0 +1,161 @@
+import os
+import random
+import struct
+import zlib
+from typing import BinaryIO, Literal, Tuple
+
+from pydantic import BaseModel
+
+LFH_STRUCT = struct.Struct('<IHHHHHIIIHH')
+CD_STRUCT = struct.Struct('<IHHHHHHIIIHHHHHII')
+EOCD_STRUCT = struct.Struct('<IHHHHIIH')
+ZIP64_EOCD_STRUCT = struct.Struct('<IQHHIIQQQQ')
+ZIP64_LOCATOR_STRUCT = struct.Struct('<IIQI')
+
+USE_DATA_DESCRIPTOR = 0x08
+UTF8_NAMES = 0x800
+ZIP64_PLACEHOLDER = 0xFFFFFFFF
+# Fixed timestamp (2024-01-01 00:00:00), so that archives are reproducible
+DOS_TIME, DOS_DATE = 0, (2024 - 1980) << 9 | 1 << 5 | 1
+
+# Pool of bytes bodies are sliced from, generating each body on its own is too slow for millions of entries
+POOL_SIZE = 4 * 1024 * 1024
+WORDS = b"lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor incididunt ut labore".split()
+
+
+class ArchiveSpec(BaseModel):
+    """
+    Shape of a synthetic archive, the same spec always produces the same bytes.
+    Bodies are 'random' (incompressible) or 'text' (compressible) data of a size between 'min_body' and 'max_body'.
+    With 'zip64' every record uses the Zip64 extra field and the Zip64 EOCD is written, even when not needed.
+    """
+
+    entries: int
+    min_body: int = 0
+    max_body: int = 1024
+    content: Literal['random', 'text'] = 'random'
+    compression: Literal['stored', 'deflated'] = 'stored'
+    data_descriptor: bool = False
+    encoding: Literal['utf-8', 'cp437'] = 'utf-8'
+    entry_comment: int = 0
+    archive_comment: int = 0
+    zip64: bool = False
+    seed: int = 0
+
+    @property
+    def name(self) -> str:
+        """ Deterministic file name of the archive, i.e., to cache generated archives """
+        fields = "-".join(f"{key}={value}" for key, value in self.model_dump().items())
+        return f"{self.entries}-{zlib.crc32(fields.encode()):08x}.zip"
+
+
+
+def entry_name(spec: ArchiveSpec, index: int) -> str:
+    # Non-ASCII names, either in UTF-8 (flagged) or in the legacy CP437 code page
+    if spec.encoding == 'utf-8':
+        return f"dossier-{index % 97:02d}/données_{index}_測試.bin"
+    return f"dossier-{index % 97:02d}/données_{index}_ü.bin"
+
+
+def make_pool(spec: ArchiveSpec) -> bytes:
+    rng = random.Random(spec.seed)
+    if spec.content == 'random':
+        return rng.randbytes(POOL_SIZE)
+    text = b" ".join(rng.choice(WORDS) for _ in range(POOL_SIZE // 5))
+    return text[:POOL_SIZE]
+
+
+def make_body(spec: ArchiveSpec, rng: random.Random, pool: bytes) -> bytes:
+    size = rng.randint(spec.min_body, spec.max_body)
+    if size >= len(pool):
+        return (pool * (size // len(pool) + 1))[:size]
+    start = rng.randrange(0, len(pool) - size + 1)
+    return pool[start:start + size]
+
+
+def compress(spec: ArchiveSpec, body: bytes) -> Tuple[int, bytes]:
+    if spec.compression == 'stored':
+        return 0, body
+    compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+    return 8, compressor.compress(body) + compressor.flush()
+
+
+def write_archive(spec: ArchiveSpec, file: BinaryIO) -> int:
+    """ Write the archive described by 'spec' inside 'file', return its size """
+    rng = random.Random(spec.seed)
+    pool = make_pool(spec)
+    flags = (USE_DATA_DESCRIPTOR if spec.data_descriptor else 0) | (UTF8_NAMES if spec.encoding == 'utf-8' else 0)
+    version = 45 if spec.zip64 else 20
+
+    central_dir = bytearray()
+    offset = 0
+    for index in range(spec.entries):
+        name = entry_name(spec, index).encode(spec.encoding)
+        body = make_body(spec, rng, pool)
+        method, data = compress(spec, body)
+        crc, csize, usize = zlib.crc32(body), len(data), len(body)
+
+        # Local file header, sizes and CRC are deferred to the data descriptor if any
+        lfh_crc, lfh_csize, lfh_usize = (0, 0, 0) if spec.data_descriptor else (crc, csize, usize)
+        extra = b''
+        if spec.zip64:
+            extra = struct.pack('<HHQQ', 0x0001, 16, lfh_usize, lfh_csize)
+            lfh_csize = lfh_usize = ZIP64_PLACEHOLDER
+        file.write(LFH_STRUCT.pack(
+            0x04034b50, version, flags, method, DOS_TIME, DOS_DATE, lfh_crc, lfh_csize, lfh_usize, len(name), len(extra)
+        ))
+        file.write(name)
+        file.write(extra)
+        file.write(data)
+        written = LFH_STRUCT.size + len(name) + len(extra) + len(data)
+
+        if spec.data_descriptor:
+            size_format = '<QQ' if spec.zip64 else '<II'
+            descriptor = struct.pack('<II', 0x08074b50, crc) + struct.pack(size_format, csize, usize)
+            file.write(descriptor)
+            written += len(descriptor)
+
+        # Central directory record, kept in memory until all the bodies are written
+        comment = (WORDS[index % len(WORDS)] * spec.entry_comment)[:spec.entry_comment]
+        cd_csize, cd_usize, cd_offset, extra = csize, usize, offset, b''
+        if spec.zip64:
+            extra = struct.pack('<HHQQQ', 0x0001, 24, usize, csize, offset)
+            cd_csize = cd_usize = cd_offset = ZIP64_PLACEHOLDER
+        central_dir += CD_STRUCT.pack(
+            0x02014b50, version, version, flags, method, DOS_TIME, DOS_DATE, crc, cd_csize, cd_usize,
+            len(name), len(extra), len(comment), 0, 0, 0, cd_offset
+        )
+        central_dir += name + extra + comment
+        offset += written
+
+    cd_offset = offset
+    file.write(central_dir)
+    offset += len(central_dir)
+
+    entries, cd_size, cd_start = spec.entries, len(central_dir), cd_offset
+    if spec.zip64 or entries >= 0xFFFF or cd_offset >= ZIP64_PLACEHOLDER:
+        file.write(ZIP64_EOCD_STRUCT.pack(
+            0x06064b50, ZIP64_EOCD_STRUCT.size - 12, 45, 45, 0, 0, entries, entries, cd_size, cd_offset
+        ))
+        file.write(ZIP64_LOCATOR_STRUCT.pack(0x07064b50, 0, offset, 1))
+        offset += ZIP64_EOCD_STRUCT.size + ZIP64_LOCATOR_STRUCT.size
+        entries, cd_size, cd_start = 0xFFFF, ZIP64_PLACEHOLDER, ZIP64_PLACEHOLDER
+
+    comment = (b"synthetic archive " * (spec.archive_comment // 18 + 1))[:spec.archive_comment]
+    file.write(EOCD_STRUCT.pack(0x06054b50, 0, 0, entries, entries, cd_size, cd_start, len(comment)))
+    file.write(comment)
+    return offset + EOCD_STRUCT.size + len(comment)
+
+
+def generate(spec: ArchiveSpec, directory: str) -> str:
+    """ Return the path of the archive described by 'spec' inside 'directory', generating it if missing """
+    path = os.path.join(directory, spec.name)
+    if os.path.exists(path):
+        return path
+
+    os.makedirs(directory, exist_ok=True)
+    partial = path + ".partial"
+    with open(partial, "wb", buffering=1024 * 1024) as f:
+        write_archive(spec, f)
+    os.replace(partial, path)
+    return path
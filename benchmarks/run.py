@@ -0,0 +1,282 @@
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+from benchmarks.generator import ArchiveSpec, generate
+
+import logging
+LOGGER = logging.getLogger("zipstruct")
+
+DEFAULT_DATA_DIR = os.path.join(tempfile.gettempdir(), "zipstruct-benchmarks")
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+# A case is a regression when it is slower (or uses more memory) than the baseline by more than this ratio
+DEFAULT_TOLERANCE = 0.25
+
+MB = 1024 * 1024
+
+ARCHIVES = {
+    'tiny'     : ArchiveSpec(entries=1),
+    '2k'       : ArchiveSpec(entries=2_000, max_body=4096),
+    '10k'      : ArchiveSpec(entries=10_000, max_body=4096),
+    # Deflated text bodies with data descriptors, as written by most streaming writers
+    '10k-dd'   : ArchiveSpec(
+        entries=10_000, max_body=4096, data_descriptor=True, compression='deflated', content='text'
+    ),
+    # Zip64 extra fields on every record, CP437 names and per-entry comments
+    '10k-zip64': ArchiveSpec(entries=10_000, max_body=4096, zip64=True, encoding='cp437', entry_comment=16),
+    '100k'     : ArchiveSpec(entries=100_000, max_body=256),
+    '1m'       : ArchiveSpec(entries=1_000_000, max_body=64),
+    # Longest archive comment, the EOCD search has to scan the whole tail
+    'comment'  : ArchiveSpec(entries=10, archive_comment=0xFFFF),
+    'big'      : ArchiveSpec(entries=64, min_body=MB, max_body=4 * MB),
+}
+
+
+class BenchmarkCase(BaseModel):
+    benchmark: str
+    archive: str
+    options: Dict = {}
+    repeat: int = 3
+
+    @property
+    def name(self) -> str:
+        options = ",".join(f"{key}={value}" for key, value in sorted(self.options.items()))
+        return f"{self.benchmark}/{self.archive}" + (f"/{options}" if options else "")
+
+
+
+class BenchmarkResult(BaseModel):
+    """ Measures of a case: best and mean wall time of the repetitions, peak RSS and read syscalls per repetition """
+
+    name: str
+    entries: int
+    archive_bytes: int
+    seconds: float
+    mean_seconds: float
+    entries_per_second: float
+    mb_per_second: float
+    peak_rss_mb: float
+    read_syscalls: Optional[int] = None
+    read_bytes: Optional[int] = None
+
+
+
+def _quick_cases() -> List[BenchmarkCase]:
+    cases = []
+    for archive in ('tiny', '10k', '10k-dd', '10k-zip64'):
+        for validation in ('full', 'off'):
+            cases.append(BenchmarkCase(benchmark='load', archive=archive, options={'validation': validation}))
+        cases.append(BenchmarkCase(benchmark='load', archive=archive, options={'lazy': True, 'validation': 'off'}))
+        cases.append(BenchmarkCase(benchmark='load', archive=archive, options={'backend': 'mmap'}))
+        cases.append(BenchmarkCase(benchmark='hash', archive=archive))
+    for mode in ('linear', 'tree'):
+        cases.append(BenchmarkCase(benchmark='hash', archive='big', options={'mode': mode}))
+    # Deflated bodies, so that decompression is measured too
+    cases.append(BenchmarkCase(benchmark='hash', archive='10k-dd', options={'mode': 'content'}))
+    cases.append(BenchmarkCase(benchmark='compare', archive='2k'))
+    cases.append(BenchmarkCase(benchmark='eocd', archive='10k', options={'calls': 1000}))
+    cases.append(BenchmarkCase(benchmark='eocd', archive='comment', options={'calls': 1000}))
+    return cases
+
+
+def _full_cases() -> List[BenchmarkCase]:
+    cases = _quick_cases()
+    cases.append(BenchmarkCase(benchmark='compare', archive='10k', repeat=1))
+    for archive in ('100k', '1m'):
+        for validation in ('full', 'off'):
+            cases.append(BenchmarkCase(benchmark='load', archive=archive, options={'validation': validation}, repeat=1))
+        cases.append(BenchmarkCase(benchmark='hash', archive=archive, repeat=1))
+    return cases
+
+
+SUITES: Dict[str, Callable[[], List[BenchmarkCase]]] = {'quick': _quick_cases, 'full': _full_cases}
+
+
+def appended_spec(spec: ArchiveSpec) -> ArchiveSpec:
+    """ Same archive with one more entry at the end, its first entries are identical to the ones of 'spec' """
+    return spec.model_copy(update={'entries': spec.entries + 1})
+
+
+def prepare(case: BenchmarkCase, data_dir: str) -> Tuple[str, ...]:
+    """ Generate the archives needed by 'case', return their paths """
+    spec = ARCHIVES[case.archive]
+    paths = (generate(spec, data_dir),)
+    if case.benchmark == 'compare':
+        paths += (generate(appended_spec(spec), data_dir),)
+    return paths
+
+
+def _setup(case: BenchmarkCase, paths: Tuple[str, ...]) -> Callable[[], None]:
+    """ Return the function measured by 'case', anything not part of the measure is done here """
+    from src.zipstruct.utils.zipentry import ParsedZip
+    from src.ziphash.extract import compute_zip_hash
+    from src.zipstruct.eocd.parsing import search_eocd_signature
+    from src.zipstruct.utils.sources import open_source
+    # Importing the parsers resets the level of the logger, see 'localheaders.lfh'
+    LOGGER.setLevel(logging.ERROR)
+
+    options = dict(case.options)
+    if case.benchmark == 'load':
+        return lambda: ParsedZip.load(paths[0], **options)
+    if case.benchmark == 'hash':
+        pz = ParsedZip.load(paths[0], validation='off')
+        return lambda: compute_zip_hash(pz, validation='off', **options)
+    if case.benchmark == 'compare':
+        old, new = ParsedZip.load(paths[0], validation='off'), ParsedZip.load(paths[1], validation='off')
+
+        def compare():
+            # Differences are printed, they are not part of the measure
+            with contextlib.redirect_stdout(io.StringIO()):
+                old.compare(new)
+        return compare
+    if case.benchmark == 'eocd':
+        calls = options.pop('calls', 1)
+
+        def search():
+            with open_source(paths[0], **options) as source:
+                for _ in range(calls):
+                    search_eocd_signature(source)
+        return search
+    raise ValueError(f"Unknown benchmark '{case.benchmark}'")
+
+
+def read_proc_io() -> Optional[Dict[str, int]]:
+    """ I/O counters of this process (Linux only), 'syscr' is the amount of read syscalls """
+    try:
+        with open("/proc/self/io") as f:
+            return {key: int(value) for key, value in (line.split(":") for line in f)}
+    except OSError:
+        return None
+
+
+def run_case(case: BenchmarkCase, paths: Tuple[str, ...]) -> BenchmarkResult:
+    """ Measure 'case', it should run in a fresh process so that the peak RSS is the one of this case only """
+    func = _setup(case, paths)
+
+    before = read_proc_io()
+    times = []
+    for _ in range(case.repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    after = read_proc_io()
+
+    spec = ARCHIVES[case.archive]
+    archive_bytes = os.path.getsize(paths[0])
+    best = min(times)
+    # Kilobytes on Linux, bytes on macOS
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (MB if sys.platform == 'darwin' else 1024)
+    result = BenchmarkResult(
+        name               = case.name,
+        entries            = spec.entries,
+        archive_bytes      = archive_bytes,
+        seconds            = best,
+        mean_seconds       = statistics.mean(times),
+        entries_per_second = spec.entries / best if best else 0.0,
+        mb_per_second      = archive_bytes / MB / best if best else 0.0,
+        peak_rss_mb        = peak_rss,
+    )
+    if before is not None and after is not None:
+        result.read_syscalls = (after['syscr'] - before['syscr']) // case.repeat
+        result.read_bytes = (after['rchar'] - before['rchar']) // case.repeat
+    return result
+
+
+def run_suite(cases: List[BenchmarkCase], data_dir: str) -> List[BenchmarkResult]:
+    results = []
+    context = multiprocessing.get_context("spawn")
+    for case in cases:
+        paths = prepare(case, data_dir)
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            result = pool.submit(run_case, case, paths).result()
+        print(format_result(result), flush=True)
+        results.append(result)
+    return results
+
+
+def format_result(
+        result: BenchmarkResult, baseline: Optional[Dict] = None, tolerance: float = DEFAULT_TOLERANCE
+) -> str:
+    line = (f"{result.name:<52}{result.seconds:>10.4f}s{result.entries_per_second:>14.0f} entries/s"
+            f"{result.mb_per_second:>10.1f} MB/s{result.peak_rss_mb:>9.1f} MB RSS"
+            f"{result.read_syscalls if result.read_syscalls is not None else '-':>9} reads")
+    if baseline is None:
+        return line
+    ratio = result.seconds / baseline['seconds'] if baseline['seconds'] else 1.0
+    rss_ratio = result.peak_rss_mb / baseline['peak_rss_mb'] if baseline['peak_rss_mb'] else 1.0
+    regression = ratio > 1 + tolerance or rss_ratio > 1 + tolerance
+    return line + f"  x{ratio:.2f} time, x{rss_ratio:.2f} RSS" + ("  REGRESSION" if regression else "")
+
+
+def compare_with_baseline(results: List[BenchmarkResult], baseline_path: str, tolerance: float) -> int:
+    """ Print each result next to its baseline, return the amount of regressions """
+    with open(baseline_path) as f:
+        baseline = {item['name']: item for item in json.load(f)['results']}
+
+    regressions = 0
+    print(f"\nCompared with '{baseline_path}' (tolerance {tolerance:.0%}):")
+    for result in results:
+        if result.name not in baseline:
+            print(f"{result.name:<52} not in the baseline")
+            continue
+        line = format_result(result, baseline[result.name], tolerance)
+        regressions += line.endswith("REGRESSION")
+        print(line)
+    return regressions
+
+
+def save_results(results: List[BenchmarkResult], path: str, suite: str):
+    report = {
+        'suite'   : suite,
+        'created' : time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'python'  : platform.python_version(),
+        'platform': platform.platform(),
+        'results' : [result.model_dump() for result in results],
+    }
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+        f.write("\n")
+
+
+def create_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run", description="Run the zipstruct benchmarks")
+    parser.add_argument("--suite", choices=sorted(SUITES), default='quick', help="'full' adds 100k and 1M entries")
+    parser.add_argument("--filter", default=None, help="only run cases whose name contains this string")
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR, help="where generated archives are cached")
+    parser.add_argument("--output", default=None, help="save the results as JSON")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="JSON results to compare with")
+    parser.add_argument("--save-baseline", action="store_true", help="overwrite the baseline with these results")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    return parser
+
+
+def main(argv=None) -> int:
+    args = create_parser().parse_args(argv)
+    cases = [case for case in SUITES[args.suite]() if args.filter is None or args.filter in case.name]
+    results = run_suite(cases, args.data_dir)
+
+    if args.output is not None:
+        save_results(results, args.output, args.suite)
+    if args.save_baseline:
+        save_results(results, args.baseline, args.suite)
+        return 0
+    if os.path.exists(args.baseline):
+        return 1 if compare_with_baseline(results, args.baseline, args.tolerance) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,13 @@
-import hashlib
+import argparse
 import os.path
+import sys
+from concurrent.futures import ThreadPoolExecutor
 
-from src.ziphash.extract import extract_from_eocd, extract_from_central_directory, extract_from_lfh, extract_from_dd, \
-    compute_zip_hash
+from src.ziphash.batch import BatchStats, hash_archives, iter_archive_paths, DEFAULT_BATCH_SIZE
+from src.ziphash.extract import HASH_MODES
+from src.zipstruct.utils.diff import RECORD_TYPES
+from src.zipstruct.utils.sources import BACKENDS
+from src.zipstruct.utils.state import VALIDATION_LEVELS
 from src.zipstruct.utils.zipentry import ParsedZip
 import zipfile
 import shutil
@@ -26,27 +31,83 @@ def append_to_zip():
         zf.write(second_file, '__keb_manifest.c2pa')
 
 
-if __name__ == "__main__":
-    # append_to_zip()
-    # exit()
+def hash_command(args: argparse.Namespace) -> int:
+    """ Print one JSON line per archive (in input order), then the throughput stats on stderr """
+    stats = BatchStats()
+    results = hash_archives(
+        iter_archive_paths(args.paths, pattern=args.pattern),
+        jobs         = args.jobs,
+        has_manifest = args.has_manifest,
+        batch_size   = args.batch_size,
+        stats        = stats,
+        mode         = args.mode,
+        backend      = args.backend,
+        validation   = args.validation,
+    )
+    for result in results:
+        print(result.model_dump_json(exclude_none=True), flush=True)
+    print(stats, file=sys.stderr)
+    return 1 if stats.failed else 0
 
-    LOGGER.setLevel(logging.INFO)
-    path = "/home/kebula/Desktop/projects/ZipHashC2PA/data/inp/original_0.xlsx"
-    original_pz = ParsedZip.load(path)
 
-    path = "/home/kebula/Desktop/projects/ZipHashC2PA/data/tmp/appended.zip"
-    appended_pz = ParsedZip.load(path)
+def zipdiff_command(args: argparse.Namespace) -> int:
+    """ Print the structural diff of two archives, exit with 1 if they differ (like 'diff') """
+    def load(path: str) -> ParsedZip:
+        return ParsedZip.load(path, backend=args.backend, validation=args.validation)
+
+    # Both archives are parsed at the same time, which overlaps their I/O (i.e., remote archives)
+    with ThreadPoolExecutor(max_workers=2, thread_name_prefix="zipdiff") as pool:
+        old, new = pool.map(load, (args.old, args.new))
+
+    records = set(args.record) if args.record else None
+    diff = old.diff(new)
+    if args.pattern is not None or records is not None:
+        diff = diff.filter(pattern=args.pattern, records=records)
+
+    if args.json:
+        print(diff.to_json(indent=args.indent))
+    else:
+        print(diff)
+    return 0 if diff.is_identical else 1
 
-    # original_pz.compare(appended_pz)
-    # appended_pz.compare(original_pz)
-    # LOGGER.info(original_pz.parsing_state)
-    # LOGGER.info(appended_pz.parsing_state)
 
-    original_hexdigest, state = compute_zip_hash(original_pz, has_manifest=False)
-    print(state)
-    appended_hexdigest, state = compute_zip_hash(appended_pz, has_manifest=True)
-    print(state)
+def create_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="zipstruct")
+    parser.add_argument("-v", "--verbose", action="store_true", help="log parsing details on stderr")
+    commands = parser.add_subparsers(dest="command", required=True)
 
-    print(f"Original: {original_hexdigest}")
-    print(f"Modified: {appended_hexdigest}")
+    hash_parser = commands.add_parser("hash", help="hash many archives on a pool of processes")
+    hash_parser.add_argument("paths", nargs="+", metavar="PATH", help="archives or directories to walk")
+    hash_parser.add_argument("-j", "--jobs", type=int, default=None, help="worker processes (default: all CPUs)")
+    hash_parser.add_argument("--pattern", default=None, help="only hash files matching this glob inside directories")
+    hash_parser.add_argument("--has-manifest", action="store_true", help="archives have a manifest appended")
+    hash_parser.add_argument("--mode", choices=HASH_MODES, default='linear')
+    hash_parser.add_argument("--backend", choices=sorted(BACKENDS), default='file')
+    hash_parser.add_argument("--validation", choices=VALIDATION_LEVELS, default='off')
+    hash_parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="paths per worker task")
+    hash_parser.set_defaults(func=hash_command)
 
+    diff_parser = commands.add_parser("zipdiff", help="structural diff of two archives (records, fields and layout)")
+    diff_parser.add_argument("old", metavar="OLD", help="original archive (an URL with --backend http)")
+    diff_parser.add_argument("new", metavar="NEW", help="modified archive (an URL with --backend http)")
+    diff_parser.add_argument("--pattern", default=None, help="only show entries whose name matches this glob")
+    diff_parser.add_argument(
+        "--record", action="append", choices=RECORD_TYPES, default=None,
+        help="only show differences of this record type, can be repeated"
+    )
+    diff_parser.add_argument("--json", action="store_true", help="print the diff as JSON")
+    diff_parser.add_argument("--indent", type=int, default=None, help="indentation of the JSON output")
+    diff_parser.add_argument("--backend", choices=sorted(BACKENDS), default='file')
+    diff_parser.add_argument("--validation", choices=VALIDATION_LEVELS, default='off')
+    diff_parser.set_defaults(func=zipdiff_command)
+    return parser
+
+
+def main(argv=None) -> int:
+    args = create_parser().parse_args(argv)
+    LOGGER.setLevel(logging.DEBUG if args.verbose else logging.WARNING)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
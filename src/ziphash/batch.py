@@ -0,0 +1,185 @@
+import fnmatch
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Iterable, Iterator, List, Optional
+
+from pydantic import BaseModel
+
+from src.ziphash.extract import compute_zip_hash
+from src.zipstruct.utils.zipentry import ParsedZip
+
+import logging
+LOGGER = logging.getLogger("zipstruct")
+
+# Amount of paths sent to a worker at once, it amortizes the inter-process communication on small archives
+DEFAULT_BATCH_SIZE = 16
+
+
+class HashResult(BaseModel):
+    """ Outcome of hashing a single archive, 'digest' is None and 'error' is set when it failed """
+
+    path: str
+    digest: Optional[str] = None
+    entries: Optional[int] = None
+    size: int = 0
+    seconds: float = 0.0
+    error: Optional[str] = None
+
+
+
+class BatchStats(BaseModel):
+    files: int = 0
+    failed: int = 0
+    bytes: int = 0
+    seconds: float = 0.0
+
+    @property
+    def files_per_second(self) -> float:
+        return self.files / self.seconds if self.seconds else 0.0
+
+    @property
+    def mb_per_second(self) -> float:
+        return self.bytes / (1024 * 1024) / self.seconds if self.seconds else 0.0
+
+    def add(self, result: HashResult):
+        self.files += 1
+        self.bytes += result.size
+        if result.error is not None:
+            self.failed += 1
+
+    def __str__(self):
+        return (f"{self.files} files ({self.failed} failed), {self.bytes / (1024 * 1024):.2f} MB "
+                f"in {self.seconds:.2f}s: {self.files_per_second:.2f} files/s, {self.mb_per_second:.2f} MB/s")
+
+
+
+def iter_archive_paths(paths: Iterable[str], pattern: str = None) -> Iterator[str]:
+    """
+    Yield the passed file paths and, for each directory, all the files inside it (recursively and in a
+    deterministic order). If 'pattern' is set, files found inside directories must match it (i.e., '*.docx').
+    """
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                if pattern is None or fnmatch.fnmatch(name, pattern):
+                    yield os.path.join(root, name)
+
+
+def hash_archive(path: str, has_manifest: bool = False, **kwargs) -> HashResult:
+    """
+    Load and hash the archive at 'path', any error is reported inside the result instead of being raised.
+    'kwargs' are forwarded to 'ParsedZip.load' ('bulk', 'backend', 'validation') and 'compute_zip_hash'.
+    """
+    start = time.perf_counter()
+    load_kwargs = {key: kwargs.pop(key) for key in ('bulk', 'backend', 'validation') if key in kwargs}
+    result = HashResult(path=path)
+    # With the 'http' backend 'path' is an URL, its size is known only once the EOCD has been loaded
+    remote = load_kwargs.get('backend') == 'http'
+    try:
+        if not remote:
+            result.size = os.path.getsize(path)
+        pz = ParsedZip.load(path, **load_kwargs)
+        if remote:
+            result.size = pz.eocd.interval.end
+        result.digest, _ = compute_zip_hash(pz, has_manifest=has_manifest, **kwargs)
+        result.entries = len(pz.entries)
+    except Exception as e:
+        result.error = f"{type(e).__name__}: {e}"
+    result.seconds = time.perf_counter() - start
+    return result
+
+
+def hash_archive_batch(paths: List[str], has_manifest: bool = False, **kwargs) -> List[HashResult]:
+    return [hash_archive(path, has_manifest, **dict(kwargs)) for path in paths]
+
+
+def _init_worker(level: int):
+    # Importing the parsers resets the level of the logger, see 'localheaders.lfh'
+    LOGGER.setLevel(level)
+
+
+def _create_pool(jobs: int) -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(LOGGER.level,))
+
+
+def _failed_result(path: str, error: BaseException) -> HashResult:
+    result = HashResult(path=path, error=f"{type(error).__name__}: {error}")
+    try:
+        result.size = os.path.getsize(path)
+    except OSError:
+        pass
+    return result
+
+
+def _hash_isolated(path: str, has_manifest: bool, **kwargs) -> HashResult:
+    """ Hash 'path' on a worker of its own, so that a crash is attributed to this archive only """
+    with _create_pool(1) as pool:
+        try:
+            return pool.submit(hash_archive_batch, [path], has_manifest, **kwargs).result()[0]
+        except Exception as e:
+            return _failed_result(path, e)
+
+
+def hash_archives(
+        paths: Iterable[str], jobs: int = None, has_manifest: bool = False, batch_size: int = DEFAULT_BATCH_SIZE,
+        stats: BatchStats = None, **kwargs
+) -> Iterator[HashResult]:
+    """
+    Hash many archives on a pool of 'jobs' processes, yielding the results in the same order of 'paths'.
+    Paths are consumed lazily and sent to the workers in batches of 'batch_size', at most a few batches per
+    worker are pending at any time, so that memory does not depend on the amount of archives.
+    A failure of an archive is reported inside its result (see 'HashResult.error') and does not stop the run,
+    even when it crashes its worker: the pool is then recreated, the lost batches are submitted again and the
+    paths of the failed one are retried each on a worker of its own, so that only the crashing archive fails.
+    If 'stats' is passed, it is updated while results are yielded.
+    """
+    jobs = jobs or os.cpu_count() or 1
+    start = time.perf_counter()
+    paths = iter(paths)
+
+    pool = _create_pool(jobs)
+    pending = deque()
+    exhausted = False
+    try:
+        while True:
+            # Keep the workers busy, without reading all the paths upfront
+            while not exhausted and len(pending) < jobs * 2:
+                batch = [path for _, path in zip(range(batch_size), paths)]
+                if not batch:
+                    exhausted = True
+                    break
+                pending.append((batch, pool.submit(hash_archive_batch, batch, has_manifest, **kwargs)))
+            if not pending:
+                break
+
+            batch, future = pending.popleft()
+            try:
+                results = future.result()
+            except Exception as e:
+                if isinstance(e, BrokenProcessPool):
+                    LOGGER.warning(f"A worker terminated abruptly while hashing {len(batch)} archive(s), "
+                                   f"restarting the pool")
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    pool = _create_pool(jobs)
+                    # Batches completed before the crash keep their results, the others are lost with the pool
+                    pending = deque(
+                        (other, done) if done.done() and done.exception() is None
+                        else (other, pool.submit(hash_archive_batch, other, has_manifest, **kwargs))
+                        for other, done in pending
+                    )
+                results = [_hash_isolated(path, has_manifest, **kwargs) for path in batch]
+
+            for result in results:
+                if stats is not None:
+                    stats.add(result)
+                    stats.seconds = time.perf_counter() - start
+                yield result
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
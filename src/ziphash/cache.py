@@ -0,0 +1,171 @@
+import json
+import os
+import sqlite3
+import time
+from typing import Optional, Tuple, NamedTuple
+
+from src.ziphash.extract import compute_zip_hash, HASH_ALGORITHM
+from src.zipstruct.eocd import parsing as eocd_parser
+from src.zipstruct.utils.sources import open_source
+from src.zipstruct.utils.zipentry import ParsedZip
+
+import logging
+LOGGER = logging.getLogger("zipstruct")
+
+CACHE_FILE_NAME = "digests.sqlite"
+DEFAULT_MAX_ENTRIES = 100_000
+# Bumped whenever the table changes, caches having another version are dropped
+SCHEMA_VERSION = 2
+KEY_COLUMNS = ('device', 'inode', 'size', 'mtime_ns', 'eocd', 'has_manifest', 'algorithm', 'validation')
+
+
+class FileIdentity(NamedTuple):
+    """ Everything that identifies a version of an archive without reading its content """
+    device: int
+    inode: int
+    size: int
+    mtime_ns: int
+    eocd: bytes
+
+
+def file_identity(path: str) -> FileIdentity:
+    """ Identity of the archive at 'path', it costs one 'stat' plus a few small reads of the tail of the file """
+    stat = os.stat(path)
+    with open_source(path) as source:
+        eocd = eocd_parser.find_eocd(source)[1]
+    return FileIdentity(stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns, eocd)
+
+
+
+class DigestCache:
+    """
+    Persistent cache of the digests computed by 'compute_zip_hash', stored in a SQLite database inside 'directory'.
+
+    Entries are keyed by the identity of the file (see 'FileIdentity'), by 'has_manifest', by the algorithm
+    (hash function and mode) and by the validation level (the coverage depends on it), so a modified archive
+    never hits a stale entry. When more than 'max_entries' digests are stored, the least recently used ones
+    are evicted.
+    """
+
+    def __init__(self, directory: str, max_entries: int = DEFAULT_MAX_ENTRIES):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, CACHE_FILE_NAME)
+        self.max_entries = max_entries
+        self.connection = sqlite3.connect(self.path, timeout=30)
+        with self.connection:
+            if self.connection.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                self.connection.execute("DROP TABLE IF EXISTS digests")
+                self.connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS digests (
+                    device       INTEGER NOT NULL,
+                    inode        INTEGER NOT NULL,
+                    size         INTEGER NOT NULL,
+                    mtime_ns     INTEGER NOT NULL,
+                    eocd         BLOB    NOT NULL,
+                    has_manifest INTEGER NOT NULL,
+                    algorithm    TEXT    NOT NULL,
+                    validation   TEXT    NOT NULL,
+                    path         TEXT    NOT NULL,
+                    digest       TEXT    NOT NULL,
+                    coverage     TEXT    NOT NULL,
+                    last_access  REAL    NOT NULL,
+                    PRIMARY KEY (device, inode, size, mtime_ns, eocd, has_manifest, algorithm, validation)
+                )
+            """)
+            self.connection.execute("CREATE INDEX IF NOT EXISTS digests_last_access ON digests (last_access)")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS digests_path ON digests (path)")
+
+
+    def get(
+            self, identity: FileIdentity, has_manifest: bool, algorithm: str, validation: str = 'full'
+    ) -> Optional[Tuple[str, dict]]:
+        """ Return the cached digest and coverage summary, None on cache miss """
+        key = (*identity, int(has_manifest), algorithm, validation)
+        where = " AND ".join(f"{column} = ?" for column in KEY_COLUMNS)
+        row = self.connection.execute(f"SELECT digest, coverage FROM digests WHERE {where}", key).fetchone()
+        if row is None:
+            return None
+
+        with self.connection:
+            self.connection.execute(f"UPDATE digests SET last_access = ? WHERE {where}", (time.time(), *key))
+        return row[0], json.loads(row[1])
+
+
+    def put(self, path: str, identity: FileIdentity, has_manifest: bool, algorithm: str, digest: str,
+            coverage: dict, validation: str = 'full'):
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO digests VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (*identity, int(has_manifest), algorithm, validation, os.path.abspath(path), digest,
+                 json.dumps(coverage), time.time())
+            )
+            self._evict()
+
+
+    def _evict(self):
+        excess = len(self) - self.max_entries
+        if excess <= 0:
+            return
+        LOGGER.debug(f"Evicting {excess} digests from the cache")
+        self.connection.execute(
+            "DELETE FROM digests WHERE rowid IN (SELECT rowid FROM digests ORDER BY last_access LIMIT ?)", (excess,)
+        )
+
+
+    def invalidate(self, path: str) -> int:
+        """ Remove all the digests of the archive at 'path' (every version of it), return how many were removed """
+        with self.connection:
+            cursor = self.connection.execute("DELETE FROM digests WHERE path = ?", (os.path.abspath(path),))
+        return cursor.rowcount
+
+
+    def clear(self):
+        with self.connection:
+            self.connection.execute("DELETE FROM digests")
+
+
+    def close(self):
+        self.connection.close()
+
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM digests").fetchone()[0]
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+
+def compute_zip_hash_cached(path: str, cache: DigestCache, has_manifest=False, mode: str = 'linear',
+                            **kwargs) -> Tuple[str, dict]:
+    """
+    Same as 'compute_zip_hash', but the digest is looked up inside 'cache' first. On a hit no body is read,
+    the returned coverage is the summary of the 'ReadState' (see 'ReadState.summary') of the original run with
+    the same 'validation' level, empty when it is 'off'.
+    'kwargs' are forwarded to 'ParsedZip.load' and 'compute_zip_hash' ('backend', 'workers', 'chunk_size'...).
+    """
+    algorithm = f"{HASH_ALGORITHM}/{mode}"
+    load_kwargs = {key: kwargs.pop(key) for key in ('bulk', 'backend', 'validation') if key in kwargs}
+    validation = load_kwargs.get('validation', 'full')
+    identity = file_identity(path)
+    cached = cache.get(identity, has_manifest, algorithm, validation)
+    if cached is not None:
+        LOGGER.debug(f"Digest of '{path}' found in cache")
+        return cached
+
+    pz = ParsedZip.load(path, **load_kwargs)
+    digest, state = compute_zip_hash(pz, has_manifest=has_manifest, mode=mode, **kwargs)
+    coverage = state.summary() if state is not None else {}
+
+    # Do not store anything if the file changed in the meanwhile
+    if file_identity(path) == identity:
+        cache.put(path, identity, has_manifest, algorithm, digest, coverage, validation)
+    else:
+        LOGGER.warning(f"'{path}' changed while being hashed, its digest will not be cached")
+    return digest, coverage
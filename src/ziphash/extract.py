@@ -1,15 +1,30 @@
 import hashlib
+import os
 import struct
+import zlib
+from typing import List, NamedTuple, Tuple, Optional
 
 from intervaltree import Interval
 
 from src.zipstruct.centraldirs.centraldir import CentralDirectory
 from src.zipstruct.descriptors.descriptor import DataDescriptor
 from src.zipstruct.eocd.eocd import EndOfCentralDirectory
+from src.zipstruct.eocd.zip64 import Zip64EndOfCentralDirectory, Zip64EndOfCentralDirectoryLocator
 from src.zipstruct.localheaders.lfh import LocalFileHeader
-from src.zipstruct.utils.state import ReadState, LOGGER
+from src.zipstruct.utils.common import GeneralPurposeBitMasks
+from src.zipstruct.utils.content import ContentStream
+from src.zipstruct.utils.instrument import Instrumentation, measure
+from src.zipstruct.utils.aio import AsyncExecutor, get_default_executor, split_in_steps, DEFAULT_STEP_BYTES
+from src.zipstruct.utils.pools import create_pool, split_in_batches
+from src.zipstruct.utils.sources import ByteSource, open_source, DEFAULT_CHUNK_SIZE
+from src.zipstruct.utils.state import ParsingState, create_read_state, LOGGER
+from src.zipstruct.utils.verify import BodyVerifier, VerificationReport, create_verify_task
 from src.zipstruct.utils.zipentry import ParsedZip
 
+HASH_ALGORITHM = 'sha256'
+HASH_MODES = ('linear', 'tree', 'content')
+MANIFEST_NAME = "__keb_manifest.c2pa"
+
 
 # NOTE: model_dump() will not be used in order to specify explicitly the dump order
 
@@ -35,6 +50,9 @@ def extract_from_eocd(eocd: EndOfCentralDirectory, has_manifest = False):
 
     # Consider manifest as an additional entry
     tot_unpacked = struct.unpack("<H", reocd.total_entries_in_central_dir)[0]
+    if eocd.zip64 is not None and tot_unpacked == 0xFFFF:
+        # The real amount is stored inside the Zip64 EOCD record
+        return aggregate + reocd.total_entries_in_central_dir
     tot_unpacked -= 1
     tot_packed = struct.pack("<H", tot_unpacked)
 
@@ -44,6 +62,41 @@ def extract_from_eocd(eocd: EndOfCentralDirectory, has_manifest = False):
     )
 
 
+def extract_from_zip64_eocd(zeocd: Zip64EndOfCentralDirectory, has_manifest = False):
+    rzeocd = zeocd.raw
+    aggregate = (
+        rzeocd.signature
+        + rzeocd.size_of_zip64_eocd
+        + rzeocd.version_made_by
+        + rzeocd.version_needed_to_extract
+        # + rzeocd.disk_number
+        # + rzeocd.central_dir_start_disk_number
+        # + rzeocd.total_entries_in_central_dir_on_this_disk
+        # + rzeocd.size_of_central_dir
+        # + rzeocd.offset_of_start_of_central_directory
+        + rzeocd.extensible_data
+    )
+
+    if not has_manifest:
+        return aggregate + rzeocd.total_entries_in_central_dir
+
+    # Consider manifest as an additional entry
+    tot_unpacked = struct.unpack("<Q", rzeocd.total_entries_in_central_dir)[0]
+    tot_unpacked -= 1
+    return aggregate + struct.pack("<Q", tot_unpacked)
+
+
+def extract_from_zip64_locator(locator: Zip64EndOfCentralDirectoryLocator):
+    rlocator = locator.raw
+    aggregate = (
+        rlocator.signature
+        # + rlocator.zip64_eocd_disk_number
+        # + rlocator.offset_of_zip64_eocd
+        + rlocator.total_number_of_disks
+    )
+    return aggregate
+
+
 def extract_from_central_directory(cd: CentralDirectory):
     # model_dump() will not be used in order to specify explicitly the dump order
     rcd = cd.raw
@@ -104,7 +157,9 @@ def extract_from_dd(dd: DataDescriptor):
     return aggregate
 
 
-def add_to_state(data, interval: Interval, state: ReadState):
+def add_to_state(data, interval: Interval, state: Optional[ParsingState]):
+    if state is None:
+        return
     state.registeri(
         begin=interval.begin,
         end=interval.begin + len(data),
@@ -112,22 +167,146 @@ def add_to_state(data, interval: Interval, state: ReadState):
     )
 
 
-def compute_zip_hash(pz: ParsedZip, has_manifest=False):
-    hash_state = ReadState(pz.parsing_state.size)
+def compute_zip_hash(pz: ParsedZip, has_manifest=False, mode: str = 'linear', workers: int = None,
+                     executor: str = 'thread', chunk_size: int = DEFAULT_CHUNK_SIZE, validation: str = None,
+                     instrument: Instrumentation = None, report: VerificationReport = None):
+    """
+    Compute the digest of the archive, ignoring the fields that change when a manifest is appended.
+
+    In 'linear' mode (default) metadata and bodies are fed, in this order, to a single hash object.
+    In 'tree' mode each body is hashed on its own on a pool of 'workers' ('thread' or 'process' executor),
+    the final digest is the hash of the metadata digest followed by the body digests in entry order.
+    The 'tree' digest does not depend on the amount of workers, but it differs from the 'linear' one.
+    In 'content' mode only decompressed contents and a few semantic fields are hashed, so the digest does not
+    change when the same documents are compressed again, see 'compute_content_hash'.
+    Bodies are streamed in chunks of 'chunk_size' bytes, read inside a single reusable buffer (one per worker).
+
+    The returned state tracks the hashed ranges according to 'validation' (by default the level used to load
+    'pz'), see 'create_read_state'. With 'off' no state is created and None is returned in its place.
+
+    If an 'instrument' is passed, reads and timings of each phase ('metadata', 'bodies' and 'state') are collected
+    inside it, see 'Instrumentation'. In 'tree' mode bodies are read by the workers, so only their bytes are counted.
+
+    If a 'report' is passed (only in 'linear' mode), each hashed body is verified as well while it is read, see
+    'ParsedZip.verify': the results of the hashed entries are appended to the report, bodies are read once.
+    """
+    if mode not in HASH_MODES:
+        raise ValueError(f"Unknown hash mode '{mode}', available ones: {HASH_MODES}")
+    if report is not None and mode != 'linear':
+        raise ValueError(f"Bodies can be verified while hashing only in 'linear' mode, not in '{mode}' mode")
+    if mode == 'content':
+        return compute_content_hash(
+            pz, workers=workers, executor=executor, chunk_size=chunk_size, validation=validation, instrument=instrument
+        )
 
-    hash_func = hashlib.new('sha256')
+    with measure(instrument, 'metadata'):
+        hash_state = create_read_state(_file_size(pz), validation or pz.validation)
+        hash_func, entries, ranges = hash_metadata(pz, hash_state, has_manifest=has_manifest)
+
+    # Add file body
+    with measure(instrument, 'bodies'):
+        if mode == 'linear':
+            buffer = bytearray(chunk_size)
+            with pz.open_source() as source:
+                if instrument is not None:
+                    source = instrument.wrap(source)
+                if report is None:
+                    reads = [hash_body(source, offset, length, hash_func, buffer) for offset, length in ranges]
+                else:
+                    verifiers = [BodyVerifier(create_verify_task(entry), chunk_size) for entry in entries]
+                    reads = [
+                        hash_body(source, offset, length, hash_func, buffer, verifier)
+                        for (offset, length), verifier in zip(ranges, verifiers)
+                    ]
+                    report.entries.extend(verifier.result() for verifier in verifiers)
+        else:
+            results = hash_bodies_parallel(
+                pz.path, pz.backend, ranges, workers=workers, executor=executor, chunk_size=chunk_size
+            )
+            hash_func = combine_tree_digest(hash_func, [digest for digest, _ in results])
+            reads = [read for _, read in results]
+            if instrument is not None:
+                instrument.count_bytes('bodies', sum(reads))
+
+    with measure(instrument, 'state'):
+        register_bodies(hash_state, entries, reads)
+    return hash_func.hexdigest(), hash_state
+
+
+async def acompute_zip_hash(pz: ParsedZip, has_manifest=False, mode: str = 'linear',
+                            chunk_size: int = DEFAULT_CHUNK_SIZE, validation: str = None,
+                            executor: AsyncExecutor = None, step_bytes: int = DEFAULT_STEP_BYTES):
+    """
+    Same as 'compute_zip_hash' (and same digests), but blocking work runs on the pool of 'executor' (see
+    'AsyncExecutor', by default a shared one) and counts towards its limit of concurrent archives.
+    Bodies are hashed in steps of about 'step_bytes' bytes (at least one entry), the task can be cancelled
+    between steps. In 'tree' and 'content' modes bodies are hashed one after the other as well.
+    """
+    if mode not in HASH_MODES:
+        raise ValueError(f"Unknown hash mode '{mode}', available ones: {HASH_MODES}")
+
+    executor = executor or get_default_executor()
+    async with executor.limit:
+        hash_state = create_read_state(_file_size(pz), validation or pz.validation)
+        if mode == 'content':
+            entries, tasks = await executor.run(create_content_tasks, pz)
+            buffer = bytearray(chunk_size)
+            results = []
+            source = await executor.open(pz.open_source)
+            async with executor.steps(on_exit=source.close) as run:
+                for step in split_in_steps(tasks, sizes=[task.length for task in tasks], max_bytes=step_bytes):
+                    results += await run(hash_content_step, source, step, buffer)
+            await executor.run(register_bodies, hash_state, entries, [result.read for result in results])
+            return combine_content_digest(results).hexdigest(), hash_state
+
+        # Metadata of lazy entries is parsed on first access, so it must not run on the event loop either
+        hash_func, entries, ranges = await executor.run(hash_metadata, pz, hash_state, has_manifest)
+
+        body_func = hash_func if mode == 'linear' else None
+        buffer = bytearray(chunk_size)
+        results = []
+        source = await executor.open(pz.open_source)
+        async with executor.steps(on_exit=source.close) as run:
+            for step in split_in_steps(ranges, sizes=[length for _, length in ranges], max_bytes=step_bytes):
+                results += await run(hash_body_step, source, step, body_func, buffer)
+
+        if mode == 'tree':
+            hash_func = combine_tree_digest(hash_func, [digest for digest, _ in results])
+        await executor.run(register_bodies, hash_state, entries, [read for _, read in results])
+    return hash_func.hexdigest(), hash_state
+
+
+def _file_size(pz: ParsedZip) -> int:
+    # In valid archives the EOCD ends at the end of the file, no need to access it again (i.e., remotely)
+    size = pz.parsing_state.size if pz.parsing_state is not None else pz.eocd.interval.end
+    # Recovered archives may have records rebuilt after the end of the file, see 'recovery.recover_entries'
+    return max(size, pz.eocd.interval.end)
+
+
+def hash_metadata(pz: ParsedZip, hash_state: Optional[ParsingState], has_manifest=False):
+    """
+    Feed EOCD, Zip64 records and the CD, LFH and DD of each entry (except the manifest) to a new hash object,
+    in this order. Return the hash object, the hashed entries and their body ranges.
+    """
+    hash_func = hashlib.new(HASH_ALGORITHM)
+    entries = [entry for entry in pz.entries if not is_manifest(entry)]
 
     # Add EOCD first
     eocd_aggregate = extract_from_eocd(pz.eocd, has_manifest=has_manifest)
     add_to_state(data=eocd_aggregate, interval=pz.eocd.interval, state=hash_state)
     hash_func.update(eocd_aggregate)
 
-    for entry in pz.entries:
-        if entry.central_directory.file_name == "__keb_manifest.c2pa":
-            # Ignore manifest if present
-            LOGGER.warning("Manifest found, it will be ignored")
-            continue
+    # Add Zip64 EOCD and its locator, if any
+    if pz.eocd.zip64 is not None:
+        zeocd_aggregate = extract_from_zip64_eocd(pz.eocd.zip64, has_manifest=has_manifest)
+        add_to_state(data=zeocd_aggregate, interval=pz.eocd.zip64.interval, state=hash_state)
+        hash_func.update(zeocd_aggregate)
 
+        locator_aggregate = extract_from_zip64_locator(pz.eocd.zip64_locator)
+        add_to_state(data=locator_aggregate, interval=pz.eocd.zip64_locator.interval, state=hash_state)
+        hash_func.update(locator_aggregate)
+
+    for entry in entries:
         # Add CD, LFH, and DD
         cd_aggregate = extract_from_central_directory(entry.central_directory)
         add_to_state(data=cd_aggregate, interval=entry.central_directory.interval, state=hash_state)
@@ -141,21 +320,204 @@ def compute_zip_hash(pz: ParsedZip, has_manifest=False):
             add_to_state(data=dd_aggregate, interval=entry.data_descriptor.interval, state=hash_state)
             hash_func.update(dd_aggregate)
 
-    # Add file body
-    with open(file=pz.path, mode="rb") as f:
-        for entry in pz.entries:
-            if entry.central_directory.file_name == "__keb_manifest.c2pa":
-                # Ignore manifest if present
-                LOGGER.warning("Manifest found, it will be ignored")
-                continue
-            f.seek(entry.body_offset)
-            chunk = f.read(entry.body_compressed_size)
-            hash_state.registeri(
-                begin=entry.body_offset,
-                end=entry.body_offset + len(chunk),
-                title=f"BODY of {entry.central_directory.file_name}"
-            )
-            hash_func.update(chunk)
+    ranges = [(entry.body_offset, entry.body_compressed_size) for entry in entries]
+    return hash_func, entries, ranges
 
-    return hash_func.hexdigest(), hash_state
 
+def combine_tree_digest(metadata_func, body_digests: List[bytes]):
+    """ Digest of the 'tree' mode: hash of the metadata digest followed by the body digests in entry order """
+    tree_func = hashlib.new(HASH_ALGORITHM)
+    tree_func.update(metadata_func.digest())
+    for digest in body_digests:
+        tree_func.update(digest)
+    return tree_func
+
+
+def register_bodies(hash_state: Optional[ParsingState], entries: list, reads: List[int]):
+    if hash_state is None:
+        return
+    for entry, read in zip(entries, reads):
+        hash_state.registeri(
+            begin=entry.body_offset,
+            end=entry.body_offset + read,
+            title=f"BODY of {entry.central_directory.file_name}"
+        )
+
+
+def is_manifest(entry) -> bool:
+    if entry.central_directory.file_name == MANIFEST_NAME:
+        # Ignore manifest if present
+        LOGGER.warning("Manifest found, it will be ignored")
+        return True
+    return False
+
+
+def hash_body(
+        source: ByteSource, offset: int, length: int, hash_func, buffer: bytearray = None,
+        verifier: BodyVerifier = None
+) -> int:
+    """
+    Feed the body in range [offset, offset + length) to 'hash_func', return the amount of bytes read.
+    If a 'buffer' is passed the body is streamed through it, see 'ByteSource.iter_range'.
+    The same chunks are fed to the 'verifier', if passed.
+    """
+    read = 0
+    for chunk in source.iter_range(offset, length, buffer):
+        hash_func.update(chunk)
+        if verifier is not None:
+            verifier.update(chunk)
+        read += len(chunk)
+    return read
+
+
+def hash_body_step(
+        source: ByteSource, ranges: List[Tuple[int, int]], hash_func=None, buffer: bytearray = None
+) -> List[Tuple[Optional[bytes], int]]:
+    """
+    Hash consecutive body ranges, returning the digest and the amount of bytes read of each one. Bodies are fed
+    to 'hash_func' if passed (no digest is returned), otherwise each one is hashed on its own.
+    """
+    results = []
+    for offset, length in ranges:
+        if hash_func is not None:
+            results.append((None, hash_body(source, offset, length, hash_func, buffer)))
+            continue
+        body_func = hashlib.new(HASH_ALGORITHM)
+        read = hash_body(source, offset, length, body_func, buffer)
+        results.append((body_func.digest(), read))
+    return results
+
+
+def hash_body_ranges(
+        path: str, backend: str, ranges: List[Tuple[int, int]], chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> List[Tuple[bytes, int]]:
+    """ Hash each body range on its own, returning its digest and the amount of bytes read """
+    with open_source(path, backend) as source:
+        return hash_body_step(source, ranges, buffer=bytearray(chunk_size))
+
+
+def hash_bodies_parallel(
+        path: str, backend: str, ranges: List[Tuple[int, int]], workers: int = None, executor: str = 'thread',
+        chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> List[Tuple[bytes, int]]:
+    """
+    Hash each body range on its own using a pool of workers, results are in the same order of 'ranges'.
+    Ranges are split in contiguous batches having a similar amount of bytes, so that each worker
+    opens the archive once per batch and reads it sequentially.
+    """
+    workers = workers or os.cpu_count() or 1
+    batches = split_in_batches(ranges, [length for _, length in ranges], workers * 4)
+    with create_pool(executor, workers) as pool:
+        futures = [pool.submit(hash_body_ranges, path, backend, batch, chunk_size) for batch in batches]
+        return [result for future in futures for result in future.result()]
+
+
+class ContentTask(NamedTuple):
+    """ Body of an entry to hash in 'content' mode, it is sent as it is to the workers """
+    name: str
+    offset: int
+    length: int
+    method: int
+    flags: int
+
+
+
+class ContentDigest(NamedTuple):
+    """ Digest of the decompressed content of an entry, its CRC-32 and size, and the compressed bytes read """
+    name: str
+    digest: bytes
+    crc32: int
+    size: int
+    read: int
+
+
+
+def create_content_tasks(pz: ParsedZip) -> Tuple[list, List[ContentTask]]:
+    """ Return the hashed entries (all except the manifest) and the task of each one """
+    entries = [entry for entry in pz.entries if not is_manifest(entry)]
+    tasks = [
+        ContentTask(
+            name   = entry.central_directory.file_name,
+            offset = entry.body_offset,
+            length = entry.body_compressed_size,
+            method = entry.central_directory.compression_method,
+            flags  = entry.central_directory.general_purpose_flags,
+        )
+        for entry in entries
+    ]
+    return entries, tasks
+
+
+def hash_content(source: ByteSource, task: ContentTask, buffer: bytearray = None) -> ContentDigest:
+    """ Hash the decompressed content of the body of 'task', streamed through 'buffer' (see 'ContentStream') """
+    if task.flags & GeneralPurposeBitMasks.ENCRYPTED.value:
+        raise ValueError(f"Cannot hash the content of '{task.name}', the entry is encrypted")
+
+    body_func = hashlib.new(HASH_ALGORITHM)
+    stream = ContentStream(source, task.offset, task.length, task.method, buffer)
+    try:
+        for chunk in stream:
+            body_func.update(chunk)
+    except zlib.error as e:
+        raise ValueError(f"Cannot hash the content of '{task.name}', invalid deflate stream ({e})")
+    if stream.error is not None:
+        raise ValueError(f"Cannot hash the content of '{task.name}', {stream.error}")
+    return ContentDigest(task.name, body_func.digest(), stream.crc32, stream.size, stream.read)
+
+
+def hash_content_step(
+        source: ByteSource, tasks: List[ContentTask], buffer: bytearray = None
+) -> List[ContentDigest]:
+    return [hash_content(source, task, buffer) for task in tasks]
+
+
+def hash_content_tasks(
+        path: str, backend: str, tasks: List[ContentTask], chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> List[ContentDigest]:
+    """ Hash the content of each task, opening the archive once """
+    with open_source(path, backend) as source:
+        return hash_content_step(source, tasks, bytearray(chunk_size))
+
+
+def combine_content_digest(results: List[ContentDigest]):
+    """
+    Digest of the 'content' mode: for each entry, in file name order, the length-prefixed UTF-8 name, the size and
+    the CRC-32 of its content, followed by the digest of the content.
+    """
+    content_func = hashlib.new(HASH_ALGORITHM)
+    for result in sorted(results, key=lambda r: r.name):
+        name = result.name.encode('utf-8')
+        content_func.update(struct.pack("<Q", len(name)) + name + struct.pack("<QI", result.size, result.crc32))
+        content_func.update(result.digest)
+    return content_func
+
+
+def compute_content_hash(pz: ParsedZip, workers: int = None, executor: str = 'thread',
+                         chunk_size: int = DEFAULT_CHUNK_SIZE, validation: str = None,
+                         instrument: Instrumentation = None):
+    """
+    Compute the 'content' digest of the archive (see 'combine_content_digest'): raw records, offsets, compressed
+    sizes, timestamps and the order of the entries are ignored, so re-compressing (or re-ordering) the same files
+    gives the same digest. Bodies are decompressed in a streaming fashion, memory is bounded by 'chunk_size' per
+    worker whatever the compression ratio. Contents are hashed on a pool of 'workers' ('thread' or 'process'
+    executor), entries are split in contiguous batches so that each worker reads the archive sequentially.
+
+    Only stored and deflated entries are supported, a ValueError is raised for other compression methods,
+    encrypted entries and corrupted bodies. The returned state only tracks the hashed bodies.
+    """
+    workers = workers or os.cpu_count() or 1
+    with measure(instrument, 'metadata'):
+        hash_state = create_read_state(_file_size(pz), validation or pz.validation)
+        entries, tasks = create_content_tasks(pz)
+
+    with measure(instrument, 'bodies'):
+        batches = split_in_batches(tasks, [task.length for task in tasks], workers * 4)
+        with create_pool(executor, workers) as pool:
+            futures = [pool.submit(hash_content_tasks, pz.path, pz.backend, batch, chunk_size) for batch in batches]
+            results = [result for future in futures for result in future.result()]
+        if instrument is not None:
+            instrument.count_bytes('bodies', sum(result.read for result in results))
+
+    with measure(instrument, 'state'):
+        register_bodies(hash_state, entries, [result.read for result in results])
+    return combine_content_digest(results).hexdigest(), hash_state
@@ -0,0 +1,265 @@
+import hashlib
+from collections import defaultdict
+from typing import List, Optional, Dict
+
+from pydantic import BaseModel
+
+from src.ziphash.extract import (
+    extract_from_eocd, extract_from_zip64_eocd, extract_from_zip64_locator, extract_from_central_directory,
+    extract_from_lfh, extract_from_dd, hash_body, hash_bodies_parallel, is_manifest, HASH_ALGORITHM
+)
+from src.zipstruct.utils.sources import DEFAULT_CHUNK_SIZE
+from src.zipstruct.utils.zipentry import ParsedZip
+
+import logging
+LOGGER = logging.getLogger("zipstruct")
+
+# Domain separation between leaves and internal nodes of the Merkle tree
+LEAF_PREFIX = b'\x00'
+NODE_PREFIX = b'\x01'
+
+
+class EntryDigest(BaseModel):
+    """
+    Digests of all the records of a single entry, each one computed over the same bytes used by 'compute_zip_hash'.
+    """
+
+    file_name: str
+    local_file_header_offset: int
+    body_offset: int
+    body_compressed_size: int
+
+    central_directory: str
+    local_file_header: str
+    data_descriptor: Optional[str] = None
+    body: str
+
+    leaf: str
+    """ Digest of the concatenation of the digests above, it is a leaf of the Merkle tree """
+
+
+
+class DigestManifest(BaseModel):
+    """
+    Per-entry digests of an archive plus the root of the Merkle tree built over them.
+    The first leaf of the tree is the digest of the EOCD (and of the Zip64 records if any), the others
+    are the entry leaves in the same order of 'ParsedZip.entries'.
+    """
+
+    algorithm: str = HASH_ALGORITHM
+    has_manifest: bool = False
+    eocd: str
+    entries: List[EntryDigest]
+    root: str
+
+    def save(self, path: str):
+        with open(path, mode="w") as f:
+            f.write(self.model_dump_json())
+
+    @staticmethod
+    def load(path: str) -> "DigestManifest":
+        with open(path, mode="r") as f:
+            return DigestManifest.model_validate_json(f.read())
+
+
+
+class RegionDiff(BaseModel):
+    file_name: str
+    region: str
+    """ One of 'EOCD', 'CD', 'LFH', 'DD' or 'BODY' """
+    begin: Optional[int] = None
+    end: Optional[int] = None
+
+
+
+class ManifestVerification(BaseModel):
+    root_matches: bool
+    added: List[str] = []
+    removed: List[str] = []
+    regions: List[RegionDiff] = []
+    rehashed: List[str] = []
+    """ Entries whose body has been hashed again because some of their metadata changed """
+
+
+
+def _digest(data: bytes, algorithm: str) -> bytes:
+    return hashlib.new(algorithm, data).digest()
+
+
+def merkle_root(leaves: List[bytes], algorithm: str = HASH_ALGORITHM) -> bytes:
+    """ Root of the binary Merkle tree over 'leaves', the last node of an odd level is promoted as it is """
+    if not leaves:
+        return _digest(LEAF_PREFIX, algorithm)
+    level = [_digest(LEAF_PREFIX + leaf, algorithm) for leaf in leaves]
+    while len(level) > 1:
+        paired = [_digest(NODE_PREFIX + level[i] + level[i + 1], algorithm) for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2 == 1:
+            paired.append(level[-1])
+        level = paired
+    return level[0]
+
+
+def eocd_digest(pz: ParsedZip, has_manifest: bool = False, algorithm: str = HASH_ALGORITHM) -> bytes:
+    aggregate = extract_from_eocd(pz.eocd, has_manifest=has_manifest)
+    if pz.eocd.zip64 is not None:
+        aggregate += extract_from_zip64_eocd(pz.eocd.zip64, has_manifest=has_manifest)
+        aggregate += extract_from_zip64_locator(pz.eocd.zip64_locator)
+    return _digest(aggregate, algorithm)
+
+
+def metadata_digests(entry, algorithm: str = HASH_ALGORITHM) -> Dict[str, Optional[bytes]]:
+    """ Digests of CD, LFH and DD of an entry, these do not need to read anything from the archive """
+    dd = entry.data_descriptor
+    return {
+        'central_directory': _digest(extract_from_central_directory(entry.central_directory), algorithm),
+        'local_file_header': _digest(extract_from_lfh(entry.local_file_header), algorithm),
+        'data_descriptor'  : _digest(extract_from_dd(dd), algorithm) if dd is not None else None,
+    }
+
+
+def create_entry_digest(
+        entry, metadata: Dict[str, Optional[bytes]], body: bytes, algorithm: str = HASH_ALGORITHM
+) -> EntryDigest:
+    dd = metadata['data_descriptor']
+    leaf = _digest(metadata['central_directory'] + metadata['local_file_header'] + (dd or b'') + body, algorithm)
+    return EntryDigest(
+        file_name                = entry.central_directory.file_name,
+        local_file_header_offset = entry.central_directory.relative_offset_of_local_header,
+        body_offset              = entry.body_offset,
+        body_compressed_size     = entry.body_compressed_size,
+        central_directory        = metadata['central_directory'].hex(),
+        local_file_header        = metadata['local_file_header'].hex(),
+        data_descriptor          = dd.hex() if dd is not None else None,
+        body                     = body.hex(),
+        leaf                     = leaf.hex(),
+    )
+
+
+def hash_bodies(
+        pz: ParsedZip, entries: list, workers: int = None, chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> List[bytes]:
+    """ Digest of each entry body, computed on a thread pool if 'workers' is set """
+    ranges = [(entry.body_offset, entry.body_compressed_size) for entry in entries]
+    if workers:
+        results = hash_bodies_parallel(pz.path, pz.backend, ranges, workers=workers, chunk_size=chunk_size)
+        return [digest for digest, _ in results]
+
+    digests = []
+    buffer = bytearray(chunk_size)
+    with pz.open_source() as source:
+        for offset, length in ranges:
+            body_func = hashlib.new(HASH_ALGORITHM)
+            hash_body(source, offset, length, body_func, buffer)
+            digests.append(body_func.digest())
+    return digests
+
+
+def compute_digest_manifest(
+        pz: ParsedZip, has_manifest: bool = False, workers: int = None, chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> DigestManifest:
+    """
+    Compute the digest of each record of each entry and the Merkle root over them, see 'DigestManifest'.
+    """
+    entries = [entry for entry in pz.entries if not is_manifest(entry)]
+    bodies = hash_bodies(pz, entries, workers=workers, chunk_size=chunk_size)
+
+    eocd = eocd_digest(pz, has_manifest=has_manifest)
+    digests = [create_entry_digest(entry, metadata_digests(entry), body) for entry, body in zip(entries, bodies)]
+    root = merkle_root([eocd] + [bytes.fromhex(digest.leaf) for digest in digests])
+    return DigestManifest(has_manifest=has_manifest, eocd=eocd.hex(), entries=digests, root=root.hex())
+
+
+def verify_digest_manifest(
+        pz: ParsedZip, manifest: DigestManifest, has_manifest: bool = None, workers: int = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> ManifestVerification:
+    """
+    Check 'pz' against a manifest previously computed with 'compute_digest_manifest'. Only the bodies of
+    the entries whose metadata (CD, LFH, DD digests or offsets) changed are hashed again, the other
+    bodies are assumed unchanged since their CRC-32 and sizes are covered by the metadata digests.
+    'has_manifest' refers to 'pz', by default it is the same used to compute the manifest.
+    Entries sharing a name are paired by their order of occurrence, as done by 'diff_zips'.
+    """
+    if has_manifest is None:
+        has_manifest = manifest.has_manifest
+    if manifest.algorithm != HASH_ALGORITHM:
+        raise ValueError(f"Manifest has been computed with '{manifest.algorithm}', expected '{HASH_ALGORITHM}'")
+
+    old_by_name = defaultdict(list)
+    for digest in manifest.entries:
+        old_by_name[digest.file_name].append(digest)
+    entries = [entry for entry in pz.entries if not is_manifest(entry)]
+    # Old digest paired with each entry, None for added ones
+    olds, seen = [], {}
+    for entry in entries:
+        name = entry.central_directory.file_name
+        occurrence = seen.get(name, 0)
+        seen[name] = occurrence + 1
+        candidates = old_by_name.get(name, [])
+        olds.append(candidates[occurrence] if occurrence < len(candidates) else None)
+    verification = ManifestVerification(
+        root_matches=False,
+        removed=[
+            name for name, candidates in old_by_name.items() for _ in range(seen.get(name, 0), len(candidates))
+        ],
+    )
+
+    eocd = eocd_digest(pz, has_manifest=has_manifest)
+    if eocd.hex() != manifest.eocd:
+        verification.regions.append(RegionDiff(
+            file_name='', region='EOCD', begin=pz.eocd.interval.begin, end=pz.eocd.interval.end
+        ))
+
+    # Find out which bodies have to be hashed again
+    metadata = [metadata_digests(entry) for entry in entries]
+    to_rehash = []
+    for entry, meta, old in zip(entries, metadata, olds):
+        if old is None:
+            verification.added.append(entry.central_directory.file_name)
+            to_rehash.append(entry)
+            continue
+        changed = _changed_regions(entry, meta, old)
+        verification.regions.extend(changed)
+        if changed or old.body_offset != entry.body_offset or old.body_compressed_size != entry.body_compressed_size:
+            to_rehash.append(entry)
+
+    rehashed = dict(zip(
+        [id(entry) for entry in to_rehash], hash_bodies(pz, to_rehash, workers=workers, chunk_size=chunk_size)
+    ))
+    verification.rehashed = [entry.central_directory.file_name for entry in to_rehash]
+
+    leaves = [eocd]
+    for entry, meta, old in zip(entries, metadata, olds):
+        body = rehashed.get(id(entry))
+        if body is None:
+            body = bytes.fromhex(old.body)
+        elif old is not None and body.hex() != old.body:
+            verification.regions.append(RegionDiff(
+                file_name=old.file_name, region='BODY',
+                begin=entry.body_offset, end=entry.body_offset + entry.body_compressed_size
+            ))
+        leaves.append(bytes.fromhex(create_entry_digest(entry, meta, body).leaf))
+
+    verification.root_matches = merkle_root(leaves).hex() == manifest.root
+    return verification
+
+
+def _changed_regions(entry, metadata: Dict[str, Optional[bytes]], old: EntryDigest) -> List[RegionDiff]:
+    name = entry.central_directory.file_name
+    records = [
+        ('CD', 'central_directory', entry.central_directory),
+        ('LFH', 'local_file_header', entry.local_file_header),
+        ('DD', 'data_descriptor', entry.data_descriptor),
+    ]
+    changed = []
+    for region, field, record in records:
+        digest = metadata[field]
+        if (digest.hex() if digest is not None else None) == getattr(old, field):
+            continue
+        interval = record.interval if record is not None else None
+        changed.append(RegionDiff(
+            file_name=name, region=region,
+            begin=interval.begin if interval is not None else None,
+            end=interval.end if interval is not None else None,
+        ))
+    return changed
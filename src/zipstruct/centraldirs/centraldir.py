@@ -1,5 +1,8 @@
+import struct
+
 from intervaltree import Interval
-from src.zipstruct.utils.common import compare_models
+from src.zipstruct.utils.common import compare_models, unpack_little_endian, GeneralPurposeBitMasks
+from src.zipstruct.utils.records import RecordView, RawField, DecodedField
 from pydantic import BaseModel, conbytes, conint
 from typing import Annotated
 
@@ -9,8 +12,11 @@ CENTRAL_DIR_SIGNATURE = b'\x50\x4B\x01\x02'
 INT_CENTRAL_DIR_SIGNATURE = 0x02014b50
 MIN_CENTRAL_DIR_LENGTH = 46
 
+# Fixed-size part of the record, see section '4.3.12' of the APPNOTE
+CENTRAL_DIR_STRUCT = struct.Struct('<IHHHHHHIIIHHHHHII')
+
 
-class RawCentralDirectory(BaseModel):
+class RawCentralDirectoryModel(BaseModel):
     """
     This model represents the Central Directory File Header, a key structure in ZIP archives
     that provides metadata for each file in the archive.
@@ -136,7 +142,7 @@ class RawCentralDirectory(BaseModel):
 
 
 
-class CentralDirectory(BaseModel):
+class CentralDirectoryModel(BaseModel):
     """
     This model represents the Central Directory File Header, a key structure in ZIP archives
     that provides metadata for each file in the archive.
@@ -146,7 +152,7 @@ class CentralDirectory(BaseModel):
     Original raw bytes are stored inside the 'raw' field in little-endian order.
     """
 
-    raw: RawCentralDirectory
+    raw: RawCentralDirectoryModel
     """
     Useful if you need all the fields of this class in the original raw binary (little-endian) format
     """
@@ -198,14 +204,14 @@ class CentralDirectory(BaseModel):
     CRC-32 checksum of the uncompressed file data (4 bytes).
     """
 
-    compressed_size: conint(ge=0, lt=4**16)
+    compressed_size: conint(ge=0, lt=2**64)
     """
-    Size of the compressed file data (4 bytes).
+    Size of the compressed file data (4 bytes, or 8 bytes from the Zip64 extra field).
     """
 
-    uncompressed_size: conint(ge=0, lt=4**16)
+    uncompressed_size: conint(ge=0, lt=2**64)
     """
-    Size of the uncompressed file data (4 bytes).
+    Size of the uncompressed file data (4 bytes, or 8 bytes from the Zip64 extra field).
     """
 
     file_name_length: conint(ge=0, lt=2**16)
@@ -223,9 +229,10 @@ class CentralDirectory(BaseModel):
     Length of the file comment (2 bytes). Optional comments about the file.
     """
 
-    disk_number_start: conint(ge=0, lt=2**16)
+    disk_number_start: conint(ge=0, lt=2**32)
     """
-    Disk number where the file starts (2 bytes). Relevant for multi-disk ZIP archives.
+    Disk number where the file starts (2 bytes, or 4 bytes from the Zip64 extra field).
+    Relevant for multi-disk ZIP archives.
     """
 
     internal_file_attributes: conbytes(min_length=2, max_length=2)
@@ -240,9 +247,9 @@ class CentralDirectory(BaseModel):
     External file attributes (4 bytes). Includes file system-specific permissions.
     """
 
-    relative_offset_of_local_header: conint(ge=0, lt=2**32)
+    relative_offset_of_local_header: conint(ge=0, lt=2**64)
     """
-    Offset (in bytes) of the corresponding Local File Header (4 bytes).
+    Offset (in bytes) of the corresponding Local File Header (4 bytes, or 8 bytes from the Zip64 extra field).
     """
 
     file_name: str = None
@@ -268,10 +275,184 @@ class CentralDirectory(BaseModel):
     This is a custom field, it is not compliant with the standard.
     """
 
+    zip64: bool = False
+    """
+    This is a custom field, it is True when some value has been taken from the Zip64 extended information extra field.
+    """
+
     def __len__(self):
         return len(self.raw)
 
 
-    def compare(self, new: 'CentralDirectory', filename=''):
+    def compare(self, new: 'CentralDirectoryModel', filename=''):
         prefix = f'{filename}.CD' if filename else ''
         return compare_models(a=self, b=new, exclude={'raw'}, prefix=prefix)
+
+
+
+class RawCentralDirectory(RecordView):
+    """
+    Raw view of the Central Directory File Header, each field is the original little-endian slice of the record.
+    Fields are the same of 'RawCentralDirectoryModel'.
+    """
+
+    __slots__ = ()
+
+    signature                       = RawField(0, 4)
+    version_made_by                 = RawField(4, 6)
+    version_needed_to_extract       = RawField(6, 8)
+    general_purpose_flags           = RawField(8, 10)
+    compression_method              = RawField(10, 12)
+    last_mod_file_time              = RawField(12, 14)
+    last_mod_file_date              = RawField(14, 16)
+    crc32                           = RawField(16, 20)
+    compressed_size                 = RawField(20, 24)
+    uncompressed_size               = RawField(24, 28)
+    file_name_length                = RawField(28, 30)
+    extra_field_length              = RawField(30, 32)
+    file_comment_length             = RawField(32, 34)
+    disk_number_start               = RawField(34, 36)
+    internal_file_attributes        = RawField(36, 38)
+    external_file_attributes        = RawField(38, 42)
+    relative_offset_of_local_header = RawField(42, 46)
+
+    @property
+    def file_name(self) -> bytes:
+        return self.data[MIN_CENTRAL_DIR_LENGTH:MIN_CENTRAL_DIR_LENGTH + self.values[10]]
+
+    @property
+    def extra_field(self) -> bytes:
+        start = MIN_CENTRAL_DIR_LENGTH + self.values[10]
+        return self.data[start:start + self.values[11]]
+
+    @property
+    def file_comment(self) -> bytes:
+        return self.data[MIN_CENTRAL_DIR_LENGTH + self.values[10] + self.values[11]:]
+
+
+    def to_model(self) -> RawCentralDirectoryModel:
+        return RawCentralDirectoryModel(
+            signature                       = self.signature,
+            version_made_by                 = self.version_made_by,
+            version_needed_to_extract       = self.version_needed_to_extract,
+            general_purpose_flags           = self.general_purpose_flags,
+            compression_method              = self.compression_method,
+            last_mod_file_time              = self.last_mod_file_time,
+            last_mod_file_date              = self.last_mod_file_date,
+            crc32                           = self.crc32,
+            compressed_size                 = self.compressed_size,
+            uncompressed_size               = self.uncompressed_size,
+            file_name_length                = self.file_name_length,
+            extra_field_length              = self.extra_field_length,
+            file_comment_length             = self.file_comment_length,
+            disk_number_start               = self.disk_number_start,
+            internal_file_attributes        = self.internal_file_attributes,
+            external_file_attributes        = self.external_file_attributes,
+            relative_offset_of_local_header = self.relative_offset_of_local_header,
+            file_name                       = self.file_name,
+            extra_field                     = self.extra_field,
+            file_comment                    = self.file_comment,
+        )
+
+
+
+class CentralDirectory(RecordView):
+    """
+    Central Directory File Header backed by the bytes of the record, 'values' holds the integers unpacked with
+    'CENTRAL_DIR_STRUCT' where sizes, offset and disk start are already resolved from the Zip64 extra field.
+    Fields are the same of 'CentralDirectoryModel', file name and comment are decoded on first access.
+    """
+
+    __slots__ = ('interval', 'zip64', '_file_name', '_file_comment')
+
+    signature                       = DecodedField(0)
+    version_made_by                 = DecodedField(1)
+    version_needed_to_extract       = DecodedField(2)
+    general_purpose_flags           = DecodedField(3)
+    compression_method              = DecodedField(4)
+    last_mod_file_time              = RawField(12, 14)
+    last_mod_file_date              = RawField(14, 16)
+    crc32                           = RawField(16, 20)
+    compressed_size                 = DecodedField(8)
+    uncompressed_size               = DecodedField(9)
+    file_name_length                = DecodedField(10)
+    extra_field_length              = DecodedField(11)
+    file_comment_length             = DecodedField(12)
+    disk_number_start               = DecodedField(13)
+    internal_file_attributes        = RawField(36, 38)
+    external_file_attributes        = RawField(38, 42)
+    relative_offset_of_local_header = DecodedField(16)
+
+    def __init__(self, data: bytes, values: tuple, zip64: bool = False, interval: Interval = None):
+        super().__init__(data, values)
+        self.zip64 = zip64
+        self.interval = interval
+        self._file_name = None
+        self._file_comment = None
+
+
+    @property
+    def raw(self) -> RawCentralDirectory:
+        return RawCentralDirectory(self.data, self.values)
+
+
+    @property
+    def encoding(self) -> str:
+        ### 4.4.4 general purpose bit flag: (2 bytes)
+        utf8 = self.values[3] & GeneralPurposeBitMasks.UTF8_LANGUAGE_ENCODING.value
+        return 'utf-8' if utf8 else 'cp437'
+
+
+    @property
+    def file_name(self) -> str:
+        if self._file_name is None:
+            self._file_name = unpack_little_endian(self.raw.file_name, self.encoding)
+        return self._file_name
+
+
+    @property
+    def extra_field(self) -> bytes:
+        return self.raw.extra_field
+
+
+    @property
+    def file_comment(self) -> str:
+        if self._file_comment is None:
+            self._file_comment = unpack_little_endian(self.raw.file_comment, self.encoding)
+        return self._file_comment
+
+
+    def to_model(self) -> CentralDirectoryModel:
+        return CentralDirectoryModel(
+            raw                             = self.raw.to_model(),
+            signature                       = self.signature,
+            version_made_by                 = self.version_made_by,
+            version_needed_to_extract       = self.version_needed_to_extract,
+            general_purpose_flags           = self.general_purpose_flags,
+            compression_method              = self.compression_method,
+            last_mod_file_time              = self.last_mod_file_time,
+            last_mod_file_date              = self.last_mod_file_date,
+            crc32                           = self.crc32,
+            compressed_size                 = self.compressed_size,
+            uncompressed_size               = self.uncompressed_size,
+            file_name_length                = self.file_name_length,
+            extra_field_length              = self.extra_field_length,
+            file_comment_length             = self.file_comment_length,
+            disk_number_start               = self.disk_number_start,
+            internal_file_attributes        = self.internal_file_attributes,
+            external_file_attributes        = self.external_file_attributes,
+            relative_offset_of_local_header = self.relative_offset_of_local_header,
+            file_name                       = self.file_name,
+            extra_field                     = self.extra_field,
+            file_comment                    = self.file_comment,
+            interval                        = self.interval,
+            zip64                           = self.zip64,
+        )
+
+
+    def compare(self, new: 'CentralDirectory', filename=''):
+        return self.to_model().compare(new.to_model(), filename=filename)
+
+
+    def __repr__(self):
+        return f"CentralDirectory(file_name={self.file_name!r}, interval={self.interval!r})"
@@ -1,29 +1,62 @@
-import struct
-from typing import BinaryIO
-from src.zipstruct.utils.common import GeneralPurposeBitMasks, unpack_little_endian
+from typing import BinaryIO, Union, Tuple
+from src.zipstruct.utils.common import unpack_zip64_extra_field, ZIP64_PLACEHOLDER_16, ZIP64_PLACEHOLDER_32
+from src.zipstruct.utils.sources import ByteSource, as_source
 from src.zipstruct.centraldirs.centraldir import (
-    RawCentralDirectory, INT_CENTRAL_DIR_SIGNATURE, MIN_CENTRAL_DIR_LENGTH, CENTRAL_DIR_SIGNATURE, CentralDirectory
+    RawCentralDirectory, INT_CENTRAL_DIR_SIGNATURE, MIN_CENTRAL_DIR_LENGTH, CENTRAL_DIR_SIGNATURE, CentralDirectory,
+    CENTRAL_DIR_STRUCT
 )
 
 import logging
 LOGGER = logging.getLogger("zipstruct")
 
+# Placeholders of the values that may be stored inside the Zip64 extended information extra field, in order:
+# uncompressed size, compressed size, relative offset of local header and disk number start
+ZIP64_PLACEHOLDERS = [ZIP64_PLACEHOLDER_32, ZIP64_PLACEHOLDER_32, ZIP64_PLACEHOLDER_32, ZIP64_PLACEHOLDER_16]
 
-def parse_central_directories(f: BinaryIO, start_offset: int) -> list[CentralDirectory]:
-    f.seek(start_offset, 0)
 
-    signature = f.read(4)
+def resolve_zip64_values(extra: bytes, values: list[int]):
+    """
+    Resolve the 32-bit 'values' (in the order of 'ZIP64_PLACEHOLDERS') using the Zip64 extended
+    information extra field, but only if some of them is a placeholder.
+    """
+    if all(value != placeholder for value, placeholder in zip(values, ZIP64_PLACEHOLDERS)):
+        return values, False
+    return unpack_zip64_extra_field(extra, values, ZIP64_PLACEHOLDERS)
+
+
+def resolve_zip64_record(record: Union[bytes, memoryview], offset: int, values: tuple) -> Tuple[tuple, bool]:
+    """
+    Resolve the values unpacked with 'CENTRAL_DIR_STRUCT' from the record starting at 'offset' of 'record',
+    using its Zip64 extended information extra field. Returns the new values and the 'zip64' flag.
+    """
+    if (values[8] != ZIP64_PLACEHOLDER_32 and values[9] != ZIP64_PLACEHOLDER_32
+            and values[16] != ZIP64_PLACEHOLDER_32 and values[13] != ZIP64_PLACEHOLDER_16):
+        return values, False
+
+    name_length, extra_length = values[10:12]
+    extra_start = offset + MIN_CENTRAL_DIR_LENGTH + name_length
+    (uncompressed_size, compressed_size, relative_offset, disk_number_start), zip64 = resolve_zip64_values(
+        bytes(record[extra_start:extra_start + extra_length]), [values[9], values[8], values[16], values[13]]
+    )
+    resolved = (values[:8] + (compressed_size, uncompressed_size) + values[10:13] + (disk_number_start,)
+                + values[14:16] + (relative_offset,))
+    return resolved, zip64
+
+
+def parse_central_directories(f: Union[BinaryIO, ByteSource], start_offset: int) -> list[CentralDirectory]:
+    source = as_source(f)
+    signature = bytes(source.read_at(start_offset, 4))
     cds = []
     offset = start_offset
     LOGGER.debug(f"Started parsing central directories from byte: {offset}")
     while signature == CENTRAL_DIR_SIGNATURE:
-        cd = parse_central_directory(f, offset)
+        cd = parse_central_directory(source, offset)
         cds.append(cd)
-        signature = f.read(4)
-        offset += len(cd.raw)
+        offset += len(cd)
+        signature = bytes(source.read_at(offset, 4))
     LOGGER.debug(f"Stopped to parse central directories at byte {offset}, no central directory "
                  f"signature was found (bytes read: {signature})")
-    total = sum([len(cd.raw) for cd in cds])
+    total = sum([len(cd) for cd in cds])
     expected = offset - start_offset
     if total != expected:
         raise ValueError(f"'__len__' function of {CentralDirectory.__name__} may be bugged, expected len "
@@ -31,10 +64,63 @@ def parse_central_directories(f: BinaryIO, start_offset: int) -> list[CentralDir
     return cds
 
 
-def parse_central_directory(f: BinaryIO, offset: int) -> CentralDirectory:
-    # Seek to the start of the CentralDirectory and load it in memory
-    f.seek(offset, 0)
-    cd = f.read(MIN_CENTRAL_DIR_LENGTH)
+def parse_central_directories_bulk(
+        f: Union[BinaryIO, ByteSource], start_offset: int, size: int
+) -> list[CentralDirectory]:
+    """
+    Parse all the central directories reading them with a single call, 'start_offset' and 'size' are
+    expected to come from the EOCD ('offset_of_start_of_central_directory' and 'size_of_central_dir').
+    Since the central directory is known to fill 'size' bytes, any byte left which is not a valid record raises
+    the ValueError raised by 'parse_central_directory' for it (i.e., an invalid signature).
+    """
+    data = as_source(f).read_at(start_offset, size)
+    if len(data) != size:
+        raise ValueError(f"Incomplete central directory, found {len(data)} bytes but expected {size}")
+
+    cds = []
+    offset = 0
+    LOGGER.debug(f"Started bulk parsing of central directories from byte: {start_offset}")
+    with memoryview(data) as view:
+        while offset < size:
+            cd = parse_central_directory_from_buffer(view, offset)
+            cds.append(cd)
+            offset += len(cd)
+    del data
+
+    LOGGER.debug(f"Parsed {len(cds)} central directories from bytes {start_offset}:{start_offset + offset}")
+    return cds
+
+
+def parse_central_directory_from_buffer(view: memoryview, offset: int) -> CentralDirectory:
+    """
+    Parse the central directory starting at 'offset' of an in-memory buffer, the record bytes are copied
+    so that the result does not keep any reference to the buffer.
+    """
+    available = len(view) - offset
+    if available < MIN_CENTRAL_DIR_LENGTH:
+        raise ValueError(f"Incomplete CentralDirectory record, found {available} bytes "
+                         f"but minimum is {MIN_CENTRAL_DIR_LENGTH}.")
+
+    values = CENTRAL_DIR_STRUCT.unpack_from(view, offset)
+
+    # Check signature
+    if values[0] != INT_CENTRAL_DIR_SIGNATURE:
+        raise ValueError("Invalid 'Central Directory' signature")
+
+    expected = MIN_CENTRAL_DIR_LENGTH + values[10] + values[11] + values[12]
+    if available < expected:
+        raise ValueError(f"Incomplete CentralDirectory record, mismatch between "
+                         f"expected ({expected}) and current ({available}) amount")
+
+    data = bytes(view[offset:offset + expected])
+    values, zip64 = resolve_zip64_record(data, 0, values)
+    return CentralDirectory(data, values, zip64=zip64)
+
+
+def parse_central_directory(f: Union[BinaryIO, ByteSource], offset: int) -> CentralDirectory:
+    # Load in memory the fixed-size part of the CentralDirectory
+    source = as_source(f)
+    cd = bytes(source.read_at(offset, MIN_CENTRAL_DIR_LENGTH))
 
     # Check size
     if len(cd) < MIN_CENTRAL_DIR_LENGTH:
@@ -42,77 +128,25 @@ def parse_central_directory(f: BinaryIO, offset: int) -> CentralDirectory:
                          f"but minimum is {MIN_CENTRAL_DIR_LENGTH}.")
 
     # Check signature
-    signature = struct.unpack('<I', cd[:4])[0]
-    if signature != INT_CENTRAL_DIR_SIGNATURE:
+    values = CENTRAL_DIR_STRUCT.unpack(cd)
+    if values[0] != INT_CENTRAL_DIR_SIGNATURE:
         raise ValueError("Invalid 'Central Directory' signature")
 
-    # Extract the comment, if any
-    name_length = struct.unpack('<H', cd[28:30])[0]
-    extra_length = struct.unpack('<H', cd[30:32])[0]
-    comment_length = struct.unpack('<H', cd[32:34])[0]
-    name = f.read(name_length)
-    extra = f.read(extra_length)
-    comment = f.read(comment_length)
-
-    rcd = RawCentralDirectory(
-        signature                       = cd[0:4],
-        version_made_by                 = cd[4:6],
-        version_needed_to_extract       = cd[6:8],
-        general_purpose_flags           = cd[8:10],
-        compression_method              = cd[10:12],
-        last_mod_file_time              = cd[12:14],
-        last_mod_file_date              = cd[14:16],
-        crc32                           = cd[16:20],
-        compressed_size                 = cd[20:24],
-        uncompressed_size               = cd[24:28],
-        file_name_length                = cd[28:30],
-        extra_field_length              = cd[30:32],
-        file_comment_length             = cd[32:34],
-        disk_number_start               = cd[34:36],
-        internal_file_attributes        = cd[36:38],
-        external_file_attributes        = cd[38:42],
-        relative_offset_of_local_header = cd[42:46],
-        file_name                       = name,
-        extra_field                     = extra,
-        file_comment                    = comment,
-    )
+    # Load file name, extra field and comment
+    variable_length = values[10] + values[11] + values[12]
+    variable = bytes(source.read_at(offset + MIN_CENTRAL_DIR_LENGTH, variable_length))
 
-    current = len(rcd)
-    expected = MIN_CENTRAL_DIR_LENGTH + len(name) + len(extra) + len(comment)
+    current = MIN_CENTRAL_DIR_LENGTH + len(variable)
+    expected = MIN_CENTRAL_DIR_LENGTH + variable_length
     if current != expected:
         raise ValueError(f"Incomplete CentralDirectory record, mismatch between "
                          f"expected ({expected}) and current ({current}) amount")
 
-    cd = unpack_from_raw(rcd)
-    LOGGER.debug(f"Parsed central directory of file '{cd.file_name}' from bytes {offset}:{offset+len(rcd)}")
+    cd = unpack_from_raw(RawCentralDirectory(cd + variable, values))
+    LOGGER.debug(f"Parsed central directory of file '{cd.file_name}' from bytes {offset}:{offset + len(cd)}")
     return cd
 
 
-def unpack_from_raw(rcd: RawCentralDirectory):
-    ### 4.4.4 general purpose bit flag: (2 bytes)
-    gpb = struct.unpack('<H', rcd.general_purpose_flags)[0]
-    utf8 = bool(gpb & GeneralPurposeBitMasks.UTF8_LANGUAGE_ENCODING.value)
-    encoding = 'utf-8' if utf8 else 'cp437'
-    return CentralDirectory(
-        raw                             = rcd,
-        signature                       = unpack_little_endian(rcd.signature),
-        version_made_by                 = unpack_little_endian(rcd.version_made_by),
-        version_needed_to_extract       = unpack_little_endian(rcd.version_needed_to_extract),
-        general_purpose_flags           = gpb,
-        compression_method              = unpack_little_endian(rcd.compression_method),
-        last_mod_file_time              = rcd.last_mod_file_time,
-        last_mod_file_date              = rcd.last_mod_file_date,
-        crc32                           = rcd.crc32,
-        compressed_size                 = unpack_little_endian(rcd.compressed_size),
-        uncompressed_size               = unpack_little_endian(rcd.uncompressed_size),
-        file_name_length                = unpack_little_endian(rcd.file_name_length),
-        extra_field_length              = unpack_little_endian(rcd.extra_field_length),
-        file_comment_length             = unpack_little_endian(rcd.file_comment_length),
-        disk_number_start               = unpack_little_endian(rcd.disk_number_start),
-        internal_file_attributes        = rcd.internal_file_attributes,
-        external_file_attributes        = rcd.external_file_attributes,
-        relative_offset_of_local_header = unpack_little_endian(rcd.relative_offset_of_local_header),
-        file_name                       = unpack_little_endian(rcd.file_name, encoding),
-        extra_field                     = rcd.extra_field,
-        file_comment                    = unpack_little_endian(rcd.signature, encoding),
-    )
+def unpack_from_raw(rcd: RawCentralDirectory) -> CentralDirectory:
+    values, zip64 = resolve_zip64_record(rcd.data, 0, CENTRAL_DIR_STRUCT.unpack_from(rcd.data))
+    return CentralDirectory(rcd.data, values, zip64=zip64)
@@ -0,0 +1,153 @@
+from array import array
+from typing import Iterator, List
+
+from intervaltree import Interval
+
+from src.zipstruct.utils.common import GeneralPurposeBitMasks
+from src.zipstruct.centraldirs.centraldir import (
+    CentralDirectory, INT_CENTRAL_DIR_SIGNATURE, MIN_CENTRAL_DIR_LENGTH, CENTRAL_DIR_STRUCT
+)
+from src.zipstruct.centraldirs.parsing import parse_central_directory_from_buffer, resolve_zip64_record
+
+import logging
+LOGGER = logging.getLogger("zipstruct")
+
+
+class CentralDirectoryTable:
+    """
+    Columnar (struct-of-arrays) representation of all the central directories of a ZIP archive.
+
+    Fixed-width fields are stored in contiguous typed arrays (one per field), while file names are sliced on
+    demand from the original central directory bytes, which are kept so that a full 'CentralDirectory' can be
+    created for a single entry as well (i.e., 'table[i]').
+
+    Columns expose the buffer protocol, so they can be wrapped with no copies by other libraries
+    (e.g., 'numpy.frombuffer(table.compressed_size, dtype=numpy.uint64)').
+    """
+
+    COLUMNS = {
+        'version_made_by'                : 'H',
+        'version_needed_to_extract'      : 'H',
+        'general_purpose_flags'          : 'H',
+        'compression_method'             : 'H',
+        'last_mod_file_time'             : 'H',
+        'last_mod_file_date'             : 'H',
+        'crc32'                          : 'I',
+        'compressed_size'                : 'Q',
+        'uncompressed_size'              : 'Q',
+        'disk_number_start'              : 'I',
+        'internal_file_attributes'       : 'H',
+        'external_file_attributes'       : 'I',
+        'relative_offset_of_local_header': 'Q',
+    }
+
+    def __init__(self, buffer: bytes, start_offset: int = 0):
+        """
+        Decode all the central directories stored in 'buffer', which must contain the whole central directory
+        (any byte left which is not a valid record raises a ValueError, see 'parse_central_directories_bulk').
+        'start_offset' is the absolute position of the buffer inside the archive.
+        """
+        self.buffer = buffer
+        self.start_offset = start_offset
+        for column, typecode in self.COLUMNS.items():
+            setattr(self, column, array(typecode))
+        self.record_offsets = array('Q')
+        self.name_lengths = array('H')
+
+        self.view = view = memoryview(buffer)
+        size = len(buffer)
+        unpack_from = CENTRAL_DIR_STRUCT.unpack_from
+        columns = [getattr(self, column).append for column in self.COLUMNS]
+        record_offsets = self.record_offsets.append
+        name_lengths = self.name_lengths.append
+
+        offset = 0
+        while offset < size:
+            available = size - offset
+            if available < MIN_CENTRAL_DIR_LENGTH:
+                raise ValueError(f"Incomplete CentralDirectory record, found {available} bytes "
+                                 f"but minimum is {MIN_CENTRAL_DIR_LENGTH}.")
+
+            values = unpack_from(view, offset)
+            if values[0] != INT_CENTRAL_DIR_SIGNATURE:
+                raise ValueError("Invalid 'Central Directory' signature")
+
+            name_length, extra_length, comment_length = values[10:13]
+            expected = MIN_CENTRAL_DIR_LENGTH + name_length + extra_length + comment_length
+            if available < expected:
+                raise ValueError(f"Incomplete CentralDirectory record, mismatch between "
+                                 f"expected ({expected}) and current ({available}) amount")
+
+            # Sizes, offset and disk start may be stored in the Zip64 extra field
+            values, _ = resolve_zip64_record(view, offset, values)
+
+            # Skip signature and lengths, they are implicit in the table
+            for append, value in zip(columns, values[1:10] + values[13:]):
+                append(value)
+            record_offsets(offset)
+            name_lengths(name_length)
+
+            offset += expected
+
+        self.record_offsets.append(offset)
+        LOGGER.debug(f"Loaded a table of {len(self)} central directories from bytes "
+                     f"{start_offset}:{start_offset + offset}")
+
+
+    def __len__(self):
+        return len(self.record_offsets) - 1
+
+
+    def __getitem__(self, index: int) -> CentralDirectory:
+        """ Create the full 'CentralDirectory' of the entry at position 'index' """
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(f"Central directory index out of range: {index}")
+        cd = parse_central_directory_from_buffer(self.view, self.record_offsets[index])
+        begin = self.start_offset + self.record_offsets[index]
+        cd.interval = Interval(begin=begin, end=begin + self.record_length(index), data=f"CD of '{cd.file_name}'")
+        return cd
+
+
+    def __iter__(self) -> Iterator[CentralDirectory]:
+        for index in range(len(self)):
+            yield self[index]
+
+
+    def raw_name(self, index: int) -> bytes:
+        start = self.record_offsets[index] + MIN_CENTRAL_DIR_LENGTH
+        return bytes(self.view[start:start + self.name_lengths[index]])
+
+
+    def name(self, index: int) -> str:
+        """ File name of the entry at position 'index', decoded as 'utf-8' or 'cp437' like in 'CentralDirectory' """
+        utf8 = self.general_purpose_flags[index] & GeneralPurposeBitMasks.UTF8_LANGUAGE_ENCODING.value
+        return self.raw_name(index).decode('utf-8' if utf8 else 'cp437', errors='replace')
+
+
+    def names(self) -> List[str]:
+        return [self.name(index) for index in range(len(self))]
+
+
+    def record_length(self, index: int) -> int:
+        return self.record_offsets[index + 1] - self.record_offsets[index]
+
+
+    def total_compressed_size(self) -> int:
+        return sum(self.compressed_size)
+
+
+    def total_uncompressed_size(self) -> int:
+        return sum(self.uncompressed_size)
+
+
+    def indices_by_compression_method(self, method: int) -> List[int]:
+        return [index for index, value in enumerate(self.compression_method) if value == method]
+
+
+    def nbytes(self) -> int:
+        """ Approximated amount of memory used by the table (buffers only) """
+        columns = [getattr(self, column) for column in self.COLUMNS]
+        columns += [self.record_offsets, self.name_lengths]
+        return len(self.buffer) + sum(c.itemsize * len(c) for c in columns)
@@ -1,5 +1,6 @@
 from intervaltree import Interval
 from src.zipstruct.utils.common import compare_models
+from src.zipstruct.utils.records import RecordView, DecodedField
 from typing import Optional
 
 from pydantic import BaseModel, conbytes, conint
@@ -8,9 +9,11 @@ DATA_DESCRIPTOR_SIGNATURE = b'\x50\x4b\x07\x08'
 INT_DATA_DESCRIPTOR_SIGNATURE = 0x08074b50
 DATA_DESCRIPTOR_MIN_LENGTH = 12
 DATA_DESCRIPTOR_MAX_LENGTH = 16
+# Sizes are stored in 8 bytes for Zip64 entries
+ZIP64_DATA_DESCRIPTOR_MAX_LENGTH = 24
 
 
-class RawDataDescriptor(BaseModel):
+class RawDataDescriptorModel(BaseModel):
     """
     This model represents the 'DataDescriptor' record, which is an optional footer of a ZIP file.
 
@@ -27,14 +30,16 @@ class RawDataDescriptor(BaseModel):
     CRC-32 of the uncompressed data (4 bytes). This value must match the CRC-32 calculated for the data.
     """
 
-    compressed_size: conbytes(min_length=4, max_length=4)
+    compressed_size: conbytes(min_length=4, max_length=8)
     """
-    The size of the compressed data (4 bytes). This field provides the compressed size of the file.
+    The size of the compressed data (4 bytes, or 8 bytes for Zip64 entries).
+    This field provides the compressed size of the file.
     """
 
-    uncompressed_size: conbytes(min_length=4, max_length=4)
+    uncompressed_size: conbytes(min_length=4, max_length=8)
     """
-    The size of the uncompressed data (4 bytes). This field provides the original size of the file.
+    The size of the uncompressed data (4 bytes, or 8 bytes for Zip64 entries).
+    This field provides the original size of the file.
     """
 
     def __len__(self):
@@ -42,14 +47,14 @@ class RawDataDescriptor(BaseModel):
         for _, value in self.model_dump(exclude={'signature'}).items():
             size += len(value)
 
-        if DATA_DESCRIPTOR_MAX_LENGTH < size < DATA_DESCRIPTOR_MIN_LENGTH:
+        if not DATA_DESCRIPTOR_MIN_LENGTH <= size <= ZIP64_DATA_DESCRIPTOR_MAX_LENGTH:
             raise ValueError(f"'DataDescriptor' record size is {size}, expected size in "
-                             f"range [{DATA_DESCRIPTOR_MIN_LENGTH}, {DATA_DESCRIPTOR_MAX_LENGTH}]")
+                             f"range [{DATA_DESCRIPTOR_MIN_LENGTH}, {ZIP64_DATA_DESCRIPTOR_MAX_LENGTH}]")
         return size
 
 
 
-class DataDescriptor(BaseModel):
+class DataDescriptorModel(BaseModel):
     """
     This model represents the 'DataDescriptor' record, which is an optional footer of a ZIP file.
 
@@ -58,7 +63,7 @@ class DataDescriptor(BaseModel):
     Original raw bytes are stored inside the 'raw' field in little-endian order.
     """
 
-    raw: RawDataDescriptor
+    raw: RawDataDescriptorModel
     """
     Useful if you need all the fields of this class in the original raw binary (little-endian) format
     """
@@ -74,14 +79,16 @@ class DataDescriptor(BaseModel):
     CRC-32 of the uncompressed data (4 bytes). This value must match the CRC-32 calculated for the data.
     """
 
-    compressed_size: conint(ge=0, lt=2**32)
+    compressed_size: conint(ge=0, lt=2**64)
     """
-    The size of the compressed data (4 bytes). This field provides the compressed size of the file.
+    The size of the compressed data (4 bytes, or 8 bytes for Zip64 entries).
+    This field provides the compressed size of the file.
     """
 
-    uncompressed_size: conint(ge=0, lt=2**32)
+    uncompressed_size: conint(ge=0, lt=2**64)
     """
-    The size of the uncompressed data (4 bytes). This field provides the original size of the file.
+    The size of the uncompressed data (4 bytes, or 8 bytes for Zip64 entries).
+    This field provides the original size of the file.
     """
 
     interval: Interval = None
@@ -93,6 +100,97 @@ class DataDescriptor(BaseModel):
         return len(self.raw)
 
 
-    def compare(self, new: 'DataDescriptor', filename=''):
+    def compare(self, new: 'DataDescriptorModel', filename=''):
         prefix = f'{filename}.DD' if filename else ''
         return compare_models(a=self, b=new, exclude={'raw'}, prefix=prefix)
+
+
+
+class RawDataDescriptor(RecordView):
+    """
+    Raw view of the 'DataDescriptor' record, each field is the original little-endian slice of the record.
+    Fields are the same of 'RawDataDescriptorModel', 'values[0]' tells whether the optional signature is present.
+    """
+
+    __slots__ = ()
+
+    @property
+    def _layout(self):
+        # Offset of the CRC-32 and size of each size field (4 or 8 bytes)
+        crc_start = 0 if self.values[0] is None else 4
+        return crc_start, (len(self.data) - crc_start - 4) // 2
+
+    @property
+    def signature(self) -> Optional[bytes]:
+        return None if self.values[0] is None else self.data[0:4]
+
+    @property
+    def crc32(self) -> bytes:
+        crc_start, _ = self._layout
+        return self.data[crc_start:crc_start + 4]
+
+    @property
+    def compressed_size(self) -> bytes:
+        crc_start, size = self._layout
+        return self.data[crc_start + 4:crc_start + 4 + size]
+
+    @property
+    def uncompressed_size(self) -> bytes:
+        crc_start, size = self._layout
+        return self.data[crc_start + 4 + size:crc_start + 4 + 2 * size]
+
+
+    def to_model(self) -> RawDataDescriptorModel:
+        return RawDataDescriptorModel(
+            signature         = self.signature,
+            crc32             = self.crc32,
+            compressed_size   = self.compressed_size,
+            uncompressed_size = self.uncompressed_size,
+        )
+
+
+
+class DataDescriptor(RecordView):
+    """
+    'DataDescriptor' record backed by its bytes, 'values' holds the signature (None if missing) and the sizes.
+    Fields are the same of 'DataDescriptorModel'.
+    """
+
+    __slots__ = ('interval',)
+
+    signature         = DecodedField(0)
+    compressed_size   = DecodedField(1)
+    uncompressed_size = DecodedField(2)
+
+    def __init__(self, data: bytes, values: tuple, interval: Interval = None):
+        super().__init__(data, values)
+        self.interval = interval
+
+
+    @property
+    def raw(self) -> RawDataDescriptor:
+        return RawDataDescriptor(self.data, self.values)
+
+
+    @property
+    def crc32(self) -> bytes:
+        return self.raw.crc32
+
+
+    def to_model(self) -> DataDescriptorModel:
+        return DataDescriptorModel(
+            raw               = self.raw.to_model(),
+            signature         = self.signature,
+            crc32             = self.crc32,
+            compressed_size   = self.compressed_size,
+            uncompressed_size = self.uncompressed_size,
+            interval          = self.interval,
+        )
+
+
+    def compare(self, new: 'DataDescriptor', filename=''):
+        return self.to_model().compare(new.to_model(), filename=filename)
+
+
+    def __repr__(self):
+        return f"DataDescriptor(interval={self.interval!r})"
@@ -1,8 +1,12 @@
 import logging
-from typing import BinaryIO
+from typing import BinaryIO, Union
 
 from src.zipstruct.utils.common import GeneralPurposeBitMasks, unpack_little_endian
-from src.zipstruct.descriptors.descriptor import RawDataDescriptor, DATA_DESCRIPTOR_SIGNATURE, DataDescriptor
+from src.zipstruct.utils.sources import ByteSource, as_source
+from src.zipstruct.descriptors.descriptor import (
+    RawDataDescriptor, DATA_DESCRIPTOR_SIGNATURE, DataDescriptor, DATA_DESCRIPTOR_MAX_LENGTH,
+    ZIP64_DATA_DESCRIPTOR_MAX_LENGTH
+)
 from src.zipstruct.localheaders.lfh import LocalFileHeader
 
 LOGGER = logging.getLogger("zipstruct")
@@ -12,32 +16,32 @@ def check_data_descriptor_presence(lfh: LocalFileHeader):
     return bool(lfh.general_purpose_flags & GeneralPurposeBitMasks.USE_DATA_DESCRIPTOR.value)
 
 
-def parse_data_descriptor(file: BinaryIO, offset: int):
+def parse_data_descriptor(file: Union[BinaryIO, ByteSource], offset: int, zip64: bool = False):
+    """
+    Parse the data descriptor at 'offset', if 'zip64' is set the sizes are expected to be stored in 8 bytes.
+    """
     LOGGER.debug(f"Parsing data descriptor at offset: {offset}")
-    file.seek(offset, 0)
-    signature = file.read(4)
+    max_length = ZIP64_DATA_DESCRIPTOR_MAX_LENGTH if zip64 else DATA_DESCRIPTOR_MAX_LENGTH
+    dd = bytes(as_source(file).read_at(offset, max_length))
+    signature = dd[0:4]
 
+    # The signature is optional, skip it only if present
     if signature != DATA_DESCRIPTOR_SIGNATURE:
-        crc32 = signature
         signature = None
     else:
-        crc32 = file.read(4)
-
-    rdd = RawDataDescriptor(
-        signature         = signature,
-        crc32             = crc32,
-        compressed_size   = file.read(4),
-        uncompressed_size = file.read(4),
-    )
-
-    return unpack_from_raw(rdd)
-
-
-def unpack_from_raw(rdd: RawDataDescriptor):
-    return DataDescriptor(
-        raw               = rdd,
-        signature         = unpack_little_endian(rdd.signature) if rdd.signature is not None else None,
-        crc32             = rdd.crc32,
-        compressed_size   = unpack_little_endian(rdd.compressed_size),
-        uncompressed_size = unpack_little_endian(rdd.uncompressed_size),
-    )
+        dd = dd[4:]
+
+    size = 8 if zip64 else 4
+    if len(dd) < 4 + 2 * size:
+        raise ValueError(f"Incomplete 'DataDescriptor' record, found {len(dd)} bytes but expected {4 + 2 * size}")
+
+    data = (signature or b'') + dd[:4 + 2 * size]
+    return unpack_from_raw(RawDataDescriptor(data, (signature,)))
+
+
+def unpack_from_raw(rdd: RawDataDescriptor) -> DataDescriptor:
+    return DataDescriptor(rdd.data, (
+        unpack_little_endian(rdd.signature) if rdd.signature is not None else None,
+        unpack_little_endian(rdd.compressed_size),
+        unpack_little_endian(rdd.uncompressed_size),
+    ))
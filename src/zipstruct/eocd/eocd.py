@@ -1,5 +1,8 @@
+from typing import Optional
+
 from intervaltree import Interval
 from src.zipstruct.utils.common import compare_models
+from src.zipstruct.eocd.zip64 import Zip64EndOfCentralDirectory, Zip64EndOfCentralDirectoryLocator
 from pydantic import BaseModel, conbytes, conint
 
 EOCD_SIGNATURE = b'\x50\x4b\x05\x06'
@@ -152,10 +155,46 @@ class EndOfCentralDirectory(BaseModel):
     This is a custom field, it is not compliant with the standard.
     """
 
+    zip64_locator: Optional[Zip64EndOfCentralDirectoryLocator] = None
+    """
+    This is a custom field, it is the Zip64 End of Central Directory Locator placed right before the EOCD (if any).
+    """
+
+    zip64: Optional[Zip64EndOfCentralDirectory] = None
+    """
+    This is a custom field, it is the Zip64 End of Central Directory record pointed by the locator (if any).
+    """
+
+
+    @property
+    def total_entries(self) -> int:
+        """ Total number of entries in the central directory, taken from the Zip64 record if present """
+        return self.zip64.total_entries_in_central_dir if self.zip64 else self.total_entries_in_central_dir
+
+
+    @property
+    def central_dir_size(self) -> int:
+        """ Size of the central directory, taken from the Zip64 record if present """
+        return self.zip64.size_of_central_dir if self.zip64 else self.size_of_central_dir
+
+
+    @property
+    def central_dir_offset(self) -> int:
+        """ Offset of the start of the central directory, taken from the Zip64 record if present """
+        if self.zip64:
+            return self.zip64.offset_of_start_of_central_directory
+        return self.offset_of_start_of_central_directory
+
 
     def __len__(self):
         return len(self.raw)
 
 
     def compare(self, new: 'EndOfCentralDirectory'):
-        return compare_models(a=self, b=new, exclude={'raw'}, prefix='EOCD')
+        compare_models(a=self, b=new, exclude={'raw', 'zip64', 'zip64_locator'}, prefix='EOCD')
+        if self.zip64 is None or new.zip64 is None:
+            if self.zip64 is not new.zip64:
+                print(f"diff 'EOCD.zip64': {self.zip64 is not None} != {new.zip64 is not None}")
+            return
+        self.zip64.compare(new.zip64)
+        self.zip64_locator.compare(new.zip64_locator)
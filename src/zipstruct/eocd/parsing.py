@@ -1,36 +1,87 @@
 import struct
-from typing import BinaryIO
+from typing import BinaryIO, Optional, Tuple, Union
 
 from src.zipstruct.utils.common import unpack_little_endian
+from src.zipstruct.utils.sources import ByteSource, as_source
 from src.zipstruct.eocd.eocd import RawEocd, EOCD_MIN_LENGTH, EndOfCentralDirectory, EOCD_SIGNATURE
+from src.zipstruct.eocd.zip64 import (
+    RawZip64EndOfCentralDirectoryLocator, Zip64EndOfCentralDirectoryLocator, ZIP64_EOCD_LOCATOR_SIGNATURE,
+    ZIP64_EOCD_LOCATOR_LENGTH, RawZip64EndOfCentralDirectory, Zip64EndOfCentralDirectory, ZIP64_EOCD_SIGNATURE,
+    ZIP64_EOCD_MIN_LENGTH
+)
 
 import logging
 LOGGER = logging.getLogger("zipstruct")
 
-def search_eocd_signature(f: BinaryIO) -> int:
-    """ Find the EOCD signature by searching backward in the file """
-    # Seek to end of the file
-    f.seek(0, 2)
-    file_size = f.tell()
+# The first read covers an EOCD without comment, the window grows by this factor until it covers the longest one
+EOCD_SEARCH_GROWTH = 8
+EOCD_MAX_LENGTH = EOCD_MIN_LENGTH + 0xFFFF
 
-    # Take care of the length-variable comment
-    max_comment_length = 2 ** 16
-    search_range = min(file_size, 22 + max_comment_length)
-    f.seek(-search_range, 2)
-    data = f.read(search_range)
 
-    # Find the EOCD signature (0x06054b50) within the search range
-    eocd_offset = data.rfind(EOCD_SIGNATURE)
-    if eocd_offset == -1:
-        raise ValueError("EOCD signature not found. Not a valid ZIP file.")
-    return eocd_offset
+def is_valid_eocd(data: bytes, index: int, eocd_offset: int) -> bool:
+    """
+    Whether the EOCD signature at 'index' of 'data' (the tail of the file, starting from absolute offset
+    'eocd_offset - index') is a real EOCD: its comment must end exactly at the end of the file and its central
+    directory must fit inside the file before it (unless its fields are set to the Zip64 placeholders).
+    """
+    if len(data) - index < EOCD_MIN_LENGTH:
+        return False
+    cd_size, cd_offset, comment_length = struct.unpack_from('<IIH', data, index + 12)
+    if index + EOCD_MIN_LENGTH + comment_length != len(data):
+        return False
+    if cd_size == 0xFFFFFFFF or cd_offset == 0xFFFFFFFF:
+        return True
+    return cd_offset + cd_size <= eocd_offset
 
 
-def parse_eocd(f: BinaryIO, eocd_offset: int) -> EndOfCentralDirectory:
-    # Seek to the start of the EOCD and load it in memory
-    f.seek(eocd_offset, 0)
-    eocd = f.read(-1)
+def find_eocd(f: Union[BinaryIO, ByteSource]) -> Tuple[int, bytes]:
+    """
+    Search backward the EOCD, return its offset and its bytes (comment included) up to the end of the file.
+    Only the last 'EOCD_MIN_LENGTH' bytes are read at first (archives without comment need nothing else), then
+    the window grows by 'EOCD_SEARCH_GROWTH' times, reading only the bytes not read yet, up to the longest EOCD.
+    Each signature found is validated (see 'is_valid_eocd'), so that signatures inside the comment are skipped.
+    """
+    source = as_source(f)
+    file_size = source.size
+    max_length = min(file_size, EOCD_MAX_LENGTH)
 
+    data, length, candidates = b'', min(file_size, EOCD_MIN_LENGTH), 0
+    while True:
+        start = file_size - length
+        new = bytes(source.read_at(start, length - len(data)))
+        # Signatures starting inside the bytes read before have already been checked
+        searched = len(new) + len(EOCD_SIGNATURE) - 1 if data else len(new)
+        data = new + data
+        while True:
+            index = data.rfind(EOCD_SIGNATURE, 0, searched)
+            if index < 0:
+                break
+            candidates += 1
+            if is_valid_eocd(data, index, start + index):
+                return start + index, data[index:]
+            searched = index + len(EOCD_SIGNATURE) - 1
+        if length >= max_length:
+            break
+        length = min(length * EOCD_SEARCH_GROWTH, max_length)
+
+    if candidates:
+        raise ValueError(f"EOCD not found, none of the {candidates} EOCD signatures found in the last {length} "
+                         f"bytes is valid. Not a valid ZIP file.")
+    raise ValueError("EOCD signature not found. Not a valid ZIP file.")
+
+
+def search_eocd_signature(f: Union[BinaryIO, ByteSource]) -> int:
+    """ Find the EOCD signature by searching backward in the file, see 'find_eocd' """
+    return find_eocd(f)[0]
+
+
+def parse_eocd(f: Union[BinaryIO, ByteSource], eocd_offset: int) -> EndOfCentralDirectory:
+    # Load in memory the EOCD, up to the end of the file
+    return parse_eocd_from_buffer(bytes(as_source(f).read_at(eocd_offset, -1)))
+
+
+def parse_eocd_from_buffer(eocd: bytes) -> EndOfCentralDirectory:
+    """ Parse the EOCD at the beginning of 'eocd', which spans up to the end of the file """
     # Check size
     if len(eocd) < EOCD_MIN_LENGTH:
         raise ValueError(f"Incomplete EOCD record, found {len(eocd)} bytes but minimum is {EOCD_MIN_LENGTH}.")
@@ -75,3 +126,84 @@ def unpack_from_raw(reocd: RawEocd):
         comment_length                            = unpack_little_endian(reocd.comment_length),
         comment                                   = unpack_little_endian(reocd.comment, encoding='utf-8'),
     )
+
+
+def search_zip64_locator(f: Union[BinaryIO, ByteSource], eocd_offset: int) -> Optional[int]:
+    """ The Zip64 EOCD locator (if any) must immediately precede the EOCD, return its offset or None """
+    offset = eocd_offset - ZIP64_EOCD_LOCATOR_LENGTH
+    if offset < 0:
+        return None
+    if bytes(as_source(f).read_at(offset, 4)) != ZIP64_EOCD_LOCATOR_SIGNATURE:
+        return None
+    return offset
+
+
+def parse_zip64_locator(f: Union[BinaryIO, ByteSource], offset: int) -> Zip64EndOfCentralDirectoryLocator:
+    locator = bytes(as_source(f).read_at(offset, ZIP64_EOCD_LOCATOR_LENGTH))
+    if len(locator) < ZIP64_EOCD_LOCATOR_LENGTH:
+        raise ValueError(f"Incomplete Zip64 EOCD locator record, found {len(locator)} bytes "
+                         f"but expected {ZIP64_EOCD_LOCATOR_LENGTH}.")
+    if locator[0:4] != ZIP64_EOCD_LOCATOR_SIGNATURE:
+        raise ValueError(f"'{locator[0:4]}' is an invalid Zip64 EOCD locator signature")
+
+    rlocator = RawZip64EndOfCentralDirectoryLocator(
+        signature              = locator[0:4],
+        zip64_eocd_disk_number = locator[4:8],
+        offset_of_zip64_eocd   = locator[8:16],
+        total_number_of_disks  = locator[16:20],
+    )
+    return Zip64EndOfCentralDirectoryLocator(
+        raw                    = rlocator,
+        signature              = unpack_little_endian(rlocator.signature),
+        zip64_eocd_disk_number = unpack_little_endian(rlocator.zip64_eocd_disk_number),
+        offset_of_zip64_eocd   = unpack_little_endian(rlocator.offset_of_zip64_eocd),
+        total_number_of_disks  = unpack_little_endian(rlocator.total_number_of_disks),
+    )
+
+
+def parse_zip64_eocd(f: Union[BinaryIO, ByteSource], offset: int) -> Zip64EndOfCentralDirectory:
+    source = as_source(f)
+    eocd = bytes(source.read_at(offset, ZIP64_EOCD_MIN_LENGTH))
+    if len(eocd) < ZIP64_EOCD_MIN_LENGTH:
+        raise ValueError(f"Incomplete Zip64 EOCD record, found {len(eocd)} bytes "
+                         f"but minimum is {ZIP64_EOCD_MIN_LENGTH}.")
+    if eocd[0:4] != ZIP64_EOCD_SIGNATURE:
+        raise ValueError(f"'{eocd[0:4]}' is an invalid Zip64 EOCD signature")
+
+    # The size of the record does not include the leading 12 bytes
+    size = struct.unpack('<Q', eocd[4:12])[0]
+    if size < ZIP64_EOCD_MIN_LENGTH - 12:
+        raise ValueError(f"Invalid Zip64 EOCD record size: {size}")
+    extensible_length = size - (ZIP64_EOCD_MIN_LENGTH - 12)
+    extensible_data = bytes(source.read_at(offset + ZIP64_EOCD_MIN_LENGTH, extensible_length))
+    if len(extensible_data) != extensible_length:
+        raise ValueError(f"Incomplete Zip64 EOCD record, found {len(extensible_data)} bytes "
+                         f"of extensible data but expected {extensible_length}.")
+
+    reocd = RawZip64EndOfCentralDirectory(
+        signature                                 = eocd[0:4],
+        size_of_zip64_eocd                        = eocd[4:12],
+        version_made_by                           = eocd[12:14],
+        version_needed_to_extract                 = eocd[14:16],
+        disk_number                               = eocd[16:20],
+        central_dir_start_disk_number             = eocd[20:24],
+        total_entries_in_central_dir_on_this_disk = eocd[24:32],
+        total_entries_in_central_dir              = eocd[32:40],
+        size_of_central_dir                       = eocd[40:48],
+        offset_of_start_of_central_directory      = eocd[48:56],
+        extensible_data                           = extensible_data,
+    )
+    return Zip64EndOfCentralDirectory(
+        raw                                       = reocd,
+        signature                                 = unpack_little_endian(reocd.signature),
+        size_of_zip64_eocd                        = unpack_little_endian(reocd.size_of_zip64_eocd),
+        version_made_by                           = unpack_little_endian(reocd.version_made_by),
+        version_needed_to_extract                 = unpack_little_endian(reocd.version_needed_to_extract),
+        disk_number                               = unpack_little_endian(reocd.disk_number),
+        central_dir_start_disk_number             = unpack_little_endian(reocd.central_dir_start_disk_number),
+        total_entries_in_central_dir_on_this_disk = unpack_little_endian(reocd.total_entries_in_central_dir_on_this_disk),
+        total_entries_in_central_dir              = unpack_little_endian(reocd.total_entries_in_central_dir),
+        size_of_central_dir                       = unpack_little_endian(reocd.size_of_central_dir),
+        offset_of_start_of_central_directory      = unpack_little_endian(reocd.offset_of_start_of_central_directory),
+        extensible_data                           = reocd.extensible_data,
+    )
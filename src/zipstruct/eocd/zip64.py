@@ -0,0 +1,262 @@
+from intervaltree import Interval
+from src.zipstruct.utils.common import compare_models
+from pydantic import BaseModel, conbytes, conint
+
+ZIP64_EOCD_SIGNATURE = b'\x50\x4b\x06\x06'
+INT_ZIP64_EOCD_SIGNATURE = 0x06064b50
+ZIP64_EOCD_MIN_LENGTH = 56
+
+ZIP64_EOCD_LOCATOR_SIGNATURE = b'\x50\x4b\x06\x07'
+INT_ZIP64_EOCD_LOCATOR_SIGNATURE = 0x07064b50
+ZIP64_EOCD_LOCATOR_LENGTH = 20
+
+
+class RawZip64EndOfCentralDirectoryLocator(BaseModel):
+    """
+    This model represents the Zip64 End of Central Directory Locator, which is placed right before the EOCD
+    and points to the Zip64 End of Central Directory record.
+
+    Details can be found in section '4.3.15' of: https://pkware.cachefly.net/webdocs/casestudies/APPNOTE.TXT
+    """
+
+    signature: conbytes(min_length=4, max_length=4) = ZIP64_EOCD_LOCATOR_SIGNATURE
+    """
+    Zip64 End of Central Directory Locator signature (4 bytes).
+    This field has a fixed value of b'\x50\x4b\x06\x07'.
+    """
+
+    zip64_eocd_disk_number: conbytes(min_length=4, max_length=4)
+    """
+    Number of the disk containing the start of the Zip64 End of Central Directory record (4 bytes).
+    """
+
+    offset_of_zip64_eocd: conbytes(min_length=8, max_length=8)
+    """
+    Offset (in bytes) of the Zip64 End of Central Directory record from the start of the archive (8 bytes).
+    """
+
+    total_number_of_disks: conbytes(min_length=4, max_length=4)
+    """
+    Total number of disks (4 bytes), it is 1 for archives that are not split.
+    """
+
+    def __len__(self):
+        size = len(self.signature) + len(self.zip64_eocd_disk_number) + len(self.offset_of_zip64_eocd)
+        size += len(self.total_number_of_disks)
+        if size != ZIP64_EOCD_LOCATOR_LENGTH:
+            raise ValueError(f"Zip64 EOCD locator record size is {size}, expected {ZIP64_EOCD_LOCATOR_LENGTH}")
+        return size
+
+
+
+class Zip64EndOfCentralDirectoryLocator(BaseModel):
+    """
+    This model represents the Zip64 End of Central Directory Locator, which is placed right before the EOCD
+    and points to the Zip64 End of Central Directory record.
+
+    Details can be found in section '4.3.15' of: https://pkware.cachefly.net/webdocs/casestudies/APPNOTE.TXT
+
+    Original raw bytes are stored inside the 'raw' field in little-endian order.
+    """
+
+    raw: RawZip64EndOfCentralDirectoryLocator
+    """
+    Useful if you need all the fields of this class in the original raw binary (little-endian) format
+    """
+
+    signature: int = INT_ZIP64_EOCD_LOCATOR_SIGNATURE
+    """
+    Zip64 End of Central Directory Locator signature (4 bytes).
+    This field has a fixed value of '0x07064b50'.
+    """
+
+    zip64_eocd_disk_number: conint(ge=0, lt=2**32)
+    """
+    Number of the disk containing the start of the Zip64 End of Central Directory record (4 bytes).
+    """
+
+    offset_of_zip64_eocd: conint(ge=0, lt=2**64)
+    """
+    Offset (in bytes) of the Zip64 End of Central Directory record from the start of the archive (8 bytes).
+    """
+
+    total_number_of_disks: conint(ge=0, lt=2**32)
+    """
+    Total number of disks (4 bytes), it is 1 for archives that are not split.
+    """
+
+    interval: Interval = None
+    """
+    This is a custom field, it is not compliant with the standard.
+    """
+
+
+    def __len__(self):
+        return len(self.raw)
+
+
+    def compare(self, new: 'Zip64EndOfCentralDirectoryLocator'):
+        return compare_models(a=self, b=new, exclude={'raw'}, prefix='ZIP64_LOCATOR')
+
+
+
+class RawZip64EndOfCentralDirectory(BaseModel):
+    """
+    This model represents the Zip64 End of Central Directory record, which stores the 64-bit version of the
+    EOCD fields, it is used when the archive is too big or has too many entries for the EOCD.
+
+    Details can be found in section '4.3.14' of: https://pkware.cachefly.net/webdocs/casestudies/APPNOTE.TXT
+    """
+
+    signature: conbytes(min_length=4, max_length=4) = ZIP64_EOCD_SIGNATURE
+    """
+    Zip64 End of Central Directory signature (4 bytes).
+    This field has a fixed value of b'\x50\x4b\x06\x06'.
+    """
+
+    size_of_zip64_eocd: conbytes(min_length=8, max_length=8)
+    """
+    Size of the remaining record (8 bytes), it does not include the leading 12 bytes (signature and this field).
+    """
+
+    version_made_by: conbytes(min_length=2, max_length=2)
+    """
+    The version of the ZIP specification used to create the archive (2 bytes).
+    """
+
+    version_needed_to_extract: conbytes(min_length=2, max_length=2)
+    """
+    Minimum version of the ZIP specification needed to extract the archive (2 bytes).
+    """
+
+    disk_number: conbytes(min_length=4, max_length=4)
+    """
+    The number of the disk containing this record (4 bytes).
+    """
+
+    central_dir_start_disk_number: conbytes(min_length=4, max_length=4)
+    """
+    Number of the disk that contains the start of the central directory (4 bytes).
+    """
+
+    total_entries_in_central_dir_on_this_disk: conbytes(min_length=8, max_length=8)
+    """
+    The total number of entries in the central directory on this disk (8 bytes).
+    """
+
+    total_entries_in_central_dir: conbytes(min_length=8, max_length=8)
+    """
+    The total number of entries in the central directory across all disks (8 bytes).
+    """
+
+    size_of_central_dir: conbytes(min_length=8, max_length=8)
+    """
+    The total size of the central directory in bytes (8 bytes).
+    """
+
+    offset_of_start_of_central_directory: conbytes(min_length=8, max_length=8)
+    """
+    The offset (in bytes) from the start of the archive to the beginning of the central directory (8 bytes).
+    """
+
+    extensible_data: conbytes(min_length=0)
+    """
+    Zip64 extensible data sector (variable length), reserved for use by PKWARE.
+    """
+
+    def __len__(self):
+        size = 0
+        for _, value in self.model_dump(exclude={'extensible_data'}).items():
+            size += len(value)
+
+        if size != ZIP64_EOCD_MIN_LENGTH:
+            raise ValueError(f"Zip64 EOCD record size is {size} (without extensible data), "
+                             f"expected {ZIP64_EOCD_MIN_LENGTH}")
+        return size + len(self.extensible_data)
+
+
+
+class Zip64EndOfCentralDirectory(BaseModel):
+    """
+    This model represents the Zip64 End of Central Directory record, which stores the 64-bit version of the
+    EOCD fields, it is used when the archive is too big or has too many entries for the EOCD.
+
+    Details can be found in section '4.3.14' of: https://pkware.cachefly.net/webdocs/casestudies/APPNOTE.TXT
+
+    Original raw bytes are stored inside the 'raw' field in little-endian order.
+    """
+
+    raw: RawZip64EndOfCentralDirectory
+    """
+    Useful if you need all the fields of this class in the original raw binary (little-endian) format
+    """
+
+    signature: int = INT_ZIP64_EOCD_SIGNATURE
+    """
+    Zip64 End of Central Directory signature (4 bytes).
+    This field has a fixed value of '0x06064b50'.
+    """
+
+    size_of_zip64_eocd: conint(ge=0, lt=2**64)
+    """
+    Size of the remaining record (8 bytes), it does not include the leading 12 bytes (signature and this field).
+    """
+
+    version_made_by: conint(ge=0, lt=2**16)
+    """
+    The version of the ZIP specification used to create the archive (2 bytes).
+    """
+
+    version_needed_to_extract: conint(ge=0, lt=2**16)
+    """
+    Minimum version of the ZIP specification needed to extract the archive (2 bytes).
+    """
+
+    disk_number: conint(ge=0, lt=2**32)
+    """
+    The number of the disk containing this record (4 bytes).
+    """
+
+    central_dir_start_disk_number: conint(ge=0, lt=2**32)
+    """
+    Number of the disk that contains the start of the central directory (4 bytes).
+    """
+
+    total_entries_in_central_dir_on_this_disk: conint(ge=0, lt=2**64)
+    """
+    The total number of entries in the central directory on this disk (8 bytes).
+    """
+
+    total_entries_in_central_dir: conint(ge=0, lt=2**64)
+    """
+    The total number of entries in the central directory across all disks (8 bytes).
+    """
+
+    size_of_central_dir: conint(ge=0, lt=2**64)
+    """
+    The total size of the central directory in bytes (8 bytes).
+    """
+
+    offset_of_start_of_central_directory: conint(ge=0, lt=2**64)
+    """
+    The offset (in bytes) from the start of the archive to the beginning of the central directory (8 bytes).
+    """
+
+    extensible_data: bytes = b''
+    """
+    This is not parsed and will be equal to the raw version.
+    Zip64 extensible data sector (variable length), reserved for use by PKWARE.
+    """
+
+    interval: Interval = None
+    """
+    This is a custom field, it is not compliant with the standard.
+    """
+
+
+    def __len__(self):
+        return len(self.raw)
+
+
+    def compare(self, new: 'Zip64EndOfCentralDirectory'):
+        return compare_models(a=self, b=new, exclude={'raw'}, prefix='ZIP64_EOCD')
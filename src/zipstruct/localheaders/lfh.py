@@ -1,9 +1,11 @@
+import struct
 import sys
 from typing import Optional
 
 from intervaltree import Interval
 
-from src.zipstruct.utils.common import compare_models
+from src.zipstruct.utils.common import compare_models, unpack_little_endian, GeneralPurposeBitMasks
+from src.zipstruct.utils.records import RecordView, RawField, DecodedField
 from pydantic import BaseModel, conbytes, conint
 
 import logging
@@ -18,8 +20,11 @@ LFH_SIGNATURE = b'\x50\x4b\x03\x04'
 INT_LFH_SIGNATURE = 0x04034b50
 MIN_LOCAL_FILE_HEADER = 30
 
+# Fixed-size part of the record, see section '4.3.7' of the APPNOTE
+LOCAL_FILE_HEADER_STRUCT = struct.Struct('<IHHHHHIIIHH')
 
-class RawLocalFileHeader(BaseModel):
+
+class RawLocalFileHeaderModel(BaseModel):
     """
     This model represents the Local File Header, which describes a file stored in a ZIP archive.
 
@@ -114,7 +119,7 @@ class RawLocalFileHeader(BaseModel):
 
 
 
-class LocalFileHeader(BaseModel):
+class LocalFileHeaderModel(BaseModel):
     """
     This model represents the Local File Header, which describes a file stored in a ZIP archive.
 
@@ -123,7 +128,7 @@ class LocalFileHeader(BaseModel):
     Original raw bytes are stored inside the 'raw' field in little-endian order.
     """
 
-    raw: RawLocalFileHeader
+    raw: RawLocalFileHeaderModel
     """
     Useful if you need all the fields of this class in the original raw binary (little-endian) format
     """
@@ -170,15 +175,15 @@ class LocalFileHeader(BaseModel):
     The CRC-32 checksum of the file data (4 bytes). This value is used to verify the integrity of the file contents.
     """
 
-    compressed_size: conint(ge=0, lt=2**32)
+    compressed_size: conint(ge=0, lt=2**64)
     """
-    The size of the compressed file data in bytes (4 bytes).
+    The size of the compressed file data in bytes (4 bytes, or 8 bytes from the Zip64 extra field).
     If the file is stored without compression, this equals the uncompressed size.
     """
 
-    uncompressed_size: conint(ge=0, lt=2**32)
+    uncompressed_size: conint(ge=0, lt=2**64)
     """
-    The size of the uncompressed file data in bytes (4 bytes).
+    The size of the uncompressed file data in bytes (4 bytes, or 8 bytes from the Zip64 extra field).
     """
 
     file_name_length: conint(ge=0, lt=2**16)
@@ -210,10 +215,141 @@ class LocalFileHeader(BaseModel):
     This is a custom field, it is not compliant with the standard.
     """
 
+    zip64: bool = False
+    """
+    This is a custom field, it is True when the Zip64 extended information extra field is present.
+    In that case sizes inside the data descriptor (if any) are stored in 8 bytes.
+    """
+
     def __len__(self):
         return len(self.raw)
 
 
-    def compare(self, new: 'LocalFileHeader', filename=''):
+    def compare(self, new: 'LocalFileHeaderModel', filename=''):
         prefix = f'{filename}.LFH' if filename else ''
         return compare_models(a=self, b=new, exclude={'raw'}, prefix=prefix)
+
+
+
+class RawLocalFileHeader(RecordView):
+    """
+    Raw view of the Local File Header, each field is the original little-endian slice of the record.
+    Fields are the same of 'RawLocalFileHeaderModel'.
+    """
+
+    __slots__ = ()
+
+    signature                  = RawField(0, 4)
+    version_needed_to_extract  = RawField(4, 6)
+    general_purpose_flags      = RawField(6, 8)
+    compression_method         = RawField(8, 10)
+    file_last_mod_time         = RawField(10, 12)
+    file_last_mod_date         = RawField(12, 14)
+    crc32                      = RawField(14, 18)
+    compressed_size            = RawField(18, 22)
+    uncompressed_size          = RawField(22, 26)
+    file_name_length           = RawField(26, 28)
+    extra_field_length         = RawField(28, 30)
+
+    @property
+    def file_name(self) -> bytes:
+        return self.data[MIN_LOCAL_FILE_HEADER:MIN_LOCAL_FILE_HEADER + self.values[9]]
+
+    @property
+    def extra_field(self) -> bytes:
+        return self.data[MIN_LOCAL_FILE_HEADER + self.values[9]:]
+
+
+    def to_model(self) -> RawLocalFileHeaderModel:
+        return RawLocalFileHeaderModel(
+            signature                  = self.signature,
+            version_needed_to_extract  = self.version_needed_to_extract,
+            general_purpose_flags      = self.general_purpose_flags,
+            compression_method         = self.compression_method,
+            file_last_mod_time         = self.file_last_mod_time,
+            file_last_mod_date         = self.file_last_mod_date,
+            crc32                      = self.crc32,
+            compressed_size            = self.compressed_size,
+            uncompressed_size          = self.uncompressed_size,
+            file_name_length           = self.file_name_length,
+            extra_field_length         = self.extra_field_length,
+            file_name                  = self.file_name,
+            extra_field                = self.extra_field,
+        )
+
+
+
+class LocalFileHeader(RecordView):
+    """
+    Local File Header backed by the bytes of the record, 'values' holds the integers unpacked with
+    'LOCAL_FILE_HEADER_STRUCT' where sizes are already resolved from the Zip64 extra field.
+    Fields are the same of 'LocalFileHeaderModel', the file name is decoded on first access.
+    """
+
+    __slots__ = ('interval', 'zip64', '_file_name')
+
+    signature                  = DecodedField(0)
+    version_needed_to_extract  = DecodedField(1)
+    general_purpose_flags      = DecodedField(2)
+    compression_method         = DecodedField(3)
+    file_last_mod_time         = RawField(10, 12)
+    file_last_mod_date         = RawField(12, 14)
+    crc32                      = RawField(14, 18)
+    compressed_size            = DecodedField(7)
+    uncompressed_size          = DecodedField(8)
+    file_name_length           = DecodedField(9)
+    extra_field_length         = DecodedField(10)
+
+    def __init__(self, data: bytes, values: tuple, zip64: bool = False, interval: Interval = None):
+        super().__init__(data, values)
+        self.zip64 = zip64
+        self.interval = interval
+        self._file_name = None
+
+
+    @property
+    def raw(self) -> RawLocalFileHeader:
+        return RawLocalFileHeader(self.data, self.values)
+
+
+    @property
+    def file_name(self) -> str:
+        if self._file_name is None:
+            ### 4.4.4 general purpose bit flag: (2 bytes)
+            utf8 = self.values[2] & GeneralPurposeBitMasks.UTF8_LANGUAGE_ENCODING.value
+            self._file_name = unpack_little_endian(self.raw.file_name, encoding='utf-8' if utf8 else 'cp437')
+        return self._file_name
+
+
+    @property
+    def extra_field(self) -> bytes:
+        return self.raw.extra_field
+
+
+    def to_model(self) -> LocalFileHeaderModel:
+        return LocalFileHeaderModel(
+            raw                        = self.raw.to_model(),
+            signature                  = self.signature,
+            version_needed_to_extract  = self.version_needed_to_extract,
+            general_purpose_flags      = self.general_purpose_flags,
+            compression_method         = self.compression_method,
+            file_last_mod_time         = self.file_last_mod_time,
+            file_last_mod_date         = self.file_last_mod_date,
+            crc32                      = self.crc32,
+            compressed_size            = self.compressed_size,
+            uncompressed_size          = self.uncompressed_size,
+            file_name_length           = self.file_name_length,
+            extra_field_length         = self.extra_field_length,
+            file_name                  = self.file_name,
+            extra_field                = self.extra_field,
+            interval                   = self.interval,
+            zip64                      = self.zip64,
+        )
+
+
+    def compare(self, new: 'LocalFileHeader', filename=''):
+        return self.to_model().compare(new.to_model(), filename=filename)
+
+
+    def __repr__(self):
+        return f"LocalFileHeader(file_name={self.file_name!r}, interval={self.interval!r})"
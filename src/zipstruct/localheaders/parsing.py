@@ -1,66 +1,47 @@
-from src.zipstruct.utils.common import unpack_little_endian, GeneralPurposeBitMasks
-from src.zipstruct.localheaders.lfh import LFH_SIGNATURE, RawLocalFileHeader, LocalFileHeader
-from typing import BinaryIO
-import struct
+from src.zipstruct.utils.common import unpack_zip64_extra_field, ZIP64_PLACEHOLDER_32
+from src.zipstruct.utils.sources import ByteSource, as_source
+from src.zipstruct.localheaders.lfh import (
+    LFH_SIGNATURE, RawLocalFileHeader, LocalFileHeader, MIN_LOCAL_FILE_HEADER, LOCAL_FILE_HEADER_STRUCT
+)
+from typing import BinaryIO, Union
 
 import logging
 LOGGER = logging.getLogger("zipstruct")
 
 
-def parse_local_file_header(file: BinaryIO, offset: int):
+def parse_local_file_header(file: Union[BinaryIO, ByteSource], offset: int):
     LOGGER.debug(f"Parsing local file header at offset: {offset}")
-    file.seek(offset, 0)
-    signature = file.read(4)
+    source = as_source(file)
+    lfh = bytes(source.read_at(offset, MIN_LOCAL_FILE_HEADER))
+    signature = lfh[0:4]
     if signature != LFH_SIGNATURE:
         raise Exception(f"Not a valid zipfile, the local file header does not have a valid "
                         f"signature (read: {signature}, expected: {LFH_SIGNATURE})")
-
-    rlfh = RawLocalFileHeader(
-        signature                  = signature,
-        version_needed_to_extract  = file.read(2),
-        general_purpose_flags      = file.read(2),
-        compression_method         = file.read(2),
-        file_last_mod_time         = file.read(2),
-        file_last_mod_date         = file.read(2),
-        crc32                      = file.read(4),
-        compressed_size            = file.read(4),
-        uncompressed_size          = file.read(4),
-        file_name_length           = file.read(2),
-        extra_field_length         = file.read(2),
-        # file_name
-        # extra_field
-    )
+    if len(lfh) < MIN_LOCAL_FILE_HEADER:
+        raise ValueError(f"Incomplete LocalFileHeader record, found {len(lfh)} bytes "
+                         f"but minimum is {MIN_LOCAL_FILE_HEADER}.")
 
     # Loading attributes having a variable length
-    fn_length = struct.unpack('<H', rlfh.file_name_length)[0]
-    ef_length = struct.unpack('<H', rlfh.extra_field_length)[0]
-
-    rlfh.file_name = file.read(fn_length) if fn_length > 0 else b''
-    rlfh.extra_field = file.read(ef_length) if ef_length > 0 else b''
-
-    LOGGER.debug(f"Parsed local file header of file '{unpack_little_endian(rlfh.file_name, encoding='utf-8')}'")
-
-    return unpack_from_raw(rlfh)
-
-
-def unpack_from_raw(rlfh: RawLocalFileHeader):
-    ### 4.4.4 general purpose bit flag: (2 bytes)
-    gpb = struct.unpack('<H', rlfh.general_purpose_flags)[0]
-    utf8 = bool(gpb & GeneralPurposeBitMasks.UTF8_LANGUAGE_ENCODING.value)
-    encoding = 'utf-8' if utf8 else 'cp437'
-    return LocalFileHeader(
-        raw                        = rlfh,
-        signature                  = unpack_little_endian(rlfh.signature),
-        version_needed_to_extract  = unpack_little_endian(rlfh.version_needed_to_extract),
-        general_purpose_flags      = gpb,
-        compression_method         = unpack_little_endian(rlfh.compression_method),
-        file_last_mod_time         = rlfh.file_last_mod_time,
-        file_last_mod_date         = rlfh.file_last_mod_date,
-        crc32                      = rlfh.crc32,
-        compressed_size            = unpack_little_endian(rlfh.compressed_size),
-        uncompressed_size          = unpack_little_endian(rlfh.uncompressed_size),
-        file_name_length           = unpack_little_endian(rlfh.file_name_length),
-        extra_field_length         = unpack_little_endian(rlfh.extra_field_length),
-        file_name                  = unpack_little_endian(rlfh.file_name, encoding=encoding),
-        extra_field                = rlfh.extra_field,
+    values = LOCAL_FILE_HEADER_STRUCT.unpack(lfh)
+    fn_length, ef_length = values[9:11]
+    variable = bytes(source.read_at(offset + MIN_LOCAL_FILE_HEADER, fn_length + ef_length))
+    if len(variable) != fn_length + ef_length:
+        raise ValueError(f"Incomplete LocalFileHeader record, found {len(variable)} bytes of file name and "
+                         f"extra field but expected {fn_length + ef_length}")
+
+    lfh = unpack_from_raw(RawLocalFileHeader(lfh + variable, values))
+    LOGGER.debug(f"Parsed local file header of file '{lfh.file_name}'")
+    return lfh
+
+
+def unpack_from_raw(rlfh: RawLocalFileHeader) -> LocalFileHeader:
+    values = LOCAL_FILE_HEADER_STRUCT.unpack_from(rlfh.data)
+    if values[10] == 0:
+        return LocalFileHeader(rlfh.data, values)
+
+    # The Zip64 extra field may be present even if sizes are not placeholders (i.e., when a data descriptor
+    # follows), in that case the data descriptor stores 8-byte sizes
+    (uncompressed_size, compressed_size), zip64 = unpack_zip64_extra_field(
+        rlfh.extra_field, [values[8], values[7]], [ZIP64_PLACEHOLDER_32, ZIP64_PLACEHOLDER_32]
     )
+    return LocalFileHeader(rlfh.data, values[:7] + (compressed_size, uncompressed_size) + values[9:], zip64=zip64)
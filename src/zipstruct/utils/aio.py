@@ -0,0 +1,129 @@
+import asyncio
+import weakref
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Callable, Optional, Any, List, Sequence
+
+import logging
+LOGGER = logging.getLogger("zipstruct")
+
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_MAX_ARCHIVES = 8
+# Amount of work done by a single step, the async API can be cancelled only between steps
+DEFAULT_STEP_ENTRIES = 256
+DEFAULT_STEP_BYTES = 4 * 1024 * 1024
+
+
+class StepRunner:
+    """
+    Run blocking steps one after the other on the pool of an 'AsyncExecutor', see 'AsyncExecutor.steps'.
+    When the awaiting task is cancelled, the running step cannot be interrupted: 'on_exit' is delayed until it
+    completes, so that resources used by the step (i.e., an open source) are released only when unused.
+    """
+
+    def __init__(self, pool: ThreadPoolExecutor, on_exit: Callable[[], Any] = None):
+        self.pool = pool
+        self.on_exit = on_exit
+        self.pending: Optional[Future] = None
+
+    async def __call__(self, func: Callable, *args, **kwargs) -> Any:
+        self.pending = self.pool.submit(func, *args, **kwargs)
+        return await asyncio.wrap_future(self.pending)
+
+    async def __aenter__(self) -> 'StepRunner':
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        if self.on_exit is None:
+            return
+        if self.pending is None or self.pending.done():
+            self.on_exit()
+        else:
+            LOGGER.debug("Task cancelled while a step was running, resources will be released when it completes")
+            self.pending.add_done_callback(lambda _: self.on_exit())
+
+
+
+class AsyncExecutor:
+    """
+    Bounded pool of 'max_workers' threads running the blocking parts of the async API (I/O, parsing and hashing),
+    at most 'max_archives' archives are processed at the same time, further calls wait for their turn.
+    The executor can be shared by several event loops (i.e., consecutive 'asyncio.run' calls), each loop has its
+    own limit of 'max_archives' archives.
+    """
+
+    def __init__(self, max_workers: int = DEFAULT_MAX_WORKERS, max_archives: int = DEFAULT_MAX_ARCHIVES):
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="zipstruct")
+        self.max_archives = max_archives
+        self._limits: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+    @property
+    def limit(self) -> asyncio.Semaphore:
+        """ Semaphore of the running loop, created on first use (a semaphore is bound to the first loop using it) """
+        loop = asyncio.get_running_loop()
+        limit = self._limits.get(loop)
+        if limit is None:
+            limit = self._limits[loop] = asyncio.Semaphore(self.max_archives)
+        return limit
+
+    def steps(self, on_exit: Callable[[], Any] = None) -> StepRunner:
+        """ Async context manager returning a 'StepRunner', 'on_exit' is called on exit (i.e., to close a source) """
+        return StepRunner(self.pool, on_exit)
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        async with self.steps() as run:
+            return await run(func, *args, **kwargs)
+
+    async def open(self, func: Callable, *args, **kwargs) -> Any:
+        """
+        Same as 'run' for a 'func' returning something to close (i.e., 'open_source'): when the task is cancelled
+        while 'func' is running, the result is closed as soon as it is returned.
+        """
+        future = self.pool.submit(func, *args, **kwargs)
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            future.add_done_callback(_close_result)
+            raise
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+
+    async def __aenter__(self) -> 'AsyncExecutor':
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
+
+
+
+def _close_result(future: Future):
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+
+_DEFAULT_EXECUTOR: Optional[AsyncExecutor] = None
+
+
+def get_default_executor() -> AsyncExecutor:
+    """ Executor used when none is passed to the async API, created on first use """
+    global _DEFAULT_EXECUTOR
+    if _DEFAULT_EXECUTOR is None:
+        _DEFAULT_EXECUTOR = AsyncExecutor()
+    return _DEFAULT_EXECUTOR
+
+
+def split_in_steps(items: Sequence, sizes: Sequence[int] = None, max_items: int = DEFAULT_STEP_ENTRIES,
+                   max_bytes: int = DEFAULT_STEP_BYTES) -> List[Sequence]:
+    """ Split 'items' in consecutive steps of at most 'max_items' items and (roughly) 'max_bytes' bytes """
+    if sizes is None:
+        return [items[start:start + max_items] for start in range(0, len(items), max_items)]
+
+    steps, start, size = [], 0, 0
+    for index in range(len(items)):
+        size += sizes[index]
+        if index + 1 - start >= max_items or size >= max_bytes:
+            steps.append(items[start:index + 1])
+            start, size = index + 1, 0
+    if start < len(items):
+        steps.append(items[start:])
+    return steps
@@ -23,12 +23,56 @@ def unpack_little_endian(data: bytes, encoding: str = None):
         code = 'H'
     elif length == 4:
         code = 'I'
+    elif length == 8:
+        code = 'Q'
     else:
         raise
     fmt = f'<{code}'
     return struct.unpack(fmt, data)[0]
 
 
+# Zip Appnote: 4.5.3 -Zip64 Extended Information Extra Field (0x0001)
+ZIP64_EXTRA_FIELD_ID = 0x0001
+ZIP64_PLACEHOLDER_16 = 0xFFFF
+ZIP64_PLACEHOLDER_32 = 0xFFFFFFFF
+
+
+def find_extra_field(extra: bytes, header_id: int):
+    """ Return the data of the first extra field block having the passed 'header_id', None if missing """
+    offset = 0
+    while offset + 4 <= len(extra):
+        block_id, size = struct.unpack_from('<HH', extra, offset)
+        if block_id == header_id:
+            return extra[offset + 4:offset + 4 + size]
+        offset += 4 + size
+    return None
+
+
+def unpack_zip64_extra_field(extra: bytes, values: list[int], placeholders: list[int]):
+    """
+    Replace each value equal to its placeholder with the one stored inside the Zip64 extended information
+    extra field. Values are in the order required by the standard: uncompressed size, compressed size,
+    relative offset of the local header and disk start number (only the needed prefix has to be passed).
+    Returns the resolved values and a flag telling whether the Zip64 extra field was found.
+    """
+    data = find_extra_field(extra, ZIP64_EXTRA_FIELD_ID)
+    if data is None:
+        return values, False
+
+    resolved = list(values)
+    offset = 0
+    for i, (value, placeholder) in enumerate(zip(values, placeholders)):
+        if value != placeholder:
+            continue
+        # Disk start number is the only field stored in 4 bytes
+        size = 4 if placeholder == ZIP64_PLACEHOLDER_16 else 8
+        if offset + size > len(data):
+            raise ValueError(f"Zip64 extended information extra field is too short ({len(data)} bytes)")
+        resolved[i] = int.from_bytes(data[offset:offset + size], 'little')
+        offset += size
+    return resolved, True
+
+
 def compare_models(a: 'BaseModel', b: 'BaseModel', exclude: set = None, prefix=''):
     if exclude is None:
         exclude = set()
@@ -0,0 +1,93 @@
+import zlib
+from typing import Iterator, Optional, Union
+
+from src.zipstruct.utils.sources import ByteSource, DEFAULT_CHUNK_SIZE
+
+import logging
+LOGGER = logging.getLogger("zipstruct")
+
+STORED = 0
+DEFLATED = 8
+SUPPORTED_METHODS = (STORED, DEFLATED)
+
+
+class ContentStream:
+    """
+    Decompressed content of the body stored in [offset, offset + length) of 'source' with the compression 'method'
+    (see 'SUPPORTED_METHODS'). Iterating over the stream yields the content in chunks of at most 'len(buffer)'
+    bytes (the body is read through 'buffer' as well), so memory is bounded whatever the compression ratio.
+
+    While iterating, 'read' (compressed bytes), 'size' (decompressed bytes) and 'crc32' are updated. Invalid
+    deflate streams raise 'zlib.error', other problems (i.e., a truncated body) are told by 'error' at the end.
+
+    A body already being read by someone else (i.e., while hashing it) can be pushed instead: each compressed
+    chunk is passed to 'feed', then 'flush' is called at the end ('source' is unused and may be None).
+    """
+
+    __slots__ = ('source', 'offset', 'length', 'method', 'buffer', 'read', 'size', 'crc32', '_decompressor')
+
+    def __init__(self, source: Optional[ByteSource], offset: int, length: int, method: int,
+                 buffer: bytearray = None):
+        if method not in SUPPORTED_METHODS:
+            raise ValueError(f"Unsupported compression method {method}, supported ones: {SUPPORTED_METHODS}")
+        self.source = source
+        self.offset = offset
+        self.length = length
+        self.method = method
+        self.buffer = buffer
+        self.read = 0
+        self.size = 0
+        self.crc32 = 0
+        self._decompressor = zlib.decompressobj(-15) if method == DEFLATED else None
+
+
+    def __iter__(self) -> Iterator[Union[bytes, memoryview]]:
+        max_length = len(self.buffer) if self.buffer is not None else DEFAULT_CHUNK_SIZE
+        for chunk in self.source.iter_range(self.offset, self.length, self.buffer):
+            yield from self.feed(chunk, max_length)
+        yield from self.flush()
+
+
+    def feed(
+            self, chunk: Union[bytes, memoryview], max_length: int = DEFAULT_CHUNK_SIZE
+    ) -> Iterator[Union[bytes, memoryview]]:
+        """ Content of the next compressed 'chunk' of the body, in chunks of at most 'max_length' bytes """
+        self.read += len(chunk)
+        decompressor = self._decompressor
+        if decompressor is None:
+            yield self._account(chunk)
+            return
+        data = decompressor.decompress(chunk, max_length)
+        while True:
+            if data:
+                yield self._account(data)
+            if not decompressor.unconsumed_tail:
+                break
+            data = decompressor.decompress(decompressor.unconsumed_tail, max_length)
+
+
+    def flush(self) -> Iterator[bytes]:
+        """ Content left inside the decompressor once the whole body has been fed """
+        if self._decompressor is not None:
+            data = self._decompressor.flush()
+            if data:
+                yield self._account(data)
+
+
+    def _account(self, data: Union[bytes, memoryview]) -> Union[bytes, memoryview]:
+        self.crc32 = zlib.crc32(data, self.crc32)
+        self.size += len(data)
+        return data
+
+
+    @property
+    def error(self) -> Optional[str]:
+        """ Why the content is not complete after iterating over the whole stream, None if it is """
+        if self.read != self.length:
+            return f"truncated body, read {self.read} bytes but expected {self.length}"
+        if self._decompressor is not None:
+            if not self._decompressor.eof:
+                return "incomplete deflate stream"
+            if self._decompressor.unused_data:
+                return f"{len(self._decompressor.unused_data)} bytes after the end of the deflate stream"
+        return None
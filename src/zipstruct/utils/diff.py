@@ -0,0 +1,332 @@
+import fnmatch
+import json
+from collections import defaultdict
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from pydantic import BaseModel
+
+from src.zipstruct.centraldirs.centraldir import CentralDirectory
+from src.zipstruct.descriptors.descriptor import DataDescriptor
+from src.zipstruct.localheaders.lfh import LocalFileHeader
+from src.zipstruct.utils.records import DecodedField, RawField
+
+import logging
+LOGGER = logging.getLogger("zipstruct")
+
+RECORD_TYPES = ('EOCD', 'ZIP64_EOCD', 'ZIP64_LOCATOR', 'CD', 'LFH', 'DD', 'BODY')
+ENTRY_STATUSES = ('added', 'removed', 'modified')
+# Fields of the archive-level records which are not compared (nested records and positions, reported as moves)
+EOCD_EXCLUDE = {'raw', 'interval', 'zip64', 'zip64_locator'}
+
+
+def _view_fields(cls: type, *extra: str) -> Tuple[Tuple[str, Any], ...]:
+    """
+    Fields of a 'RecordView' class in declaration order, as (name, descriptor) pairs, followed by the 'extra'
+    properties (whose descriptor is None). Descriptors let the diff read fields without calling '__get__'.
+    """
+    fields = [(name, attr) for name, attr in vars(cls).items() if isinstance(attr, (RawField, DecodedField))]
+    return tuple(fields) + tuple((name, None) for name in extra)
+
+
+RECORD_FIELDS = {
+    'CD' : _view_fields(CentralDirectory, 'file_name', 'extra_field', 'file_comment'),
+    'LFH': _view_fields(LocalFileHeader, 'file_name', 'extra_field'),
+    'DD' : _view_fields(DataDescriptor, 'crc32'),
+}
+
+
+class FieldChange(NamedTuple):
+    """ A field of a record having a different value in the new archive, bytes are shown as hex strings """
+    record: str
+    field: str
+    old: Any
+    new: Any
+
+
+
+class RangeMove(NamedTuple):
+    """
+    A range of bytes found at a different position in the new archive, the [begin, end) ranges 'old' and 'new'
+    cover 'count' adjacent records of the 'records' types that moved by the same amount of bytes.
+    """
+    records: Tuple[str, ...]
+    old: Tuple[int, int]
+    new: Tuple[int, int]
+    count: int
+
+
+
+class EntryDiff(NamedTuple):
+    """
+    Differences of a single entry, 'status' is one of 'ENTRY_STATUSES'. Entries are matched by file name and, for
+    duplicated names, by their order of occurrence ('occurrence' is 0 for the first entry having 'name', 1 for
+    the second one and so on). Moved records are not reported per entry, see 'ZipDiff.moves'.
+    """
+    name: str
+    occurrence: int
+    status: str
+    changes: Tuple[FieldChange, ...] = ()
+
+
+
+class ZipDiff:
+    """
+    Structural difference between two parsed archives: field changes of the archive-level records (EOCD and
+    Zip64 records), the added, removed and modified entries (see 'EntryDiff') and the moved ranges of bytes,
+    where adjacent records that moved by the same amount are merged (i.e., the whole central directory after
+    an append is a single move).
+
+    Items are named tuples, so that diffing archives with many entries stays cheap, see 'to_dict' and 'to_json'.
+    """
+
+    __slots__ = ('changes', 'moves', 'entries')
+
+    def __init__(self, changes: List[FieldChange] = None, moves: List[RangeMove] = None,
+                 entries: List[EntryDiff] = None):
+        self.changes = changes or []
+        self.moves = moves or []
+        self.entries = entries or []
+
+
+    def _with_status(self, status: str) -> List[EntryDiff]:
+        return [entry for entry in self.entries if entry.status == status]
+
+
+    @property
+    def added(self) -> List[EntryDiff]:
+        return self._with_status('added')
+
+
+    @property
+    def removed(self) -> List[EntryDiff]:
+        return self._with_status('removed')
+
+
+    @property
+    def modified(self) -> List[EntryDiff]:
+        return self._with_status('modified')
+
+
+    @property
+    def is_identical(self) -> bool:
+        return not self.changes and not self.moves and not self.entries
+
+
+    def filter(self, pattern: str = None, records: set = None) -> 'ZipDiff':
+        """
+        Keep only the entries whose name matches the glob 'pattern' and the changes and moves of the 'records'
+        types (see 'RECORD_TYPES'). Entries left with no differences are dropped, added and removed entries are
+        kept as long as 'CD' records are. Archive-level changes and moves are dropped when a 'pattern' is set.
+        """
+        def keep(record: str) -> bool:
+            return records is None or record in records
+
+        entries = []
+        for entry in self.entries:
+            if pattern is not None and not fnmatch.fnmatchcase(entry.name, pattern):
+                continue
+            changes = tuple(change for change in entry.changes if keep(change.record))
+            if changes or (entry.status != 'modified' and keep('CD')):
+                entries.append(entry._replace(changes=changes))
+
+        if pattern is not None:
+            return ZipDiff(entries=entries)
+        return ZipDiff(
+            changes = [change for change in self.changes if keep(change.record)],
+            moves   = [move for move in self.moves if any(keep(record) for record in move.records)],
+            entries = entries,
+        )
+
+
+    def summary(self) -> Dict[str, int]:
+        counts = {status: 0 for status in ENTRY_STATUSES}
+        for entry in self.entries:
+            counts[entry.status] += 1
+        counts['moved_records'] = sum(move.count for move in self.moves)
+        return counts
+
+
+    def to_dict(self) -> Dict:
+        return {
+            'summary': self.summary(),
+            'changes': [change._asdict() for change in self.changes],
+            'moves'  : [move._asdict() for move in self.moves],
+            'entries': [
+                {**entry._asdict(), 'changes': [change._asdict() for change in entry.changes]}
+                for entry in self.entries
+            ],
+        }
+
+
+    def to_json(self, **kwargs) -> str:
+        return json.dumps(self.to_dict(), **kwargs)
+
+
+    def __str__(self):
+        lines = []
+        for change in self.changes:
+            lines.append(f"~ {change.record}.{change.field}: {change.old!r} -> {change.new!r}")
+        for entry in self.entries:
+            symbol = {'added': '+', 'removed': '-', 'modified': '~'}[entry.status]
+            duplicate = f" (#{entry.occurrence})" if entry.occurrence else ""
+            lines.append(f"{symbol} {entry.name!r}{duplicate}")
+            for change in entry.changes:
+                lines.append(f"    {change.record}.{change.field}: {change.old!r} -> {change.new!r}")
+        for move in self.moves:
+            lines.append(f"> {'+'.join(move.records)} ({move.count} records): {move.old} -> {move.new}")
+
+        if self.is_identical:
+            lines.append("archives are identical")
+        else:
+            summary = self.summary()
+            lines.append(f"{summary['added']} added, {summary['removed']} removed, {summary['modified']} modified "
+                         f"entries, {summary['moved_records']} moved records")
+        return "\n".join(lines)
+
+
+    def __repr__(self):
+        return f"ZipDiff({self.summary()})"
+
+
+
+def _jsonable(value: Any) -> Any:
+    return value.hex() if isinstance(value, (bytes, bytearray, memoryview)) else value
+
+
+def diff_records(record: str, old, new, changes: List[FieldChange]):
+    """ Append to 'changes' the fields of two records of the same type (see 'RECORD_FIELDS') that differ """
+    if old is None or new is None:
+        if old is not new:
+            changes.append(FieldChange(record, 'present', old is not None, new is not None))
+        return
+    if old.data == new.data:
+        # Same bytes, hence same fields
+        return
+
+    for name, field in RECORD_FIELDS[record]:
+        if type(field) is DecodedField:
+            a, b = old.values[field.index], new.values[field.index]
+        elif type(field) is RawField:
+            a, b = old.data[field.start:field.end], new.data[field.start:field.end]
+        else:
+            a, b = getattr(old, name), getattr(new, name)
+        if a != b:
+            changes.append(FieldChange(record, name, _jsonable(a), _jsonable(b)))
+
+
+def diff_models(record: str, old: Optional[BaseModel], new: Optional[BaseModel], changes: List[FieldChange]):
+    """ Same as 'diff_records', for the archive-level records which are still pydantic models """
+    if old is None or new is None:
+        if old is not new:
+            changes.append(FieldChange(record, 'present', old is not None, new is not None))
+        return
+    a, b = old.model_dump(exclude=EOCD_EXCLUDE), new.model_dump(exclude=EOCD_EXCLUDE)
+    for field, value in a.items():
+        if value != b[field]:
+            changes.append(FieldChange(record, field, _jsonable(value), _jsonable(b[field])))
+
+
+def diff_entries(old, new, moves: list) -> List[FieldChange]:
+    """
+    Field changes of two entries having the same name, their records which moved are appended to 'moves' as
+    (old begin, new begin, length, record) tuples.
+    """
+    old_cd, new_cd = old.central_directory, new.central_directory
+    old_lfh, new_lfh = old.local_file_header, new.local_file_header
+    old_dd, new_dd = old.data_descriptor, new.data_descriptor
+
+    changes = []
+    if old_cd.data != new_cd.data:
+        diff_records('CD', old_cd, new_cd, changes)
+    if old_lfh.data != new_lfh.data:
+        diff_records('LFH', old_lfh, new_lfh, changes)
+    if old_dd is not None or new_dd is not None:
+        diff_records('DD', old_dd, new_dd, changes)
+    if old.body_compressed_size != new.body_compressed_size:
+        changes.append(FieldChange('BODY', 'compressed_size', old.body_compressed_size, new.body_compressed_size))
+
+    if old_cd.interval.begin != new_cd.interval.begin:
+        moves.append((old_cd.interval.begin, new_cd.interval.begin, len(new_cd), 'CD'))
+    if old_lfh.interval.begin != new_lfh.interval.begin:
+        moves.append((old_lfh.interval.begin, new_lfh.interval.begin, len(new_lfh), 'LFH'))
+    if old.body_offset != new.body_offset:
+        moves.append((old.body_offset, new.body_offset, new.body_compressed_size, 'BODY'))
+    if old_dd is not None and new_dd is not None and old_dd.interval.begin != new_dd.interval.begin:
+        moves.append((old_dd.interval.begin, new_dd.interval.begin, len(new_dd), 'DD'))
+    return changes
+
+
+def coalesce_moves(moves: list) -> List[RangeMove]:
+    """ Merge the (old begin, new begin, length, record) moves adjacent in both archives into 'RangeMove's """
+    merged = []
+    moves.sort()
+    start = 0
+    for i in range(1, len(moves) + 1):
+        if i < len(moves):
+            previous = moves[i - 1]
+            if moves[i][0] == previous[0] + previous[2] and moves[i][1] == previous[1] + previous[2]:
+                continue
+        # Moves in [start, i) are adjacent
+        first, last = moves[start], moves[i - 1]
+        records = tuple(sorted({move[3] for move in moves[start:i]}, key=RECORD_TYPES.index))
+        merged.append(RangeMove(
+            records = records,
+            old     = (first[0], last[0] + last[2]),
+            new     = (first[1], last[1] + last[2]),
+            count   = i - start,
+        ))
+        start = i
+    return merged
+
+
+def _archive_moves(old, new, moves: list):
+    records = [('EOCD', old.eocd, new.eocd)]
+    if old.eocd.zip64 is not None and new.eocd.zip64 is not None:
+        records.append(('ZIP64_EOCD', old.eocd.zip64, new.eocd.zip64))
+        records.append(('ZIP64_LOCATOR', old.eocd.zip64_locator, new.eocd.zip64_locator))
+    for record, a, b in records:
+        if a.interval.begin != b.interval.begin:
+            moves.append((a.interval.begin, b.interval.begin, b.interval.end - b.interval.begin, record))
+
+
+def index_entries(entries: list) -> Dict[str, List]:
+    """ Index the entries by file name, entries having the same name are kept in archive order """
+    index = defaultdict(list)
+    for entry in entries:
+        index[entry.central_directory.file_name].append(entry)
+    return index
+
+
+def diff_zips(old, new) -> ZipDiff:
+    """
+    Structural diff of two 'ParsedZip', in time linear in the amount of entries: each entry of 'old' is matched
+    with the entry of 'new' having the same name (the n-th duplicate with the n-th duplicate).
+    Entries of 'new' are reported in their order, followed by the removed ones.
+    """
+    changes, moves = [], []
+    diff_models('EOCD', old.eocd, new.eocd, changes)
+    diff_models('ZIP64_EOCD', old.eocd.zip64, new.eocd.zip64, changes)
+    diff_models('ZIP64_LOCATOR', old.eocd.zip64_locator, new.eocd.zip64_locator, changes)
+    _archive_moves(old, new, moves)
+
+    old_index = index_entries(old.entries)
+    seen = {}
+    entries = []
+    for entry in new.entries:
+        name = entry.central_directory.file_name
+        occurrence = seen.get(name, 0)
+        seen[name] = occurrence + 1
+        candidates = old_index.get(name, ())
+        if occurrence >= len(candidates):
+            entries.append(EntryDiff(name, occurrence, 'added'))
+            continue
+
+        entry_changes = diff_entries(candidates[occurrence], entry, moves)
+        if entry_changes:
+            entries.append(EntryDiff(name, occurrence, 'modified', tuple(entry_changes)))
+
+    for name, candidates in old_index.items():
+        for occurrence in range(seen.get(name, 0), len(candidates)):
+            entries.append(EntryDiff(name, occurrence, 'removed'))
+
+    return ZipDiff(changes=changes, moves=coalesce_moves(moves), entries=entries)
@@ -0,0 +1,261 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Callable, Dict, Iterator, List, Optional, Union
+
+from src.zipstruct.utils.sources import ByteSource
+
+import logging
+LOGGER = logging.getLogger("zipstruct")
+
+# Phases measured by the loader and by the hashing, reads done outside of any phase are counted in 'other'
+LOAD_PHASES = ('eocd', 'cd', 'lfh', 'dd')
+HASH_PHASES = ('metadata', 'bodies', 'state')
+OTHER_PHASE = 'other'
+# I/O counters of the process (Linux only), see 'read_syscalls'
+PROC_IO_PATH = "/proc/self/io"
+
+
+def read_syscalls() -> Optional[int]:
+    """
+    Read system calls done so far by the whole process ('syscr' of /proc/self/io, Linux only), None if not
+    available. Reading the counters is a read system call itself, it is counted by the next call only.
+    """
+    try:
+        fd = os.open(PROC_IO_PATH, os.O_RDONLY)
+    except OSError:
+        return None
+    try:
+        data = os.read(fd, 4096)
+    finally:
+        os.close(fd)
+    for line in data.splitlines():
+        if line.startswith(b'syscr:'):
+            return int(line[len(b'syscr:'):])
+    return None
+
+
+class PhaseStats:
+    """
+    Counters of a phase: 'reads' and 'bytes' read from the source, 'seeks' (reads not starting where the previous
+    one ended), the read system calls done by the process ('syscalls', see 'read_syscalls') and the wall and CPU
+    seconds spent inside the phase, excluding the nested phases.
+
+    'reads' are calls to the source, not system calls: a read of a memory-mapped source needs none, while a
+    remote one may need many. 'syscalls' are the actual ones, 0 where they cannot be measured.
+    """
+
+    __slots__ = ('calls', 'reads', 'seeks', 'bytes', 'syscalls', 'wall', 'cpu')
+
+    def __init__(self):
+        self.calls = 0
+        self.reads = 0
+        self.syscalls = 0
+        self.seeks = 0
+        self.bytes = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+
+
+    def add(self, other: 'PhaseStats'):
+        for name in self.__slots__:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+
+
+    def to_dict(self) -> Dict[str, Union[int, float]]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+    def __repr__(self):
+        return f"PhaseStats({', '.join(f'{k}={v}' for k, v in self.to_dict().items())})"
+
+
+
+class _Frame:
+    """ A running occurrence of a phase """
+
+    __slots__ = ('name', 'stats', 'syscalls_start', 'wall_start', 'cpu_start', 'nested_syscalls', 'nested_wall',
+                 'nested_cpu')
+
+    def __init__(self, name: str, syscalls_start: int = None):
+        self.name = name
+        self.stats = PhaseStats()
+        self.stats.calls = 1
+        self.syscalls_start = syscalls_start
+        self.wall_start = time.perf_counter()
+        self.cpu_start = time.process_time()
+        self.nested_syscalls = 0
+        self.nested_wall = 0.0
+        self.nested_cpu = 0.0
+
+
+
+class Instrumentation:
+    """
+    Opt-in collector of I/O counters and timings per phase, pass it as 'instrument' to 'ParsedZip.load' or to
+    'compute_zip_hash'. When no instrumentation is passed, sources are not wrapped and nothing is measured.
+
+    Per-phase totals are kept inside 'phases'. If a 'callback' is set, it is called with the name and the stats of
+    every completed occurrence of a phase. If 'trace' is set, occurrences are also kept as Chrome trace events,
+    see 'to_chrome_trace'. CPU time and system calls are the ones of the whole process, so they include the threads
+    of a pool.
+    An instance must be used by a single thread at a time (i.e., one per archive).
+    """
+
+    def __init__(self, callback: Callable[[str, PhaseStats], None] = None, trace: bool = False):
+        self.phases: Dict[str, PhaseStats] = {}
+        self.callback = callback
+        self.events: Optional[List[Dict]] = [] if trace else None
+        self._stack: List[_Frame] = []
+        self._other = _Frame(OTHER_PHASE)
+        self._other.stats.calls = 0
+        self._last_end = None
+        self._origin = time.perf_counter()
+        self.count_syscalls = read_syscalls() is not None
+
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[PhaseStats]:
+        """ Measure the code inside the context as an occurrence of phase 'name', phases can be nested """
+        frame = _Frame(name, read_syscalls() if self.count_syscalls else None)
+        self._stack.append(frame)
+        try:
+            yield frame.stats
+        finally:
+            self._stack.pop()
+            self._close(frame)
+
+
+    def _close(self, frame: _Frame):
+        wall = time.perf_counter() - frame.wall_start
+        cpu = time.process_time() - frame.cpu_start
+        frame.stats.wall = wall - frame.nested_wall
+        frame.stats.cpu = cpu - frame.nested_cpu
+        syscalls = 0
+        if frame.syscalls_start is not None:
+            # Without the read of the counters at the beginning of the phase
+            syscalls = read_syscalls() - frame.syscalls_start - 1
+            frame.stats.syscalls = syscalls - frame.nested_syscalls
+        if self._stack:
+            self._stack[-1].nested_wall += wall
+            self._stack[-1].nested_cpu += cpu
+            # Plus the reads of the counters at the beginning and at the end of the nested phase
+            self._stack[-1].nested_syscalls += syscalls + 2
+
+        self.phases.setdefault(frame.name, PhaseStats()).add(frame.stats)
+        if self.events is not None:
+            self.events.append({
+                "name": frame.name,
+                "cat" : "zipstruct",
+                "ph"  : "X",
+                "ts"  : (frame.wall_start - self._origin) * 1e6,
+                "dur" : wall * 1e6,
+                "pid" : os.getpid(),
+                "tid" : threading.get_ident(),
+                "args": frame.stats.to_dict(),
+            })
+        if self.callback is not None:
+            self.callback(frame.name, frame.stats)
+
+
+    def count_read(self, offset: int, length: int):
+        """ Account a read of 'length' bytes at 'offset' to the current phase """
+        stats = self._stack[-1].stats if self._stack else self._other.stats
+        stats.reads += 1
+        stats.bytes += length
+        if offset != self._last_end:
+            stats.seeks += 1
+        self._last_end = offset + length
+
+
+    def count_bytes(self, name: str, length: int):
+        """ Account bytes read elsewhere (i.e., by the workers of a pool) to phase 'name' """
+        self.phases.setdefault(name, PhaseStats()).bytes += length
+
+
+    def wrap(self, source: ByteSource) -> 'InstrumentedSource':
+        return InstrumentedSource(source, self)
+
+
+    @property
+    def totals(self) -> PhaseStats:
+        total = PhaseStats()
+        for stats in self.summary().values():
+            total.add(stats)
+        return total
+
+
+    def summary(self) -> Dict[str, PhaseStats]:
+        """ Stats of each phase, including the reads done outside of any phase (if any) """
+        phases = dict(self.phases)
+        if self._other.stats.reads:
+            phases[OTHER_PHASE] = self._other.stats
+        return phases
+
+
+    def to_chrome_trace(self) -> Dict:
+        """ Recorded phases in the Chrome trace event format (see 'chrome://tracing' or Perfetto) """
+        if self.events is None:
+            raise ValueError("Trace events are not recorded, create the instrumentation with 'trace=True'")
+        return {"traceEvents": self.events, "displayTimeUnit": "ms"}
+
+
+    def save_chrome_trace(self, path: str):
+        with open(path, "w") as f:
+            json.dump(self.to_chrome_trace(), f)
+
+
+    def __str__(self):
+        lines = [f"{'phase':<10}{'calls':>8}{'reads':>10}{'seeks':>10}{'bytes':>14}{'syscalls':>10}"
+                 f"{'wall (s)':>12}{'cpu (s)':>12}"]
+        for name, s in self.summary().items():
+            lines.append(f"{name:<10}{s.calls:>8}{s.reads:>10}{s.seeks:>10}{s.bytes:>14}{s.syscalls:>10}"
+                         f"{s.wall:>12.4f}{s.cpu:>12.4f}")
+        return "\n".join(lines)
+
+
+
+class InstrumentedSource(ByteSource):
+    """ Wrapper of a source accounting every read to the current phase of an 'Instrumentation' """
+
+    def __init__(self, source: ByteSource, instrument: Instrumentation):
+        self.source = source
+        self.instrument = instrument
+
+
+    @property
+    def size(self) -> int:
+        return self.source.size
+
+
+    def read_at(self, offset: int, length: int = -1):
+        data = self.source.read_at(offset, length)
+        self.instrument.count_read(offset, len(data))
+        return data
+
+
+    def iter_range(self, offset: int, length: int, buffer: bytearray = None):
+        for chunk in self.source.iter_range(offset, length, buffer):
+            self.instrument.count_read(offset, len(chunk))
+            offset += len(chunk)
+            yield chunk
+
+
+    def prefetch(self, ranges):
+        self.source.prefetch(ranges)
+
+
+    def phase(self, name: str):
+        return self.instrument.phase(name)
+
+
+    def close(self):
+        self.source.close()
+
+
+
+def measure(instrument: Optional[Instrumentation], name: str):
+    """ Context measuring phase 'name' if 'instrument' is set, a no-op otherwise """
+    return instrument.phase(name) if instrument is not None else nullcontext()
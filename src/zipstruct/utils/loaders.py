@@ -1,22 +1,31 @@
 from intervaltree import Interval
-from typing import BinaryIO, Dict
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, Optional, Tuple, Union
 
-from src.zipstruct.centraldirs.centraldir import CentralDirectory
+from src.zipstruct.centraldirs.centraldir import CentralDirectory, MIN_CENTRAL_DIR_LENGTH
+from src.zipstruct.centraldirs.table import CentralDirectoryTable
+from src.zipstruct.eocd.eocd import EndOfCentralDirectory
 from src.zipstruct.eocd import parsing as eocd_parser
 from src.zipstruct.centraldirs import parsing as cd_parser
 from src.zipstruct.localheaders import parsing as lfh_parser
 from src.zipstruct.descriptors import parsing as dd_parser
-from src.zipstruct.utils.state import ReadState
+from src.zipstruct.descriptors.descriptor import ZIP64_DATA_DESCRIPTOR_MAX_LENGTH
+from src.zipstruct.localheaders.lfh import LocalFileHeader, MIN_LOCAL_FILE_HEADER
+from src.zipstruct.utils.common import GeneralPurposeBitMasks
+from src.zipstruct.utils.sources import ByteSource, as_source
+from src.zipstruct.utils.state import ParsingState
 
 import logging
 LOGGER = logging.getLogger("zipstruct")
 
+# Entries whose local file headers and data descriptors are prefetched together, see 'ByteSource.prefetch'
+PREFETCH_ENTRIES = 1024
 
-def load_eocd(file: BinaryIO, parsing_state: ReadState = None):
-    begin = eocd_parser.search_eocd_signature(file)
+
+def load_eocd(file: Union[BinaryIO, ByteSource], parsing_state: ParsingState = None):
+    begin, data = eocd_parser.find_eocd(file)
     LOGGER.debug(f"Found EOCD signature in byte {begin}")
 
-    eocd = eocd_parser.parse_eocd(file, begin)
+    eocd = eocd_parser.parse_eocd_from_buffer(data)
     end = begin + len(eocd.raw)
 
     interval = Interval(begin=begin, end=end, data='EOCD')
@@ -27,82 +36,256 @@ def load_eocd(file: BinaryIO, parsing_state: ReadState = None):
 
     eocd.interval = interval
     LOGGER.debug(f"EOCD successfully loaded from bytes {begin}:{end}")
+
+    load_zip64_eocd(file, eocd, parsing_state)
     return eocd
 
 
-def load_central_directories(file: BinaryIO, offset: int, parsing_state: ReadState = None):
+def load_zip64_eocd(
+        file: Union[BinaryIO, ByteSource], eocd: EndOfCentralDirectory, parsing_state: ParsingState = None
+):
+    """
+    Load the Zip64 EOCD locator and record (if any) inside the passed EOCD.
+    """
+    locator_begin = eocd_parser.search_zip64_locator(file, eocd.interval.begin)
+    if locator_begin is None:
+        return
+
+    locator = eocd_parser.parse_zip64_locator(file, locator_begin)
+    locator_end = locator_begin + len(locator.raw)
+    locator.interval = Interval(begin=locator_begin, end=locator_end, data='ZIP64 EOCD LOCATOR')
+
+    begin = locator.offset_of_zip64_eocd
+    zip64 = eocd_parser.parse_zip64_eocd(file, begin)
+    zip64.interval = Interval(begin=begin, end=begin + len(zip64.raw), data='ZIP64 EOCD')
+    if zip64.interval.end > locator_begin:
+        raise ValueError(f"Zip64 EOCD record ({zip64.interval.begin}, {zip64.interval.end}) "
+                         f"overlaps with its locator starting at byte {locator_begin}")
+
+    if parsing_state is not None:
+        parsing_state.register(locator.interval)
+        parsing_state.register(zip64.interval)
+
+    eocd.zip64_locator = locator
+    eocd.zip64 = zip64
+    LOGGER.debug(f"Zip64 EOCD successfully loaded from bytes {zip64.interval.begin}:{zip64.interval.end}")
+
+
+def load_central_directories(
+        file: Union[BinaryIO, ByteSource], offset: int, parsing_state: ParsingState = None, size: int = None
+):
+    """
+    Load all the central directories starting from 'offset'. If the 'size' of the whole central directory
+    is known (i.e., from the EOCD), it will be read with a single call and parsed in bulk.
+    """
     LOGGER.debug("Started parsing central directories")
-    centraldirs = cd_parser.parse_central_directories(file, offset)
-    if parsing_state is None:
-        return centraldirs
+    if size is None:
+        centraldirs = cd_parser.parse_central_directories(file, offset)
+    else:
+        centraldirs = cd_parser.parse_central_directories_bulk(file, offset, size)
 
     begin = offset
     for cd in centraldirs:
-        end = begin + len(cd.raw)
+        end = begin + len(cd)
 
         interval = Interval(begin=begin, end=end, data=f"CD of '{cd.file_name}'")
-        parsing_state.register(interval)
+        if parsing_state is not None:
+            parsing_state.register(interval)
         cd.interval = interval
 
         begin = end
     return centraldirs
 
 
+def load_central_directory_table(
+        file: Union[BinaryIO, ByteSource], offset: int, size: int, parsing_state: ParsingState = None
+):
+    """
+    Load all the central directories starting from 'offset' inside a columnar 'CentralDirectoryTable'.
+    In order to keep memory bounded, a single interval covering the whole central directory is registered.
+    """
+    LOGGER.debug("Started loading central directory table")
+    # The table outlives the source, so its buffer must be a copy
+    data = bytes(as_source(file).read_at(offset, size))
+    if len(data) != size:
+        raise ValueError(f"Incomplete central directory, found {len(data)} bytes but expected {size}")
+
+    table = CentralDirectoryTable(data, start_offset=offset)
+    if parsing_state is not None and size > 0:
+        parsing_state.registeri(begin=offset, end=offset + size, title=f"CD table of {len(table)} entries")
+    return table
+
+
 def create_zip_file_entries(
-        file: BinaryIO, centraldirs: list[CentralDirectory], parsing_state: ReadState = None
+        file: Union[BinaryIO, ByteSource], centraldirs: list[CentralDirectory], parsing_state: ParsingState = None,
+        previous: Dict[int, Any] = None
 ) -> Dict:
+    """
+    Load the entries described by 'centraldirs', the ones found inside 'previous' (see 'index_previous_entries')
+    are reused instead of being parsed again. Entries are keyed by local file header offset, so that entries
+    sharing the same name are all kept.
+    """
     LOGGER.debug("Started parsing local file headers")
 
     # Sort by offset to access headers sequentially
     centraldirs.sort(key=lambda cd: cd.relative_offset_of_local_header)
 
+    source = as_source(file)
     entries = {}
+    for start in range(0, len(centraldirs), PREFETCH_ENTRIES):
+        window = centraldirs[start:start + PREFETCH_ENTRIES]
+        # Reused entries are checked against the bytes of their records, so they are prefetched as well
+        source.prefetch(entry_metadata_ranges(window))
+        reused = {}
+        if previous:
+            for cd in window:
+                offset = cd.relative_offset_of_local_header
+                entry = reuse_zip_file_entry(source, cd, previous.get(offset), parsing_state)
+                if entry is not None:
+                    reused[offset] = entry
+
+        for cd in window:
+            entry = reused.get(cd.relative_offset_of_local_header)
+            offset = cd.relative_offset_of_local_header
+            entries[offset] = entry if entry is not None else load_zip_file_entry(source, cd, parsing_state)
+    return entries
+
+
+def index_previous_entries(file: Union[BinaryIO, ByteSource], entries: list, prefix_end: int) -> Dict[int, Any]:
+    """
+    Index by local file header offset the 'entries' of a previous version of the archive (i.e., before other
+    entries were appended to it), so that they can be reused, see 'reuse_zip_file_entry'.
+    The previous version is expected to be a prefix of 'file' up to 'prefix_end' (the offset of its central
+    directory), an empty index is returned when the file is shorter. Each entry is checked against the file only
+    when it is reused, so entries rewritten in place are parsed again.
+    Entries of a lazy archive which have not been resolved yet are not indexed.
+    """
+    if as_source(file).size < prefix_end:
+        LOGGER.debug(f"Previous entries not reused, the file is shorter than the previous prefix ({prefix_end})")
+        return {}
+    index = {}
+    for entry in entries:
+        if entry.is_resolved:
+            index[entry.central_directory.relative_offset_of_local_header] = entry
+    return index
+
+
+def _entry_key(cd: CentralDirectory) -> tuple:
+    # Fields telling where the body and the data descriptor of an entry end, along with its (undecoded) name
+    name_end = MIN_CENTRAL_DIR_LENGTH + cd.file_name_length
+    return cd.crc32, cd.compressed_size, cd.general_purpose_flags, cd.data[MIN_CENTRAL_DIR_LENGTH:name_end]
+
+
+def reuse_zip_file_entry(
+        file: Union[BinaryIO, ByteSource], cd: CentralDirectory, previous: Any, parsing_state: ParsingState = None
+) -> Optional[Dict]:
+    """
+    Same as 'load_zip_file_entry', but the local file header and the data descriptor are taken from the 'previous'
+    entry at the same offset, as long as its central directory describes the same entry as 'cd' and the bytes of
+    its records are unchanged inside 'file'. Return None otherwise. Central directory records may differ in
+    other fields, since writers can rewrite the whole central directory when appending (i.e., Zip64
+    placeholders replaced by the actual values).
+    """
+    if previous is None or _entry_key(previous.central_directory) != _entry_key(cd):
+        return None
+
+    lfh, dd = previous.local_file_header, previous.data_descriptor
+    source = as_source(file)
+    for record in filter(None, (lfh, dd)):
+        if source.read_at(record.interval.begin, len(record)) != record.data:
+            LOGGER.debug(f"Entry '{lfh.file_name}' not reused, its record at byte {record.interval.begin} changed")
+            return None
+    body_offset, body_end = previous.body_offset, previous.body_offset + previous.body_compressed_size
+    if parsing_state is not None:
+        parsing_state.register(lfh.interval)
+        parsing_state.register(Interval(begin=body_offset, end=body_end, data=f"BODY of '{lfh.file_name}'"))
+        if dd is not None:
+            parsing_state.register(dd.interval)
+
+    return {
+        'central_directory'       : cd,
+
+        'local_file_header_offset': cd.relative_offset_of_local_header,
+        'local_file_header'       : lfh,
+
+        'body_offset'             : body_offset,
+        'body_compressed_size'    : previous.body_compressed_size,
+
+        'data_descriptor_offset'  : body_end,
+        'data_descriptor'         : dd,
+    }
+
+
+def entry_metadata_ranges(centraldirs: Iterable[CentralDirectory]) -> Iterator[Tuple[int, int]]:
+    """
+    Yield the (offset, length) ranges where the local file header and the data descriptor (if any) of each entry
+    are expected. Ranges are estimated from the central directory, assuming the same extra field in the local
+    file header, so a few more bytes may be needed when the entries are actually parsed.
+    """
     for cd in centraldirs:
-        # Loading local file header
-        lfh_start = cd.relative_offset_of_local_header
-        lfh = lfh_parser.parse_local_file_header(file, lfh_start)
-        lfh_end = lfh_start + len(lfh.raw)
-        lfh.interval = Interval(begin=lfh_start, end=lfh_end, data=f"LFH of '{lfh.file_name}'")
+        lfh_length = MIN_LOCAL_FILE_HEADER + cd.file_name_length + cd.extra_field_length
+        yield cd.relative_offset_of_local_header, lfh_length
+        if cd.general_purpose_flags & GeneralPurposeBitMasks.USE_DATA_DESCRIPTOR.value:
+            dd_offset = cd.relative_offset_of_local_header + lfh_length + cd.compressed_size
+            yield dd_offset, ZIP64_DATA_DESCRIPTOR_MAX_LENGTH
 
-        # Computing body offset range
-        body_end = lfh_end + cd.compressed_size
 
-        # Registering lfh and body ranges
-        if parsing_state is not None:
-            parsing_state.register(lfh.interval)
-            body_interval = Interval(begin=lfh_end, end=body_end, data=f"BODY of '{lfh.file_name}'")
-            parsing_state.register(body_interval)
-
-        # Loading data descriptor
-        dd = None
-        if dd_parser.check_data_descriptor_presence(lfh):
-            dd = dd_parser.parse_data_descriptor(file, body_end)
+def load_zip_file_entry(
+        file: Union[BinaryIO, ByteSource], cd: CentralDirectory, parsing_state: ParsingState = None,
+        lfh: LocalFileHeader = None
+) -> Dict:
+    """
+    Load the local file header and the data descriptor (if any) related to the passed central directory.
+    If the local file header has already been parsed (i.e., by a recovery scan), pass it as 'lfh'.
+    """
+    source = as_source(file)
+
+    # Loading local file header
+    lfh_start = cd.relative_offset_of_local_header
+    if lfh is None:
+        lfh = lfh_parser.parse_local_file_header(source, lfh_start)
+    lfh_end = lfh_start + len(lfh)
+    lfh.interval = Interval(begin=lfh_start, end=lfh_end, data=f"LFH of '{lfh.file_name}'")
+
+    # Computing body offset range
+    body_end = lfh_end + cd.compressed_size
+
+    # Registering lfh and body ranges
+    if parsing_state is not None:
+        parsing_state.register(lfh.interval)
+        body_interval = Interval(begin=lfh_end, end=body_end, data=f"BODY of '{lfh.file_name}'")
+        parsing_state.register(body_interval)
+
+    # Loading data descriptor
+    dd = None
+    if dd_parser.check_data_descriptor_presence(lfh):
+        with source.phase('dd'):
+            dd = dd_parser.parse_data_descriptor(source, body_end, zip64=lfh.zip64)
             dd_interval = Interval(begin=body_end, end=body_end + len(dd), data=f"DD of '{lfh.file_name}'")
             dd.interval = dd_interval
             if parsing_state is not None:
                 parsing_state.register(dd_interval)
 
-        entries[cd.file_name] = {
-            'central_directory'       : cd,
-
-            'local_file_header_offset': cd.relative_offset_of_local_header,
-            'local_file_header'       : lfh,
+    entry = {
+        'central_directory'       : cd,
 
-            'body_offset'             : lfh_end,
-            'body_compressed_size'    : (body_end - lfh_end),
+        'local_file_header_offset': cd.relative_offset_of_local_header,
+        'local_file_header'       : lfh,
 
-            'data_descriptor_offset'  : body_end,
-            'data_descriptor'         : dd,
+        'body_offset'             : lfh_end,
+        'body_compressed_size'    : (body_end - lfh_end),
 
-        }
+        'data_descriptor_offset'  : body_end,
+        'data_descriptor'         : dd,
 
-        # Check correctness of the entries ranges
-        if parsing_state is not None:
-            parsing_state.raise_for_not_existing(begin=cd.relative_offset_of_local_header, end=lfh_end)  # lfh
-            parsing_state.raise_for_not_existing(begin=lfh_end, end=body_end)
-            if dd is not None:
-                parsing_state.raise_for_not_existing(begin=body_end, end=body_end + len(dd))
+    }
 
-        LOGGER.debug(f"Successfully parsed '{lfh.file_name}' having compressed size: {cd.compressed_size}")
-    return entries
+    # Check correctness of the entries ranges
+    if parsing_state is not None:
+        parsing_state.raise_for_not_existing(begin=cd.relative_offset_of_local_header, end=lfh_end)  # lfh
+        parsing_state.raise_for_not_existing(begin=lfh_end, end=body_end)
+        if dd is not None:
+            parsing_state.raise_for_not_existing(begin=body_end, end=body_end + len(dd))
 
+    LOGGER.debug(f"Successfully parsed '{lfh.file_name}' having compressed size: {cd.compressed_size}")
+    return entry
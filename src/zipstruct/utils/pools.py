@@ -0,0 +1,28 @@
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from typing import List, Sequence
+
+# Pools the parallel (not async) APIs can run on, i.e. 'compute_zip_hash' in 'tree' mode or 'ParsedZip.verify'
+EXECUTORS = {'thread': ThreadPoolExecutor, 'process': ProcessPoolExecutor}
+
+
+def create_pool(executor: str, workers: int) -> Executor:
+    """ New pool of 'workers' workers of the passed kind, see 'EXECUTORS' """
+    if executor not in EXECUTORS:
+        raise ValueError(f"Unknown executor '{executor}', available ones: {list(EXECUTORS.keys())}")
+    return EXECUTORS[executor](max_workers=workers)
+
+
+def split_in_batches(items: Sequence, sizes: Sequence[int], amount: int) -> List[Sequence]:
+    """ Split 'items' in at most 'amount' contiguous batches, having a similar total of 'sizes' """
+    amount = max(1, amount)
+    # Rounded up, so that the full batches cannot outnumber 'amount', the last one takes whatever remains
+    target = max(1, -(-sum(sizes) // amount))
+    batches, start, size = [], 0, 0
+    for index in range(len(items)):
+        size += sizes[index]
+        if size >= target and len(batches) < amount - 1:
+            batches.append(items[start:index + 1])
+            start, size = index + 1, 0
+    if start < len(items):
+        batches.append(items[start:])
+    return batches
@@ -0,0 +1,132 @@
+import struct
+import zlib
+from typing import Iterator, Optional, Union
+
+from src.zipstruct.utils.common import GeneralPurposeBitMasks
+from src.zipstruct.utils.content import ContentStream, STORED
+from src.zipstruct.utils.sources import ByteSource, MmapSource, DEFAULT_CHUNK_SIZE
+
+import logging
+LOGGER = logging.getLogger("zipstruct")
+
+
+class EntryReader:
+    """
+    Streaming reader over the content of an entry, starting at its 'body_offset': the parsed CD/LFH are used as
+    they are, so no metadata is read again. Stored entries of memory-mapped archives are read without copies
+    ('read' returns memoryviews over the mapping), deflated ones are inflated incrementally, in chunks of at most
+    'chunk_size' bytes.
+
+    Once the whole content has been read, its CRC-32 and size are checked against the central directory ones, a
+    ValueError is raised when they do not match (as for truncated bodies or invalid deflate streams).
+    """
+
+    __slots__ = ('name', 'size', 'zero_copy', '_expected_crc32', '_stream', '_chunks', '_pending', '_position')
+
+    def __init__(self, source: ByteSource, entry, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        cd = entry.central_directory
+        if cd.general_purpose_flags & GeneralPurposeBitMasks.ENCRYPTED.value:
+            raise ValueError(f"Entry '{cd.file_name}' is encrypted")
+
+        self.name = cd.file_name
+        self.size = cd.uncompressed_size
+        # Slices of the mapping stay valid, while chunks of the other sources are reused by the next read
+        self.zero_copy = isinstance(source, MmapSource) and cd.compression_method == STORED
+        self._expected_crc32 = struct.unpack("<I", cd.crc32)[0]
+        buffer = None if self.zero_copy else bytearray(chunk_size)
+        self._stream = ContentStream(
+            source, entry.body_offset, entry.body_compressed_size, cd.compression_method, buffer
+        )
+        self._chunks: Optional[Iterator] = iter(self._stream)
+        self._pending = memoryview(b'')
+        self._position = 0
+
+
+    def _next_chunk(self) -> bool:
+        """ Load the next chunk of content inside '_pending', False once the whole content has been read """
+        if self._chunks is None:
+            return False
+        try:
+            chunk = next(self._chunks, None)
+        except zlib.error as e:
+            self._chunks = None
+            raise ValueError(f"Invalid deflate stream in entry '{self.name}': {e}") from e
+        if chunk is None:
+            self._chunks = None
+            self._check()
+            return False
+        if not self.zero_copy and isinstance(chunk, memoryview):
+            chunk = bytes(chunk)
+        self._pending = memoryview(chunk)
+        return True
+
+
+    def _check(self):
+        stream = self._stream
+        if stream.error is not None:
+            raise ValueError(f"Entry '{self.name}' cannot be read completely: {stream.error}")
+        if stream.crc32 != self._expected_crc32 or stream.size != self.size:
+            raise ValueError(f"Content of entry '{self.name}' does not match its central directory "
+                             f"(CRC-32 {stream.crc32:08x}, {stream.size} bytes)")
+
+
+    def _take(self, size: int) -> Union[bytes, memoryview]:
+        chunk = self._pending[:size]
+        self._pending = self._pending[len(chunk):]
+        self._position += len(chunk)
+        if self.zero_copy:
+            return chunk
+        return chunk.obj if len(chunk) == len(chunk.obj) else bytes(chunk)
+
+
+    def read(self, size: int = -1) -> Union[bytes, memoryview]:
+        """ Up to 'size' bytes of content (all the remaining content if negative), empty at the end """
+        if size is None or size < 0:
+            return self.readall()
+        if not self._pending and (size == 0 or not self._next_chunk()):
+            return b''
+        return self._take(size)
+
+
+    def readall(self) -> Union[bytes, memoryview]:
+        chunks = list(self)
+        if len(chunks) == 1:
+            return chunks[0]
+        return b''.join(chunks)
+
+
+    def __iter__(self) -> Iterator[Union[bytes, memoryview]]:
+        """ Remaining content, chunk by chunk """
+        while self._pending or self._next_chunk():
+            yield self._take(len(self._pending))
+
+
+    def tell(self) -> int:
+        return self._position
+
+
+    def readable(self) -> bool:
+        return True
+
+
+    @property
+    def closed(self) -> bool:
+        return self._stream is None
+
+
+    def close(self):
+        """ The source belongs to the 'ParsedZip', only the state of the reader is released """
+        self._stream = self._chunks = None
+        self._pending = memoryview(b'')
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+    def __repr__(self):
+        return f"EntryReader({self.name!r}, {self._position}/{self.size})"
@@ -0,0 +1,76 @@
+from typing import Any
+
+from pydantic import BaseModel
+
+
+class RawField:
+    """ Descriptor exposing the slice [start, end) of the record bytes, with no decoding """
+
+    __slots__ = ('start', 'end')
+
+    def __init__(self, start: int, end: int):
+        self.start = start
+        self.end = end
+
+    def __get__(self, record: 'RecordView', owner=None) -> Any:
+        if record is None:
+            return self
+        return record.data[self.start:self.end]
+
+
+
+class DecodedField:
+    """ Descriptor exposing a value decoded when the record has been created (see 'RecordView.values') """
+
+    __slots__ = ('index',)
+
+    def __init__(self, index: int):
+        self.index = index
+
+    def __get__(self, record: 'RecordView', owner=None) -> Any:
+        if record is None:
+            return self
+        return record.values[self.index]
+
+
+
+class RecordView:
+    """
+    Base class of the lightweight records: each one keeps a single reference to the original bytes of the record
+    ('data') and the tuple of the integers decoded from its fixed-size part ('values'). Fields are exposed through
+    descriptors ('RawField' and 'DecodedField'), so nothing is copied or validated again after parsing.
+
+    The equivalent pydantic model is created on demand by 'to_model()', i.e., to export or to compare records.
+    """
+
+    __slots__ = ('data', 'values')
+
+    def __init__(self, data: bytes, values: tuple = ()):
+        self.data = data
+        self.values = values
+
+
+    def __len__(self):
+        return len(self.data)
+
+
+    def __eq__(self, other):
+        if type(self) is not type(other):
+            return NotImplemented
+        return self.data == other.data and self.values == other.values
+
+
+    def __hash__(self):
+        return hash(self.data)
+
+
+    def to_model(self) -> BaseModel:
+        raise NotImplementedError
+
+
+    def model_dump(self, **kwargs) -> dict:
+        return self.to_model().model_dump(**kwargs)
+
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.data!r})"
@@ -0,0 +1,259 @@
+import io
+import struct
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from intervaltree import Interval
+
+from src.zipstruct.centraldirs import parsing as cd_parser
+from src.zipstruct.centraldirs.centraldir import (
+    CentralDirectory, CENTRAL_DIR_SIGNATURE, CENTRAL_DIR_STRUCT, INT_CENTRAL_DIR_SIGNATURE
+)
+from src.zipstruct.descriptors import parsing as dd_parser
+from src.zipstruct.descriptors.descriptor import DATA_DESCRIPTOR_SIGNATURE
+from src.zipstruct.eocd import parsing as eocd_parser
+from src.zipstruct.eocd.eocd import EndOfCentralDirectory, EOCD_SIGNATURE
+from src.zipstruct.eocd.zip64 import ZIP64_EOCD_SIGNATURE
+from src.zipstruct.localheaders import parsing as lfh_parser
+from src.zipstruct.localheaders.lfh import LocalFileHeader, LFH_SIGNATURE
+from src.zipstruct.utils import loaders
+from src.zipstruct.utils.common import ZIP64_EXTRA_FIELD_ID, ZIP64_PLACEHOLDER_16, ZIP64_PLACEHOLDER_32
+from src.zipstruct.utils.sources import ByteSource, MmapSource
+from src.zipstruct.utils.state import ParsingState
+
+import logging
+LOGGER = logging.getLogger("zipstruct")
+
+# Sources which are not memory-mapped are searched through windows of this size
+SCAN_WINDOW = 4 * 1024 * 1024
+# Records which can follow the body of an entry (or its data descriptor)
+NEXT_RECORD_SIGNATURES = (LFH_SIGNATURE, CENTRAL_DIR_SIGNATURE, EOCD_SIGNATURE, ZIP64_EOCD_SIGNATURE)
+
+
+class ScannedEntry(NamedTuple):
+    """ Local file header found by the scan, the values of its data descriptor (if any) and where the entry ends """
+    offset: int
+    lfh: LocalFileHeader
+    crc32: int
+    compressed_size: int
+    uncompressed_size: int
+    end: int
+
+
+
+def find_signature(source: ByteSource, signature: bytes, start: int, end: int = None) -> int:
+    """
+    Offset of the first occurrence of 'signature' inside [start, end) of 'source', -1 if missing.
+    Memory-mapped sources are searched in place (no copy), the others through windows of 'SCAN_WINDOW' bytes.
+    """
+    end = source.size if end is None else min(end, source.size)
+    if isinstance(source, MmapSource):
+        return source.mmap.find(signature, start, end)
+
+    overlap = len(signature) - 1
+    while end - start >= len(signature):
+        window = bytes(source.read_at(start, min(SCAN_WINDOW, end - start)))
+        index = window.find(signature)
+        if index >= 0:
+            return start + index
+        if len(window) <= overlap:
+            break
+        start += len(window) - overlap
+    return -1
+
+
+def _is_record_boundary(source: ByteSource, offset: int) -> bool:
+    """ Whether 'offset' is the end of the file or the beginning of a record following an entry """
+    return offset == source.size or bytes(source.read_at(offset, 4)) in NEXT_RECORD_SIGNATURES
+
+
+def _find_data_descriptor(source: ByteSource, lfh: LocalFileHeader, body_offset: int) -> Optional[Tuple[int, ...]]:
+    """
+    Search the data descriptor following the body starting at 'body_offset': it is the first data descriptor
+    signature whose compressed size matches its distance from the body, followed by another record.
+    Return its CRC-32, sizes and length, None if missing. Data descriptors without signature are not found.
+    """
+    size_format, length = ('<IQQ', 24) if lfh.zip64 else ('<III', 16)
+    position = body_offset
+    while True:
+        candidate = find_signature(source, DATA_DESCRIPTOR_SIGNATURE, position)
+        if candidate < 0:
+            return None
+        data = bytes(source.read_at(candidate + 4, length - 4))
+        if len(data) == length - 4:
+            crc32, compressed_size, uncompressed_size = struct.unpack(size_format, data)
+            if compressed_size == candidate - body_offset and _is_record_boundary(source, candidate + length):
+                return crc32, compressed_size, uncompressed_size, length
+        position = candidate + 1
+
+
+def scan_entry(source: ByteSource, offset: int) -> Optional[ScannedEntry]:
+    """
+    Parse the local file header at 'offset' and step over its body, using the compressed size of the header or
+    searching its data descriptor. Return None when 'offset' does not look like an entry (i.e., the signature is
+    part of a body) or when the entry is truncated.
+    """
+    try:
+        lfh = lfh_parser.parse_local_file_header(source, offset)
+    except Exception as e:
+        LOGGER.debug(f"Invalid local file header at byte {offset}: {e}")
+        return None
+    if lfh.file_name_length == 0:
+        return None
+
+    body_offset = offset + len(lfh)
+    crc32 = struct.unpack("<I", lfh.crc32)[0]
+    if not dd_parser.check_data_descriptor_presence(lfh):
+        end = body_offset + lfh.compressed_size
+        if end > source.size or not _is_record_boundary(source, end):
+            LOGGER.debug(f"Entry at byte {offset} ('{lfh.file_name}') is truncated or its size is not valid")
+            return None
+        return ScannedEntry(offset, lfh, crc32, lfh.compressed_size, lfh.uncompressed_size, end)
+
+    descriptor = _find_data_descriptor(source, lfh, body_offset)
+    if descriptor is None:
+        LOGGER.debug(f"Data descriptor of the entry at byte {offset} ('{lfh.file_name}') not found")
+        return None
+    crc32, compressed_size, uncompressed_size, length = descriptor
+    end = body_offset + compressed_size + length
+    return ScannedEntry(offset, lfh, crc32, compressed_size, uncompressed_size, end)
+
+
+def scan_entries(source: ByteSource) -> List[ScannedEntry]:
+    """ Scan the file forward for local file headers, stepping over the body of each entry found """
+    entries = []
+    position = 0
+    while True:
+        offset = find_signature(source, LFH_SIGNATURE, position)
+        if offset < 0:
+            return entries
+        entry = scan_entry(source, offset)
+        if entry is None:
+            position = offset + 1
+            continue
+        entries.append(entry)
+        position = entry.end
+
+
+def scan_central_directories(source: ByteSource, start: int) -> Dict[int, CentralDirectory]:
+    """
+    Central directory records found after 'start' (even without an EOCD), by local file header offset.
+    Consecutive records are parsed in bulk, reading windows of 'SCAN_WINDOW' bytes.
+    """
+    centraldirs = {}
+    position = start
+    while True:
+        offset = find_signature(source, CENTRAL_DIR_SIGNATURE, position)
+        if offset < 0:
+            return centraldirs
+
+        window = bytes(source.read_at(offset, SCAN_WINDOW))
+        parsed = 0
+        with memoryview(window) as view:
+            while view[parsed:parsed + 4] == CENTRAL_DIR_SIGNATURE:
+                try:
+                    cd = cd_parser.parse_central_directory_from_buffer(view, parsed)
+                except Exception as e:
+                    # Not valid or not completely inside the window, in that case it is parsed by the next window
+                    LOGGER.debug(f"Central directory record at byte {offset + parsed} not parsed: {e}")
+                    break
+                begin = offset + parsed
+                cd.interval = Interval(begin=begin, end=begin + len(cd), data=f"CD of '{cd.file_name}'")
+                centraldirs[cd.relative_offset_of_local_header] = cd
+                parsed += len(cd)
+        position = offset + max(parsed, 1)
+
+
+def rebuild_central_directory(entry: ScannedEntry, position: int) -> CentralDirectory:
+    """
+    Central directory record of an entry, built from its local file header and its data descriptor. The record
+    is not part of the file, its 'interval' is where it would be written at 'position' (see 'recover_entries').
+    """
+    lfh = entry.lfh
+    compressed_size, uncompressed_size, offset = entry.compressed_size, entry.uncompressed_size, entry.offset
+    extra = b''
+    if max(compressed_size, uncompressed_size, offset) >= ZIP64_PLACEHOLDER_32:
+        extra = struct.pack('<HHQQQ', ZIP64_EXTRA_FIELD_ID, 24, uncompressed_size, compressed_size, offset)
+        compressed_size = uncompressed_size = offset = ZIP64_PLACEHOLDER_32
+
+    name = lfh.raw.file_name
+    version, flags, method, time, date = lfh.values[1:6]
+    data = CENTRAL_DIR_STRUCT.pack(
+        INT_CENTRAL_DIR_SIGNATURE, version, version, flags, method, time, date, entry.crc32,
+        compressed_size, uncompressed_size, len(name), len(extra), 0, 0, 0, 0, offset
+    ) + name + extra
+    cd = cd_parser.parse_central_directory_from_buffer(memoryview(data), 0)
+    cd.interval = Interval(begin=position, end=position + len(cd), data=f"CD of '{cd.file_name}' (rebuilt)")
+    return cd
+
+
+def rebuild_eocd(entries: int, cd_offset: int, cd_size: int) -> EndOfCentralDirectory:
+    """
+    EOCD of an archive whose EOCD is missing, values not fitting its fields are set to the Zip64 placeholders.
+    Its 'interval' is where it would be written, right after the central directory.
+    """
+    entries = min(entries, ZIP64_PLACEHOLDER_16)
+    data = struct.pack(
+        '<4sHHHHIIH', EOCD_SIGNATURE, 0, 0, entries, entries, min(cd_size, ZIP64_PLACEHOLDER_32),
+        min(cd_offset, ZIP64_PLACEHOLDER_32), 0
+    )
+    eocd = eocd_parser.parse_eocd(io.BytesIO(data), 0)
+    eocd.interval = Interval(begin=cd_offset + cd_size, end=cd_offset + cd_size + len(data), data='EOCD (rebuilt)')
+    return eocd
+
+
+def recover_entries(
+        source: ByteSource, parsing_state: ParsingState = None
+) -> Tuple[EndOfCentralDirectory, Dict]:
+    """
+    Rebuild the entries of a damaged archive (i.e., a truncated upload) without relying on its EOCD and central
+    directory: the file is scanned forward for local file headers (see 'scan_entries'), then the central directory
+    records following the last entry are collected. Entries are returned like 'loaders.create_zip_file_entries'
+    does, with a 'confirmed' flag telling whether a central directory record matches the entry.
+
+    The central directory record of unconfirmed entries is rebuilt from their local file header and data
+    descriptor, as is the EOCD when it is missing, not valid or when some record has been rebuilt. Rebuilt
+    records are laid out after the end of the file, as if the archive were completed: their intervals do not
+    overlap with the parsed ones, so the recovered archive can be hashed and diffed like a loaded one.
+    """
+    scanned = scan_entries(source)
+    entries_end = scanned[-1].end if scanned else 0
+    centraldirs = scan_central_directories(source, entries_end)
+    LOGGER.debug(f"Recovery scan found {len(scanned)} entries and {len(centraldirs)} central directory records")
+
+    entries, confirmed_centraldirs, rebuilt_end = {}, [], source.size
+    for entry in scanned:
+        cd = centraldirs.get(entry.offset)
+        confirmed = (cd is not None and cd.compressed_size == entry.compressed_size
+                     and cd.raw.file_name == entry.lfh.raw.file_name)
+        if cd is not None and not confirmed:
+            LOGGER.warning(f"Central directory record of the entry at byte {entry.offset} does not match it")
+        if confirmed:
+            confirmed_centraldirs.append(cd)
+        else:
+            cd = rebuild_central_directory(entry, rebuilt_end)
+            rebuilt_end = cd.interval.end
+        zip_entry = loaders.load_zip_file_entry(source, cd, parsing_state, lfh=entry.lfh)
+        zip_entry['confirmed'] = confirmed
+        entries[entry.offset] = zip_entry
+
+    # Registered after the entries and by offset, so that the parsing state only appends ranges
+    if parsing_state is not None:
+        for cd in sorted(confirmed_centraldirs, key=lambda record: record.interval.begin):
+            parsing_state.register(cd.interval)
+
+    try:
+        eocd = loaders.load_eocd(source)
+        if eocd.interval.end != source.size:
+            raise ValueError("EOCD's end offset should match with the file size")
+        if rebuilt_end != source.size:
+            raise ValueError("some central directory record has been rebuilt")
+    except Exception as e:
+        LOGGER.warning(f"EOCD not found or not valid ({e}), it is rebuilt from the recovered entries")
+        cd_offset = min((cd.interval.begin for cd in confirmed_centraldirs), default=source.size)
+        return rebuild_eocd(len(entries), cd_offset, rebuilt_end - cd_offset), entries
+
+    if parsing_state is not None:
+        for record in (eocd, eocd.zip64_locator, eocd.zip64):
+            if record is not None:
+                parsing_state.register(record.interval)
+    return eocd, entries
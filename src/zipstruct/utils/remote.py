@@ -0,0 +1,224 @@
+import http.client
+import re
+import threading
+import urllib.parse
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Tuple
+
+from src.zipstruct.utils.sources import ByteSource
+
+import logging
+LOGGER = logging.getLogger("zipstruct")
+
+# Remote files are fetched and cached in aligned blocks of this size
+DEFAULT_BLOCK_SIZE = 64 * 1024
+DEFAULT_CACHE_SIZE = 64 * 1024 * 1024
+# Ranges separated by less than this amount of bytes are fetched with a single request: downloading the gap
+# (i.e., small bodies between local file headers) is cheaper than the latency of another request
+DEFAULT_MAX_GAP = 256 * 1024
+# Upper bound of the bytes fetched by a single request
+DEFAULT_MAX_REQUEST_SIZE = 16 * 1024 * 1024
+DEFAULT_TIMEOUT = 30.0
+
+# The EOCD, its comment and the Zip64 EOCD locator and record are all inside this amount of bytes from the end
+TAIL_LENGTH = 22 + 0xFFFF + 20 + 56
+
+CONTENT_RANGE_PATTERN = re.compile(r'bytes (\d+)-(\d+)/(\d+)')
+
+
+def coalesce_ranges(ranges: Iterable[Tuple[int, int]], max_gap: int, max_length: int) -> List[Tuple[int, int]]:
+    """
+    Read planner: merge the (begin, end) 'ranges' separated by at most 'max_gap' into as few (begin, end) ranges
+    as possible, each one at most 'max_length' long (unless a single input range is longer).
+    """
+    planned = []
+    for begin, end in sorted(ranges):
+        if end <= begin:
+            continue
+        if planned:
+            last_begin, last_end = planned[-1]
+            if begin - last_end <= max_gap and max(end, last_end) - last_begin <= max_length:
+                planned[-1] = (last_begin, max(end, last_end))
+                continue
+        planned.append((begin, end))
+    return planned
+
+
+
+class HttpRangeSource(ByteSource):
+    """
+    Source backed by a remote file served over HTTP(S) (i.e., a pre-signed URL of an object storage), every
+    fetch is a 'Range' request sent over a persistent connection.
+
+    The file is split in aligned blocks of 'block_size' bytes kept inside an LRU cache of 'cache_size' bytes:
+    reads are served from the cache and the missing blocks of a read are fetched with a single request.
+    The size is discovered by the first request, which also fetches the tail of the file (where the EOCD is).
+    Use 'prefetch' to fetch many scattered ranges (i.e., all the local file headers) with few requests.
+    """
+
+    def __init__(
+            self, url: str, block_size: int = DEFAULT_BLOCK_SIZE, cache_size: int = DEFAULT_CACHE_SIZE,
+            max_gap: int = DEFAULT_MAX_GAP, max_request_size: int = DEFAULT_MAX_REQUEST_SIZE,
+            headers: Dict[str, str] = None, timeout: float = DEFAULT_TIMEOUT
+    ):
+        parsed = urllib.parse.urlsplit(url)
+        if parsed.scheme not in ('http', 'https') or not parsed.netloc:
+            raise ValueError(f"Invalid URL '{url}', only 'http' and 'https' are supported")
+        self.url = url
+        self.target = urllib.parse.urlunsplit(('', '', parsed.path or '/', parsed.query, ''))
+        self._scheme = parsed.scheme
+        self._netloc = parsed.netloc
+
+        self.block_size = block_size
+        self.max_blocks = max(1, cache_size // block_size)
+        self.max_gap = max_gap
+        self.max_request_size = max(max_request_size, block_size)
+        self.headers = dict(headers or {})
+        self.timeout = timeout
+
+        # Amount of requests sent and bytes received, i.e., to check the effectiveness of the planner
+        self.requests = 0
+        self.bytes_fetched = 0
+
+        self.blocks: OrderedDict = OrderedDict()
+        self._size = None
+        self._connection = None
+        self._lock = threading.RLock()
+
+
+    @property
+    def size(self) -> int:
+        if self._size is None:
+            with self._lock:
+                if self._size is None:
+                    self._fetch_tail()
+        return self._size
+
+
+    def read_at(self, offset: int, length: int = -1) -> bytes:
+        end = self.size if length < 0 else min(offset + length, self.size)
+        if offset >= end:
+            return b''
+        first, last = offset // self.block_size, (end - 1) // self.block_size
+        data = b''.join(self._get_blocks(first, last + 1))
+        start = offset - first * self.block_size
+        return data[start:start + end - offset]
+
+
+    def prefetch(self, ranges: Iterable[Tuple[int, int]]):
+        """
+        Fetch the blocks covering the (offset, length) 'ranges' which are not cached yet, blocks separated by
+        less than 'max_gap' bytes are fetched by the same request (see 'coalesce_ranges').
+        Ranges are clamped to the size of the file, so their length can be an upper bound. Blocks exceeding the
+        capacity of the cache are evicted in LRU order, so callers should prefetch a window at a time.
+        """
+        size = self.size
+        with self._lock:
+            missing = []
+            for offset, length in ranges:
+                end = min(offset + length, size)
+                for index in range(offset // self.block_size, (end - 1) // self.block_size + 1):
+                    if index not in self.blocks:
+                        missing.append((index * self.block_size, (index + 1) * self.block_size))
+
+            for begin, end in coalesce_ranges(missing, self.max_gap, self.max_request_size):
+                self._fetch(begin, min(end, size))
+
+
+    def _get_blocks(self, first: int, stop: int) -> List[bytes]:
+        """ Return the blocks in [first, stop), missing ones are fetched with a single request """
+        with self._lock:
+            blocks = [self.blocks.get(index) for index in range(first, stop)]
+            missing = [first + i for i, block in enumerate(blocks) if block is None]
+            if not missing:
+                for index in range(first, stop):
+                    self.blocks.move_to_end(index)
+                return blocks
+
+            # The fetched blocks are returned directly, they may not fit inside the cache
+            fetched = self._fetch(missing[0] * self.block_size, (missing[-1] + 1) * self.block_size)
+            return [fetched[index] if index in fetched else blocks[index - first] for index in range(first, stop)]
+
+
+    def _fetch_tail(self):
+        # Size is unknown, a suffix range fetches the tail (aligned to blocks) and tells the size of the file
+        begin, total, data = self._request(f"bytes=-{TAIL_LENGTH + self.block_size}")
+        self._size = total
+        aligned = -(-begin // self.block_size) * self.block_size
+        self._store(aligned, data[aligned - begin:])
+
+
+    def _fetch(self, begin: int, end: int) -> Dict[int, bytes]:
+        end = min(end, self.size)
+        if begin >= end:
+            return {}
+        received, _, data = self._request(f"bytes={begin}-{end - 1}")
+        if received != begin or len(data) != end - begin:
+            raise ValueError(f"Unexpected response for range ({begin}, {end}) of '{self.url}'")
+        return self._store(begin, data)
+
+
+    def _store(self, begin: int, data: bytes) -> Dict[int, bytes]:
+        """ Split 'data' (starting from the aligned offset 'begin') in blocks and add them to the cache """
+        stored = {}
+        for start in range(0, len(data), self.block_size):
+            index = (begin + start) // self.block_size
+            stored[index] = self.blocks[index] = data[start:start + self.block_size]
+            self.blocks.move_to_end(index)
+        while len(self.blocks) > self.max_blocks:
+            self.blocks.popitem(last=False)
+        return stored
+
+
+    def _request(self, byte_range: str) -> Tuple[int, int, bytes]:
+        """ Send a 'Range' request, returning the offset of the received bytes, the size of the file and the bytes """
+        headers = {**self.headers, 'Range': byte_range}
+        for attempt in range(2):
+            connection = self._connect()
+            try:
+                connection.request("GET", self.target, headers=headers)
+                response = connection.getresponse()
+                data = response.read()
+                break
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                # The server closed the persistent connection, retry once with a new one
+                self._disconnect()
+                if attempt:
+                    raise
+
+        self.requests += 1
+        self.bytes_fetched += len(data)
+        LOGGER.debug(f"Fetched {len(data)} bytes of '{self.url}' ({byte_range}), status {response.status}")
+
+        if response.status == 416 and byte_range.startswith("bytes=-"):
+            # Suffix range of an empty file
+            return 0, 0, b''
+        if response.status != 206:
+            raise ValueError(f"Range request to '{self.url}' failed with status {response.status}, "
+                             f"the server must support 'Range' requests")
+        match = CONTENT_RANGE_PATTERN.fullmatch(response.getheader('Content-Range', ''))
+        if match is None:
+            raise ValueError(f"Invalid 'Content-Range' header from '{self.url}': "
+                             f"{response.getheader('Content-Range')}")
+        return int(match.group(1)), int(match.group(3)), data
+
+
+    def _connect(self) -> http.client.HTTPConnection:
+        if self._connection is None:
+            if self._scheme == 'https':
+                self._connection = http.client.HTTPSConnection(self._netloc, timeout=self.timeout)
+            else:
+                self._connection = http.client.HTTPConnection(self._netloc, timeout=self.timeout)
+        return self._connection
+
+
+    def _disconnect(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+    def close(self):
+        with self._lock:
+            self._disconnect()
+            self.blocks.clear()
@@ -0,0 +1,186 @@
+import mmap
+import os
+from contextlib import nullcontext
+from typing import BinaryIO, Iterable, Iterator, Tuple, Union
+
+import logging
+LOGGER = logging.getLogger("zipstruct")
+
+# Default size of the chunks used to stream big ranges (i.e., entry bodies)
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+_NO_PHASE = nullcontext()
+
+
+class ByteSource:
+    """
+    Random-access and read-only source of bytes, used by all the parsers in place of a plain file object.
+    Offsets are always absolute (i.e., from the start of the archive).
+    """
+
+    @property
+    def size(self) -> int:
+        raise NotImplementedError
+
+    def read_at(self, offset: int, length: int = -1) -> Union[bytes, memoryview]:
+        """
+        Read 'length' bytes starting from 'offset' ('-1' means up to the end of the source).
+        Fewer bytes are returned if the end of the source is reached. The result may be a 'memoryview'
+        which is valid only as long as the source is open, copy it with 'bytes()' to keep it.
+        """
+        raise NotImplementedError
+
+    def iter_range(
+            self, offset: int, length: int, buffer: bytearray = None
+    ) -> Iterator[Union[bytes, memoryview]]:
+        """
+        Yield the bytes in range [offset, offset + length) as one or more chunks, the yielded chunks must not
+        be retained by the caller. If a 'buffer' is passed, chunks are at most as big as the buffer and may be
+        stored inside it, so that memory usage does not depend on 'length'.
+        """
+        if buffer is None:
+            yield self.read_at(offset, length)
+            return
+
+        end = offset + length
+        while offset < end:
+            chunk = self.read_at(offset, min(len(buffer), end - offset))
+            if not chunk:
+                return
+            yield chunk
+            offset += len(chunk)
+
+    def prefetch(self, ranges: Iterable[Tuple[int, int]]):
+        """
+        Hint that the (offset, length) 'ranges' are going to be read soon, so that sources with an expensive access
+        (i.e., 'remote.HttpRangeSource') can fetch them in advance with few calls. Local sources ignore it, and
+        'ranges' may be a generator which is never consumed.
+        """
+        pass
+
+    def phase(self, name: str):
+        """ Context telling which record is read inside it, only instrumented sources measure it """
+        return _NO_PHASE
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+
+class FileSource(ByteSource):
+    """ Source backed by a file object, every read is a 'seek' followed by a 'read' """
+
+    def __init__(self, file: BinaryIO, owned: bool = False):
+        self.file = file
+        self.owned = owned
+        self._size = None
+
+    @property
+    def size(self) -> int:
+        if self._size is None:
+            self._size = self.file.seek(0, 2)
+        return self._size
+
+    def read_at(self, offset: int, length: int = -1) -> bytes:
+        self.file.seek(offset, 0)
+        return self.file.read(length)
+
+    def iter_range(self, offset: int, length: int, buffer: bytearray = None) -> Iterator[Union[bytes, memoryview]]:
+        if buffer is None:
+            yield self.read_at(offset, length)
+            return
+
+        # Read directly inside the buffer, no new bytes object is allocated for each chunk
+        self.file.seek(offset, 0)
+        with memoryview(buffer) as view:
+            remaining = length
+            while remaining > 0:
+                read = self.file.readinto(view[:min(len(view), remaining)])
+                if not read:
+                    return
+                with view[:read] as chunk:
+                    yield chunk
+                remaining -= read
+
+    def close(self):
+        if self.owned:
+            self.file.close()
+
+
+
+class MmapSource(ByteSource):
+    """ Source backed by a read-only memory mapping, reads are zero-copy slices of the mapping """
+
+    def __init__(self, path: str):
+        self.file = open(path, mode="rb")
+        try:
+            self.mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self.file.close()
+            raise
+        self.view = memoryview(self.mmap)
+
+    @property
+    def size(self) -> int:
+        return len(self.mmap)
+
+    def read_at(self, offset: int, length: int = -1) -> memoryview:
+        end = len(self.mmap) if length < 0 else offset + length
+        return self.view[offset:end]
+
+    def iter_range(self, offset: int, length: int, buffer: bytearray = None) -> Iterator[memoryview]:
+        # Slices of the mapping are zero-copy, the buffer only bounds the size of each chunk
+        end = min(offset + length, len(self.mmap))
+        step = end - offset if buffer is None else len(buffer)
+        while offset < end:
+            with self.view[offset:min(offset + step, end)] as chunk:
+                yield chunk
+            offset += step
+
+    def close(self):
+        if self.mmap.closed:
+            return
+        self.view.release()
+        try:
+            self.mmap.close()
+        except BufferError:
+            # Some slice is still referenced (i.e., by a pending traceback), the mapping is released by the GC
+            LOGGER.warning(f"Memory mapping of '{self.file.name}' is still in use, it cannot be closed now")
+        self.file.close()
+
+
+
+def _open_http(url: str) -> ByteSource:
+    # Imported on demand, local archives do not need the HTTP machinery
+    from src.zipstruct.utils.remote import HttpRangeSource
+    return HttpRangeSource(url)
+
+
+# Factories of the sources by name, more can be registered (i.e., an 'HttpRangeSource' with custom headers)
+BACKENDS = {
+    'file': lambda path: FileSource(open(path, mode="rb"), owned=True),
+    'mmap': MmapSource,
+    'http': _open_http,
+}
+
+
+def open_source(path: str, backend: str = 'file') -> ByteSource:
+    """ Open the file at 'path' (an URL for 'http') with one of the available 'BACKENDS' """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown I/O backend '{backend}', available ones: {list(BACKENDS.keys())}")
+    if backend == 'mmap' and os.path.getsize(path) == 0:
+        raise ValueError(f"Cannot memory-map '{path}', the file is empty")
+    return BACKENDS[backend](path)
+
+
+def as_source(file: Union[BinaryIO, ByteSource]) -> ByteSource:
+    """ Wrap a file object inside a 'ByteSource', sources are returned as they are """
+    if isinstance(file, ByteSource):
+        return file
+    return FileSource(file)
@@ -1,54 +1,200 @@
+import heapq
 import pprint
+from bisect import bisect_left, bisect_right
+from typing import List, Optional, Union
 
-from intervaltree import IntervalTree, Interval
+from intervaltree import Interval
 
 import logging
 LOGGER = logging.getLogger("zipstruct")
 
+# How much bookkeeping is done on the parsed ranges, see 'create_read_state'
+VALIDATION_LEVELS = ('full', 'summary', 'off')
+
+
+class _Run:
+    """ Sorted and non-overlapping intervals, stored as parallel lists so that they can be searched with 'bisect' """
+
+    __slots__ = ('begins', 'ends', 'titles')
+
+    def __init__(self, begins: List[int], ends: List[int], titles: list):
+        self.begins = begins
+        self.ends = ends
+        self.titles = titles
+
+    def __len__(self):
+        return len(self.begins)
+
+    def overlapping(self, begin: int, end: int) -> range:
+        """ Indexes of the intervals overlapping with [begin, end) """
+        first = bisect_right(self.ends, begin)
+        last = bisect_left(self.begins, end, lo=first)
+        return range(first, last)
+
+    def enveloped(self, begin: int, end: int) -> range:
+        """ Indexes of the intervals completely inside [begin, end) """
+        first = bisect_left(self.begins, begin)
+        last = bisect_right(self.ends, end, lo=first)
+        return range(first, max(first, last))
+
+    def merge(self, other: '_Run') -> '_Run':
+        """ Merge with 'other' in linear time, runs which do not interleave are simply concatenated """
+        if other.begins[0] >= self.ends[-1]:
+            return _Run(self.begins + other.begins, self.ends + other.ends, self.titles + other.titles)
+        if other.ends[-1] <= self.begins[0]:
+            return _Run(other.begins + self.begins, other.ends + self.ends, other.titles + self.titles)
+        begins, ends, titles = self.begins + other.begins, self.ends + other.ends, self.titles + other.titles
+        order = list(heapq.merge(range(len(self)), range(len(self), len(begins)), key=begins.__getitem__))
+        return _Run([begins[i] for i in order], [ends[i] for i in order], [titles[i] for i in order])
+
 
 class ReadState:
+    """
+    Keeps track of the byte ranges of a file that have been parsed, each one can be registered only once.
+
+    Ranges are stored inside a few sorted runs (at most logarithmic in the amount of ranges), which are merged
+    pairwise when the last one grows as big as the previous one. Ranges registered in increasing order, as
+    done while loading an archive, are simply appended to the last run. Registering 'n' ranges costs
+    O(n log n) overall, while both checks cost O(log^2 n).
+    """
+
     def __init__(self, full_size: int):
         # Start with everything as unknown
         self.size = full_size
-        self.unknown_intervals = IntervalTree(intervals=[Interval(begin=0, end=self.size)])
-        self.parsed_intervals = IntervalTree()
+        self.bytes_read = 0
+        self._runs: List[_Run] = []
 
     def registeri(self, begin: int, end: int, title: str):
-        interval = Interval(begin=begin, end=end, data=title)
-        self.register(interval)
+        if end < begin:
+            raise ValueError(f"Interval ({begin}, {end}) has a negative length")
+        if begin == end:
+            # Empty ranges (i.e., the body of an empty file) do not cover any byte
+            return
 
-    def register(self, interval: Interval):
-        begin, end = interval.begin, interval.end
-        if self.parsed_intervals.overlap(begin=begin, end=end):
+        if self._count(begin, end, _Run.overlapping):
             raise ValueError(f"Interval ({begin}, {end}) is overlapping with some "
-                             f"other parsed interval: {self.parsed_intervals[begin:end]}")
-        self.parsed_intervals.add(interval)
-        self.unknown_intervals.chop(begin=begin, end=end)
+                             f"other parsed interval: {self.overlapping(begin, end)}")
+
+        last = self._runs[-1] if self._runs else None
+        if last is not None and begin >= last.ends[-1]:
+            last.begins.append(begin)
+            last.ends.append(end)
+            last.titles.append(title)
+        else:
+            self._runs.append(_Run([begin], [end], [title]))
+        while len(self._runs) > 1 and len(self._runs[-2]) <= len(self._runs[-1]):
+            last = self._runs.pop()
+            self._runs[-1] = self._runs[-1].merge(last)
+        self.bytes_read += end - begin
+
+    def register(self, interval: Interval):
+        self.registeri(begin=interval.begin, end=interval.end, title=interval.data)
 
     def raise_for_not_existing(self, begin: int, end: int):
-        result = self.parsed_intervals.envelop(begin=begin, end=end)
-        size = len(result)
+        if begin == end:
+            return
+        size = self._count(begin, end, _Run.enveloped)
         if size > 1:
             raise ValueError(f"Interval ({begin}, {end}) envelops multiple existing "
-                             f"intervals: {self.parsed_intervals[begin:end]}")
+                             f"intervals: {self.overlapping(begin, end)}")
         if size == 0:
             raise ValueError(f"Interval ({begin}, {end}) does not exists")
         return
 
-    def __str__(self):
-        bytes_read = sum([interval.end - interval.begin for interval in self.parsed_intervals])
-        return pprint.pformat({
+    def _count(self, begin: int, end: int, search) -> int:
+        count = 0
+        for run in self._runs:
+            count += len(search(run, begin, end))
+        return count
+
+    def overlapping(self, begin: int, end: int) -> List[Interval]:
+        """ Parsed intervals overlapping with [begin, end), sorted by offset """
+        intervals = [
+            Interval(run.begins[i], run.ends[i], run.titles[i])
+            for run in self._runs for i in run.overlapping(begin, end)
+        ]
+        return sorted(intervals)
+
+    @property
+    def parsed_intervals(self) -> List[Interval]:
+        return self.overlapping(0, max(self.size, max((run.ends[-1] for run in self._runs), default=0)))
+
+    @property
+    def unknown_intervals(self) -> List[Interval]:
+        unknown, offset = [], 0
+        for interval in self.parsed_intervals:
+            if interval.begin > offset:
+                unknown.append(Interval(offset, interval.begin))
+            offset = max(offset, interval.end)
+        if offset < self.size:
+            unknown.append(Interval(offset, self.size))
+        return unknown
+
+    def summary(self) -> dict:
+        return {
             "full_size": self.size,
-            "read_amount": f"{bytes_read}/{self.size}",
-            "read_rate": f"{(bytes_read / self.size * 100):.2f}%",
-        })
+            "read_amount": f"{self.bytes_read}/{self.size}",
+            "read_rate": f"{(self.bytes_read / self.size * 100):.2f}%",
+        }
+
+    def __str__(self):
+        return pprint.pformat(self.summary())
 
     def __repr__(self):
-        bytes_read = sum([interval.end - interval.begin for interval in self.parsed_intervals])
         return pprint.pformat({
-            "full_size": self.size,
-            "read_amount": f"{bytes_read}/{self.size}",
-            "read_rate": f"{(bytes_read / self.size * 100):.2f}%",
-            "ranges_read": self.parsed_intervals.all_intervals,
-            "ranges_unknown": self.unknown_intervals.all_intervals,
+            **self.summary(),
+            "ranges_read": self.parsed_intervals,
+            "ranges_unknown": self.unknown_intervals,
         })
+
+
+
+class ReadCounter:
+    """
+    Cheap replacement of 'ReadState' which only counts the parsed bytes, ranges are neither stored nor checked.
+    """
+
+    def __init__(self, full_size: int):
+        self.size = full_size
+        self.bytes_read = 0
+
+    def registeri(self, begin: int, end: int, title: str):
+        self.bytes_read += end - begin
+
+    def register(self, interval: Interval):
+        self.bytes_read += interval.end - interval.begin
+
+    def raise_for_not_existing(self, begin: int, end: int):
+        return
+
+    def summary(self) -> dict:
+        return {
+            "full_size": self.size,
+            "read_amount": f"{self.bytes_read}/{self.size}",
+            "read_rate": f"{(self.bytes_read / self.size * 100):.2f}%",
+        }
+
+    def __str__(self):
+        return pprint.pformat(self.summary())
+
+    def __repr__(self):
+        return str(self)
+
+
+
+ParsingState = Union[ReadState, ReadCounter]
+
+
+def create_read_state(full_size: int, validation: str = 'full') -> Optional[ParsingState]:
+    """
+    Create the object keeping track of the parsed ranges for the passed 'validation' level:
+    'full' checks overlaps and keeps all the ranges ('ReadState'), 'summary' only counts the parsed bytes
+    ('ReadCounter'), 'off' does not keep track of anything ('None').
+    """
+    if validation not in VALIDATION_LEVELS:
+        raise ValueError(f"Unknown validation level '{validation}', available ones: {VALIDATION_LEVELS}")
+    if validation == 'full':
+        return ReadState(full_size)
+    if validation == 'summary':
+        return ReadCounter(full_size)
+    return None
@@ -0,0 +1,251 @@
+import json
+import os
+import struct
+import zlib
+from concurrent.futures import as_completed
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union
+
+from src.zipstruct.utils.pools import create_pool, split_in_batches
+from src.zipstruct.utils.common import GeneralPurposeBitMasks
+from src.zipstruct.utils.content import ContentStream, SUPPORTED_METHODS
+from src.zipstruct.utils.sources import ByteSource, open_source, DEFAULT_CHUNK_SIZE
+
+import logging
+LOGGER = logging.getLogger("zipstruct")
+
+VERIFY_STATUSES = ('ok', 'failed', 'skipped')
+
+
+class Expected(NamedTuple):
+    """ CRC-32 and sizes of an entry as declared by one of its records ('CD', 'LFH' or 'DD') """
+    record: str
+    crc32: int
+    compressed_size: int
+    uncompressed_size: int
+
+
+
+class VerifyTask(NamedTuple):
+    """ Everything needed to verify the body of an entry, it is sent as it is to the workers """
+    name: str
+    offset: int
+    length: int
+    method: int
+    flags: int
+    expected: Tuple[Expected, ...]
+
+
+
+class EntryVerification(NamedTuple):
+    """
+    Outcome of the verification of an entry body: CRC-32 and uncompressed size computed from the body, the amount
+    of compressed bytes read and the 'errors' found. Entries that cannot be checked (i.e., encrypted ones or using
+    an unsupported compression method) are 'skipped', see 'VERIFY_STATUSES'.
+    """
+    name: str
+    status: str
+    crc32: Optional[int] = None
+    compressed_size: int = 0
+    uncompressed_size: int = 0
+    errors: Tuple[str, ...] = ()
+
+
+
+class VerificationReport:
+    """ Per-entry results of 'verify_entries', in archive order """
+
+    __slots__ = ('entries',)
+
+    def __init__(self, entries: List[EntryVerification] = None):
+        self.entries = entries or []
+
+
+    @property
+    def failed(self) -> List[EntryVerification]:
+        return [entry for entry in self.entries if entry.status == 'failed']
+
+
+    @property
+    def skipped(self) -> List[EntryVerification]:
+        return [entry for entry in self.entries if entry.status == 'skipped']
+
+
+    @property
+    def ok(self) -> bool:
+        return not self.failed
+
+
+    def summary(self) -> Dict[str, int]:
+        counts = {status: 0 for status in VERIFY_STATUSES}
+        for entry in self.entries:
+            counts[entry.status] += 1
+        return counts
+
+
+    def to_dict(self) -> Dict:
+        return {'summary': self.summary(), 'entries': [entry._asdict() for entry in self.entries]}
+
+
+    def to_json(self, **kwargs) -> str:
+        return json.dumps(self.to_dict(), **kwargs)
+
+
+    def __str__(self):
+        lines = []
+        for entry in self.entries:
+            if entry.status != 'ok':
+                lines.append(f"{entry.status.upper()} {entry.name!r}: {'; '.join(entry.errors)}")
+        summary = self.summary()
+        lines.append(f"{summary['ok']} ok, {summary['failed']} failed, {summary['skipped']} skipped entries")
+        return "\n".join(lines)
+
+
+    def __repr__(self):
+        return f"VerificationReport({self.summary()})"
+
+
+
+def _crc32(record) -> int:
+    return struct.unpack("<I", record.crc32)[0]
+
+
+def create_verify_task(entry) -> VerifyTask:
+    """ Collect the CRC-32 and the sizes declared by the CD, the LFH (unless deferred to the DD) and the DD """
+    cd, lfh, dd = entry.central_directory, entry.local_file_header, entry.data_descriptor
+    expected = [Expected('CD', _crc32(cd), cd.compressed_size, cd.uncompressed_size)]
+    if not lfh.general_purpose_flags & GeneralPurposeBitMasks.USE_DATA_DESCRIPTOR.value:
+        expected.append(Expected('LFH', _crc32(lfh), lfh.compressed_size, lfh.uncompressed_size))
+    if dd is not None:
+        expected.append(Expected('DD', _crc32(dd), dd.compressed_size, dd.uncompressed_size))
+    return VerifyTask(
+        name     = cd.file_name,
+        offset   = entry.body_offset,
+        length   = entry.body_compressed_size,
+        method   = cd.compression_method,
+        flags    = cd.general_purpose_flags,
+        expected = tuple(expected),
+    )
+
+
+class BodyVerifier:
+    """
+    Verification of the body of 'task' from its compressed chunks, passed in order to 'update' by whoever reads
+    the body (i.e., 'compute_zip_hash' while hashing it, so that the body is read once), see 'result'.
+    Encrypted entries and the ones using an unsupported compression method are skipped, 'skipped' tells why.
+    """
+
+    __slots__ = ('task', 'max_length', 'skipped', 'errors', '_stream')
+
+    def __init__(self, task: VerifyTask, max_length: int = DEFAULT_CHUNK_SIZE):
+        self.task = task
+        self.max_length = max_length
+        self.skipped: Optional[str] = None
+        self.errors: List[str] = []
+        self._stream = None
+        if task.flags & GeneralPurposeBitMasks.ENCRYPTED.value:
+            self.skipped = "encrypted entry"
+        elif task.method not in SUPPORTED_METHODS:
+            self.skipped = f"unsupported compression method {task.method}"
+        else:
+            self._stream = ContentStream(None, task.offset, task.length, task.method)
+
+
+    def update(self, chunk: Union[bytes, memoryview]):
+        """ Decompress the next 'chunk' of the body, nothing is done once an error has been found """
+        if self._stream is None or self.errors:
+            return
+        try:
+            for _ in self._stream.feed(chunk, self.max_length):
+                pass
+        except zlib.error as e:
+            self.errors.append(f"invalid deflate stream ({e})")
+
+
+    def result(self) -> EntryVerification:
+        """ Compare the CRC-32 and the sizes of the body with the ones declared by the records of the entry """
+        task = self.task
+        if self.skipped is not None:
+            return EntryVerification(task.name, 'skipped', errors=(self.skipped,))
+
+        stream, errors = self._stream, self.errors
+        if not errors:
+            try:
+                for _ in stream.flush():
+                    pass
+            except zlib.error as e:
+                errors.append(f"invalid deflate stream ({e})")
+        if not errors and stream.error is not None:
+            errors.append(stream.error)
+        crc, size, read = stream.crc32, stream.size, stream.read
+
+        if not errors:
+            for expected in task.expected:
+                if crc != expected.crc32:
+                    errors.append(f"CRC-32 {crc:08x} does not match the {expected.record} one ({expected.crc32:08x})")
+                if size != expected.uncompressed_size:
+                    errors.append(f"uncompressed size {size} does not match the {expected.record} one "
+                                  f"({expected.uncompressed_size})")
+                if read != expected.compressed_size:
+                    errors.append(f"compressed size {read} does not match the {expected.record} one "
+                                  f"({expected.compressed_size})")
+
+        status = 'failed' if errors else 'ok'
+        return EntryVerification(task.name, status, crc, read, size, tuple(errors))
+
+
+
+def verify_body(source: ByteSource, task: VerifyTask, buffer: bytearray = None) -> EntryVerification:
+    """
+    Stream the body of 'task' through the decompressor (if any, see 'ContentStream'), computing its CRC-32 and
+    uncompressed size, and compare them with the values declared by the records of the entry.
+    """
+    verifier = BodyVerifier(task, len(buffer) if buffer is not None else DEFAULT_CHUNK_SIZE)
+    if verifier.skipped is None:
+        for chunk in source.iter_range(task.offset, task.length, buffer):
+            verifier.update(chunk)
+            if verifier.errors:
+                break
+    return verifier.result()
+
+
+def verify_bodies(
+        path: str, backend: str, tasks: List[VerifyTask], chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> List[EntryVerification]:
+    """ Verify the bodies of 'tasks' one after the other, opening the archive once """
+    buffer = bytearray(chunk_size)
+    with open_source(path, backend) as source:
+        return [verify_body(source, task, buffer) for task in tasks]
+
+
+def verify_entries(
+        path: str, backend: str, entries: list, workers: int = None, executor: str = 'thread',
+        fail_fast: bool = False, chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> VerificationReport:
+    """
+    Verify the body of each entry against the CRC-32 and the sizes declared by its records, on a pool of
+    'workers' ('thread' or 'process' executor, by default one thread per CPU). Entries are split in contiguous
+    batches, each worker reads a batch sequentially with its own source.
+    With 'fail_fast' a ValueError is raised as soon as a corrupted entry is found (pending batches are
+    cancelled), otherwise every entry is verified and reported.
+    """
+    workers = workers or os.cpu_count() or 1
+
+    # Metadata is taken from the parsed entries (parsing lazy ones if needed), only bodies are read again
+    tasks = [create_verify_task(entry) for entry in entries]
+    batches = split_in_batches(tasks, [task.length for task in tasks], workers * 4)
+    results: List[Optional[List[EntryVerification]]] = [None] * len(batches)
+    with create_pool(executor, workers) as pool:
+        futures = {
+            pool.submit(verify_bodies, path, backend, batch, chunk_size): index for index, batch in enumerate(batches)
+        }
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+            failed = next((entry for entry in results[futures[future]] if entry.status == 'failed'), None)
+            if fail_fast and failed is not None:
+                for pending in futures:
+                    pending.cancel()
+                raise ValueError(f"Corrupted entry '{failed.name}': {'; '.join(failed.errors)}")
+
+    report = VerificationReport([entry for batch in results for entry in batch])
+    LOGGER.debug(f"Verified {len(report.entries)} entries of '{path}': {report.summary()}")
+    return report
@@ -1,14 +1,20 @@
-import os
-from typing import Optional, List
+from typing import Optional, List, Union, Dict, Any, Tuple
 
-from pydantic import BaseModel
+from pydantic import BaseModel, PrivateAttr
 
 from src.zipstruct.centraldirs.centraldir import CentralDirectory
+from src.zipstruct.centraldirs.table import CentralDirectoryTable
 from src.zipstruct.descriptors.descriptor import DataDescriptor
 from src.zipstruct.eocd.eocd import EndOfCentralDirectory
 from src.zipstruct.localheaders.lfh import LocalFileHeader
-from src.zipstruct.utils import loaders
-from src.zipstruct.utils.state import ReadState
+from src.zipstruct.utils import loaders, recovery
+from src.zipstruct.utils.diff import ZipDiff, diff_zips
+from src.zipstruct.utils.instrument import Instrumentation, measure
+from src.zipstruct.utils.reader import EntryReader
+from src.zipstruct.utils.aio import AsyncExecutor, get_default_executor, split_in_steps, DEFAULT_STEP_ENTRIES
+from src.zipstruct.utils.sources import ByteSource, open_source, DEFAULT_CHUNK_SIZE
+from src.zipstruct.utils.state import ParsingState, create_read_state
+from src.zipstruct.utils.verify import VerificationReport, verify_entries
 
 import logging
 LOGGER = logging.getLogger("zipstruct")
@@ -17,69 +23,332 @@ LOGGER = logging.getLogger("zipstruct")
 class ZipFileEntry(BaseModel):
     """
     This model aggregates together related metadata of a file stored inside a ZIP archive.
+    Entries found by 'ParsedZip.recover' with no matching central directory record are not 'confirmed', their
+    central directory record is rebuilt from the local file header and the data descriptor.
     """
 
+    class Config:
+        arbitrary_types_allowed = True
+
     central_directory: CentralDirectory
     local_file_header: LocalFileHeader
     data_descriptor: Optional[DataDescriptor]
     body_offset: int
     body_compressed_size: int
+    confirmed: bool = True
+
+    @property
+    def is_resolved(self) -> bool:
+        # Always parsed, same interface of 'LazyZipFileEntry'
+        return True
+
+
+
+class LazyZipFileEntry(BaseModel):
+    """
+    Same as 'ZipFileEntry', but only the central directory is available when the archive is loaded.
+    The local file header, the data descriptor and the body offset are parsed on first access and memoized.
+    """
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    central_directory: CentralDirectory
+
+    _parsed_zip: Any = PrivateAttr(default=None)
+    _resolved: Optional[Dict] = PrivateAttr(default=None)
+    _previous: Any = PrivateAttr(default=None)
+
+    def _resolve(self) -> Dict:
+        if self._resolved is None:
+            self._resolved = self._parsed_zip.resolve_entry(self.central_directory, self._previous)
+            self._previous = None
+        return self._resolved
+
+    @property
+    def is_resolved(self) -> bool:
+        return self._resolved is not None
+
+    @property
+    def local_file_header(self) -> LocalFileHeader:
+        return self._resolve()['local_file_header']
+
+    @property
+    def data_descriptor(self) -> Optional[DataDescriptor]:
+        return self._resolve()['data_descriptor']
+
+    @property
+    def body_offset(self) -> int:
+        return self._resolve()['body_offset']
+
+    @property
+    def body_compressed_size(self) -> int:
+        # Known from the central directory, no need to resolve the entry
+        return self.central_directory.compressed_size
 
 
 
 class ParsedZip(BaseModel):
     path: str
-    entries: List[ZipFileEntry]
+    entries: List[Union[ZipFileEntry, LazyZipFileEntry]]
     eocd: EndOfCentralDirectory
-    parsing_state: ReadState
+    parsing_state: Optional[ParsingState] = None
+    backend: str = 'file'
+    validation: str = 'full'
+    recovered: bool = False
+    table: Optional[CentralDirectoryTable] = None
+    """ Columnar view of the central directory, only set when loaded with 'table' """
+
+    _source: Optional[ByteSource] = PrivateAttr(default=None)
+    _by_name: Optional[Dict[str, Any]] = PrivateAttr(default=None)
 
     class Config:
         arbitrary_types_allowed = True
 
     @staticmethod
-    def load(path: str) -> "ParsedZip":
-        file_size = os.path.getsize(path)
-        state = ReadState(file_size)
+    def load(
+            path: str, bulk: bool = True, lazy: bool = False, backend: str = 'file', validation: str = 'full',
+            instrument: Instrumentation = None, previous: "ParsedZip" = None, table: bool = False
+    ) -> "ParsedZip":
+        """
+        Parse the ZIP archive at 'path'. When 'bulk' is set the central directory is read with a single call
+        using the size and the offset declared in the EOCD, otherwise it is read record by record.
+        When 'lazy' is set only the EOCD and the central directory are parsed, while the rest of each entry is
+        parsed on first access (see 'LazyZipFileEntry').
+        The 'backend' selects how the file is accessed, see 'sources.BACKENDS' (i.e., 'file', 'mmap' or 'http',
+        where 'path' is the URL of an archive fetched with range requests, see 'remote.HttpRangeSource').
+        The 'validation' level tells how parsed ranges are tracked inside 'parsing_state', see 'create_read_state':
+        with 'full' (default) overlapping records are detected, with 'summary' only the parsed bytes are counted,
+        with 'off' nothing is tracked and 'parsing_state' is None.
+        If an 'instrument' is passed, reads and timings of each phase ('eocd', 'cd', 'lfh' and 'dd') are
+        collected inside it, see 'Instrumentation'.
+        If the 'previous' version of the archive is passed (i.e., the archive before a manifest was appended to
+        it), its entries which are still at the same offset, with the same central directory key and unchanged
+        LFH/DD bytes, are reused: only the appended entries are parsed, see 'loaders.reuse_zip_file_entry'.
+        When 'table' is set the central directory is read in bulk and decoded into a 'CentralDirectoryTable',
+        kept as 'table' for columnar queries, and the central directory of each entry is created from it.
+        """
+        with open_source(path, backend) as f:
+            if instrument is not None:
+                f = instrument.wrap(f)
+            state, eocd, centraldirs, cd_table = ParsedZip._load_directory(f, bulk, validation, instrument, table)
+            reusable = ParsedZip._index_previous(f, previous)
+            if lazy:
+                pz = ParsedZip._create_lazy(path, eocd, centraldirs, state, backend, validation, reusable)
+            else:
+                with measure(instrument, 'lfh'):
+                    dict_entries = loaders.create_zip_file_entries(f, centraldirs, state, previous=reusable)
+                pz = ParsedZip._create(path, eocd, dict_entries, state, backend, validation)
+        pz.table = cd_table
+        return pz
+
+
+    @staticmethod
+    async def aload(
+            path: str, bulk: bool = True, lazy: bool = False, backend: str = 'file', validation: str = 'full',
+            executor: AsyncExecutor = None, step_entries: int = DEFAULT_STEP_ENTRIES, previous: "ParsedZip" = None,
+            table: bool = False
+    ) -> "ParsedZip":
+        """
+        Same as 'load', but blocking work runs on the pool of 'executor' (see 'AsyncExecutor', by default a
+        shared one) and counts towards its limit of concurrent archives. Local file headers are parsed in steps
+        of 'step_entries' entries, the task can be cancelled between steps.
+        """
+        executor = executor or get_default_executor()
+        async with executor.limit:
+            source = await executor.open(open_source, path, backend)
+            async with executor.steps(on_exit=source.close) as run:
+                state, eocd, centraldirs, cd_table = await run(
+                    ParsedZip._load_directory, source, bulk, validation, None, table
+                )
+                reusable = await run(ParsedZip._index_previous, source, previous)
+                if lazy:
+                    pz = await run(
+                        ParsedZip._create_lazy, path, eocd, centraldirs, state, backend, validation, reusable
+                    )
+                    pz.table = cd_table
+                    return pz
+
+                # Same order and same keys of 'loaders.create_zip_file_entries'
+                await run(centraldirs.sort, key=lambda cd: cd.relative_offset_of_local_header)
+                dict_entries = {}
+                for step in split_in_steps(centraldirs, max_items=step_entries):
+                    dict_entries.update(
+                        await run(loaders.create_zip_file_entries, source, step, state, previous=reusable)
+                    )
+            pz = await executor.run(ParsedZip._create, path, eocd, dict_entries, state, backend, validation)
+            pz.table = cd_table
+            return pz
+
+
+    @staticmethod
+    def recover(path: str, backend: str = 'mmap', validation: str = 'full') -> "ParsedZip":
+        """
+        Rebuild a damaged archive (i.e., a truncated upload) which cannot be loaded: instead of relying on the EOCD
+        and the central directory, the file is scanned forward for local file headers, stepping over the bodies.
+        Entries confirmed by a central directory record are flagged as 'confirmed', see 'recovery.recover_entries'.
+        Memory-mapped files (default 'backend') are scanned in place, at about the speed of reading them.
+        """
+        with open_source(path, backend) as f:
+            state = create_read_state(f.size, validation)
+            eocd, dict_entries = recovery.recover_entries(f, state)
+        pz = ParsedZip._create(path, eocd, dict_entries, state, backend, validation)
+        pz.recovered = True
+        return pz
+
+
+    @staticmethod
+    def _load_directory(
+            source: ByteSource, bulk: bool, validation: str, instrument: Instrumentation = None, table: bool = False
+    ) -> Tuple[Optional[ParsingState], EndOfCentralDirectory, List[CentralDirectory], Optional[CentralDirectoryTable]]:
+        with measure(instrument, 'eocd'):
+            state = create_read_state(source.size, validation)
+            eocd = loaders.load_eocd(source, state)
+        with measure(instrument, 'cd'):
+            if table:
+                cd_table = loaders.load_central_directory_table(
+                    source, eocd.central_dir_offset, eocd.central_dir_size, state
+                )
+                return state, eocd, list(cd_table), cd_table
+            cd_size = eocd.central_dir_size if bulk else None
+            centraldirs = loaders.load_central_directories(source, eocd.central_dir_offset, state, size=cd_size)
+        return state, eocd, centraldirs, None
+
+
+    @staticmethod
+    def _index_previous(source: ByteSource, previous: Optional["ParsedZip"]) -> Optional[Dict]:
+        if previous is None:
+            return None
+        return loaders.index_previous_entries(source, previous.entries, previous.eocd.central_dir_offset)
 
-        with open(path, mode="rb") as f:
-            eocd = loaders.load_eocd(f, state)
-            centraldirs = loaders.load_central_directories(f, eocd.offset_of_start_of_central_directory, state)
-            dict_entries = loaders.create_zip_file_entries(f, centraldirs, state)
 
+    @staticmethod
+    def _create(
+            path: str, eocd: EndOfCentralDirectory, dict_entries: Dict, state: Optional[ParsingState], backend: str,
+            validation: str
+    ) -> "ParsedZip":
         zip_entries = []
-        for name, value in dict_entries.items():
+        for value in dict_entries.values():
             zfe = ZipFileEntry(
                 central_directory    = value["central_directory"],
                 local_file_header    = value["local_file_header"],
                 data_descriptor      = value["data_descriptor"],
                 body_offset          = value["body_offset"],
                 body_compressed_size = value["body_compressed_size"],
+                confirmed            = value.get("confirmed", True),
             )
             zip_entries.append(zfe)
-        return ParsedZip(path=path, entries=zip_entries, eocd=eocd, parsing_state=state)
+        return ParsedZip(
+            path=path, entries=zip_entries, eocd=eocd, parsing_state=state, backend=backend, validation=validation
+        )
+
+
+    @staticmethod
+    def _create_lazy(
+            path: str, eocd: EndOfCentralDirectory, centraldirs: List[CentralDirectory],
+            state: Optional[ParsingState], backend: str, validation: str, previous: Dict = None
+    ) -> "ParsedZip":
+        # Same order and same keys of 'loaders.create_zip_file_entries'
+        centraldirs.sort(key=lambda cd: cd.relative_offset_of_local_header)
+        by_offset = {cd.relative_offset_of_local_header: cd for cd in centraldirs}
+
+        zip_entries = [LazyZipFileEntry(central_directory=cd) for cd in by_offset.values()]
+        pz = ParsedZip(
+            path=path, entries=zip_entries, eocd=eocd, parsing_state=state, backend=backend, validation=validation
+        )
+        for entry in zip_entries:
+            entry._parsed_zip = pz
+            if previous:
+                # Checked against the file on first access, see 'resolve_entry'
+                entry._previous = previous.get(entry.central_directory.relative_offset_of_local_header)
+        return pz
+
+
+    def resolve_entry(self, cd: CentralDirectory, previous: Any = None) -> Dict:
+        """
+        Parse the local file header and the data descriptor of the entry described by 'cd' (unless the 'previous'
+        version of the entry can be reused, see 'loaders.reuse_zip_file_entry'), the file is opened on first call
+        and kept open until 'close' is called.
+        """
+        source = self._get_source()
+        entry = loaders.reuse_zip_file_entry(source, cd, previous, self.parsing_state)
+        return entry if entry is not None else loaders.load_zip_file_entry(source, cd, self.parsing_state)
+
+
+    def _get_source(self) -> ByteSource:
+        if self._source is None:
+            self._source = self.open_source()
+        return self._source
+
+
+    def get_entry(self, name: str) -> Union[ZipFileEntry, LazyZipFileEntry]:
+        """
+        Entry named 'name' (the last one when the name is repeated, as 'zipfile' does), the index of names is
+        built on first call.
+        """
+        if self._by_name is None:
+            self._by_name = {entry.central_directory.file_name: entry for entry in self.entries}
+        entry = self._by_name.get(name)
+        if entry is None:
+            raise ValueError(f"There is no entry named '{name}' in '{self.path}'")
+        return entry
+
 
+    def open(self, name: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> EntryReader:
+        """
+        Streaming reader over the content of the entry named 'name', see 'reader.EntryReader'. The parsed
+        metadata is used as it is (lazy entries parse their LFH), so reading starts right at the body. The
+        archive is opened on first call and kept open until 'close' is called.
+        """
+        return EntryReader(self._get_source(), self.get_entry(name), chunk_size)
 
-    def compare(self, new: 'ParsedZip'):
-        self.eocd.compare(new.eocd)
+
+    def open_source(self) -> ByteSource:
+        """ Open a new source over the archive, using the same backend used to load it """
+        return open_source(self.path, self.backend)
+
+
+    def close(self):
+        if self._source is not None:
+            self._source.close()
+            self._source = None
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+    def diff(self, new: 'ParsedZip') -> ZipDiff:
+        """ Structural differences from this archive to 'new', see 'diff.diff_zips' """
+        return diff_zips(self, new)
+
+
+    def verify(
+            self, workers: int = None, executor: str = 'thread', fail_fast: bool = False,
+            chunk_size: int = DEFAULT_CHUNK_SIZE
+    ) -> VerificationReport:
+        """
+        Check that each body matches the CRC-32 and the sizes declared by its CD, LFH and DD, decompressing it
+        if needed (stored and deflated entries). The parsed metadata is reused, so only the bodies are read.
+        See 'verify.verify_entries' for the pool of workers and the 'fail_fast' mode, and 'compute_zip_hash' to
+        verify the bodies while hashing them, reading them once.
+        """
+        return verify_entries(
+            self.path, self.backend, self.entries, workers=workers, executor=executor, fail_fast=fail_fast,
+            chunk_size=chunk_size
+        )
+
+
+    def compare(self, new: 'ParsedZip') -> ZipDiff:
+        """ Print the differences from this archive to 'new' (see 'diff'), and return them """
         if len(self.entries) != len(new.entries):
             LOGGER.warning(
                 f"Mismatch between number of files inside the zips ({len(self.entries)} != {len(new.entries)})"
             )
-
-        for entry in self.entries:
-            name = entry.central_directory.file_name
-            iterator = iter(x for x in new.entries if x.central_directory.file_name == name)
-            correspondent = next(iterator, None)
-            if not correspondent:
-                LOGGER.warning(f"File '{name}' has not been found in the new zip")
-                continue
-
-            entry.central_directory.compare(correspondent.central_directory)
-            entry.local_file_header.compare(correspondent.local_file_header)
-            if entry.data_descriptor:
-                entry.data_descriptor.compare(correspondent.data_descriptor, filename=name)
-            if entry.body_offset != correspondent.body_offset:
-                print(f"diff 'body_offset': {entry.body_offset} != {correspondent.body_offset}")
-            if entry.body_compressed_size != correspondent.body_compressed_size:
-                print(f"diff 'body_compressed_size': {entry.body_compressed_size} != {correspondent.body_compressed_size}")
-
+        zip_diff = self.diff(new)
+        print(zip_diff)
+        return zip_diff
@@ -0,0 +1,94 @@
+import asyncio
+import threading
+import time
+import zipfile
+
+import pytest
+
+from src.ziphash.extract import acompute_zip_hash, compute_zip_hash
+from src.zipstruct.utils import sources, zipentry
+from src.zipstruct.utils.aio import AsyncExecutor
+from src.zipstruct.utils.zipentry import ParsedZip
+
+
+@pytest.fixture
+def archive(tmp_path):
+    path = tmp_path / "archive.zip"
+    with zipfile.ZipFile(path, 'w') as zf:
+        for i in range(20):
+            zf.writestr(f"file-{i}.txt", f"content {i}" * 10)
+    return str(path)
+
+
+async def load_many(path: str, executor: AsyncExecutor = None, amount: int = 64):
+    """ More archives than the executor limit, so that the calls wait on its semaphore """
+    return await asyncio.gather(*(ParsedZip.aload(path, executor=executor) for _ in range(amount)))
+
+
+async def hash_many(parsed: list, executor: AsyncExecutor):
+    return await asyncio.gather(*(acompute_zip_hash(pz, executor=executor) for pz in parsed))
+
+
+def test_default_executor_consecutive_loops(archive):
+    for _ in range(2):
+        parsed = asyncio.run(load_many(archive))
+        assert all(len(pz.entries) == 20 for pz in parsed)
+
+
+def test_shared_executor_consecutive_loops(archive):
+    executor = AsyncExecutor(max_workers=2, max_archives=2)
+    try:
+        for _ in range(2):
+            parsed = asyncio.run(load_many(archive, executor))
+            digests = asyncio.run(hash_many(parsed[:8], executor))
+            assert {digest for digest, _ in digests} == {compute_zip_hash(parsed[0])[0]}
+    finally:
+        executor.close()
+
+
+def test_sources_opened_off_the_loop(archive, monkeypatch):
+    threads = []
+
+    def open_source(*args, **kwargs):
+        threads.append(threading.current_thread())
+        return sources.open_source(*args, **kwargs)
+    monkeypatch.setattr(zipentry, "open_source", open_source)
+
+    async def load_and_hash():
+        pz = await ParsedZip.aload(archive)
+        for mode in ('linear', 'content'):
+            await acompute_zip_hash(pz, mode=mode)
+    asyncio.run(load_and_hash())
+
+    assert len(threads) == 3
+    assert threading.main_thread() not in threads
+
+
+class Resource:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def test_open_closes_result_when_cancelled():
+    executor = AsyncExecutor(max_workers=1)
+    resource, started = Resource(), threading.Event()
+
+    def slow_open():
+        started.set()
+        time.sleep(0.2)
+        return resource
+
+    async def cancel_while_opening():
+        task = asyncio.ensure_future(executor.open(slow_open))
+        await asyncio.get_running_loop().run_in_executor(None, started.wait)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+    try:
+        asyncio.run(cancel_while_opening())
+    finally:
+        executor.close()
+    assert resource.closed
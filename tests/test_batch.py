@@ -0,0 +1,68 @@
+import multiprocessing
+import os
+import signal
+import zipfile
+
+import pytest
+
+from src.ziphash import batch
+from src.ziphash.batch import BatchStats, hash_archive, hash_archives
+
+
+def test_failed_archive_reports_its_size(tmp_path):
+    path = tmp_path / "broken.zip"
+    path.write_bytes(b"not a zip archive" * 10)
+
+    result = hash_archive(str(path))
+    assert result.error is not None
+    assert result.digest is None
+    assert result.size == path.stat().st_size
+
+
+def hash_or_crash(path: str, *args, **kwargs):
+    """ Kill the worker process on the archives named 'crash', as a segmentation fault in a parser would """
+    if os.path.basename(path).startswith("crash"):
+        os.kill(os.getpid(), signal.SIGKILL)
+    return hash_archive(path, *args, **kwargs)
+
+
+@pytest.fixture
+def inputs(tmp_path):
+    paths = []
+    for i in range(6):
+        path = tmp_path / f"archive-{i}.zip"
+        with zipfile.ZipFile(path, 'w') as zf:
+            zf.writestr(f"file-{i}.txt", f"content {i}")
+        paths.append(str(path))
+    corrupt = tmp_path / "corrupt.zip"
+    corrupt.write_bytes(b"not a zip archive" * 10)
+    paths.insert(2, str(corrupt))
+    paths.insert(5, str(tmp_path / "missing.zip"))
+    return paths
+
+
+def test_failed_inputs_do_not_stop_the_run(inputs):
+    stats = BatchStats()
+    results = list(hash_archives(inputs, jobs=2, batch_size=3, stats=stats))
+
+    assert [result.path for result in results] == inputs
+    failed = {os.path.basename(result.path) for result in results if result.error is not None}
+    assert failed == {"corrupt.zip", "missing.zip"}
+    assert all(result.digest is not None for result in results if result.error is None)
+    assert stats.files == len(inputs) and stats.failed == 2
+
+
+@pytest.mark.skipif(multiprocessing.get_start_method() != 'fork', reason="workers must inherit the patched function")
+def test_crashed_worker_does_not_stop_the_run(inputs, tmp_path, monkeypatch):
+    crash = tmp_path / "crash.zip"
+    crash.write_bytes(open(inputs[0], 'rb').read())
+    inputs.insert(4, str(crash))
+    monkeypatch.setattr(batch, "hash_archive", hash_or_crash)
+
+    results = list(hash_archives(inputs, jobs=2, batch_size=3))
+    assert [result.path for result in results] == inputs
+    errors = {os.path.basename(result.path): result.error for result in results if result.error is not None}
+    assert set(errors) == {"corrupt.zip", "missing.zip", "crash.zip"}
+    assert errors["crash.zip"].startswith("BrokenProcessPool")
+    expected = [hash_archive(path).digest for path in inputs if path != str(crash)]
+    assert [result.digest for result in results if result.path != str(crash)] == expected
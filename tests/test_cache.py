@@ -0,0 +1,107 @@
+import os
+import sqlite3
+import zipfile
+
+import pytest
+
+from src.ziphash import cache as cache_module
+from src.ziphash.cache import DigestCache, compute_zip_hash_cached
+
+
+def write_zip(path, entries: int = 5, comment: bytes = b''):
+    with zipfile.ZipFile(path, 'w') as zf:
+        zf.comment = comment
+        for i in range(entries):
+            zf.writestr(zipfile.ZipInfo(f"file-{i}.txt", date_time=(2020, 1, 1, 0, 0, 0)), f"content {i}" * 10)
+    return str(path)
+
+
+def rewrite(path: str, **kwargs):
+    """ Rewrite the archive in place (same inode), keeping its modification time """
+    stat = os.stat(path)
+    write_zip(path, **kwargs)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    """ Arguments of each digest actually computed, i.e. of each cache miss """
+    calls = []
+    compute_zip_hash = cache_module.compute_zip_hash
+
+    def counting(pz, *args, **kwargs):
+        calls.append(kwargs)
+        return compute_zip_hash(pz, *args, **kwargs)
+    monkeypatch.setattr(cache_module, "compute_zip_hash", counting)
+    return calls
+
+
+@pytest.fixture
+def cache(tmp_path):
+    with DigestCache(str(tmp_path / "cache")) as cache:
+        yield cache
+
+
+def test_hit_and_miss(tmp_path, cache, calls):
+    path = write_zip(tmp_path / "archive.zip")
+    first = compute_zip_hash_cached(path, cache)
+    assert compute_zip_hash_cached(path, cache) == first
+    assert len(calls) == 1 and len(cache) == 1
+
+    compute_zip_hash_cached(path, cache, mode='tree')
+    compute_zip_hash_cached(path, cache, has_manifest=True)
+    assert len(calls) == 3 and len(cache) == 3
+
+
+@pytest.mark.parametrize("change", [
+    lambda path: os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1_000_000_000)),
+    lambda path: rewrite(path, entries=6),
+    lambda path: rewrite(path, comment=b'other'),
+], ids=['mtime', 'size', 'eocd'])
+def test_invalidation(tmp_path, cache, calls, change):
+    path = write_zip(tmp_path / "archive.zip", comment=b'first')
+    compute_zip_hash_cached(path, cache)
+    change(path)
+    compute_zip_hash_cached(path, cache)
+    assert len(calls) == 2
+
+
+def test_eocd_change_keeps_stat(tmp_path):
+    path = write_zip(tmp_path / "archive.zip", comment=b'first')
+    before = cache_module.file_identity(path)
+    rewrite(path, comment=b'other')
+    after = cache_module.file_identity(path)
+    assert before[:4] == after[:4]
+    assert before.eocd != after.eocd
+
+
+def test_validation_level_mismatch(tmp_path, cache, calls):
+    path = write_zip(tmp_path / "archive.zip")
+    digest, coverage = compute_zip_hash_cached(path, cache, validation='off')
+    assert coverage == {}
+
+    full_digest, full_coverage = compute_zip_hash_cached(path, cache, validation='full')
+    assert full_digest == digest
+    assert full_coverage
+    assert len(calls) == 2
+    assert compute_zip_hash_cached(path, cache) == (full_digest, full_coverage)
+    assert len(calls) == 2
+
+
+def test_invalidate(tmp_path, cache, calls):
+    path = write_zip(tmp_path / "archive.zip")
+    compute_zip_hash_cached(path, cache)
+    assert cache.invalidate(path) == 1
+    compute_zip_hash_cached(path, cache)
+    assert len(calls) == 2
+
+
+def test_outdated_schema_dropped(tmp_path):
+    directory = tmp_path / "cache"
+    directory.mkdir()
+    with sqlite3.connect(str(directory / cache_module.CACHE_FILE_NAME)) as connection:
+        connection.execute("CREATE TABLE digests (device INTEGER, digest TEXT)")
+    with DigestCache(str(directory)) as cache:
+        path = write_zip(tmp_path / "archive.zip")
+        compute_zip_hash_cached(path, cache)
+        assert len(cache) == 1
@@ -0,0 +1,66 @@
+import zipfile
+
+import pytest
+
+from src.zipstruct.centraldirs.parsing import (
+    parse_central_directories, parse_central_directories_bulk, parse_central_directory
+)
+from src.zipstruct.centraldirs.table import CentralDirectoryTable
+from src.zipstruct.utils.sources import open_source
+from src.zipstruct.utils.zipentry import ParsedZip
+
+
+@pytest.fixture
+def archive(tmp_path):
+    path = tmp_path / "archive.zip"
+    with zipfile.ZipFile(path, 'w') as zf:
+        for i in range(5):
+            zf.writestr(zipfile.ZipInfo(f"file-{i}.txt", date_time=(2020, 1, 1, 0, 0, 0)), f"content {i}")
+    return str(path)
+
+
+def corrupt_record(path: str, index: int) -> int:
+    """ Overwrite the signature of the central directory record at position 'index', return its offset """
+    offset = ParsedZip.load(path).entries[index].central_directory.interval.begin
+    with open(path, 'r+b') as f:
+        f.seek(offset)
+        f.write(b'XXXX')
+    return offset
+
+
+def error_of(func, *args) -> str:
+    with pytest.raises(ValueError) as info:
+        func(*args)
+    return str(info.value)
+
+
+def test_parsers_agree(archive):
+    pz = ParsedZip.load(archive)
+    offset, size = pz.eocd.central_dir_offset, pz.eocd.central_dir_size
+    with open_source(archive) as source:
+        single = parse_central_directories(source, offset)
+        bulk = parse_central_directories_bulk(source, offset, size)
+    assert [cd.raw for cd in single] == [cd.raw for cd in bulk]
+    assert sum(len(cd) for cd in bulk) == size
+
+
+@pytest.mark.parametrize("index", [0, 2, 4])
+def test_corrupted_record_raises_same_error(archive, index):
+    pz = ParsedZip.load(archive)
+    offset, size = pz.eocd.central_dir_offset, pz.eocd.central_dir_size
+    corrupted = corrupt_record(archive, index)
+
+    with open_source(archive) as source:
+        expected = error_of(parse_central_directory, source, corrupted)
+        assert error_of(parse_central_directories_bulk, source, offset, size) == expected
+        assert error_of(CentralDirectoryTable, bytes(source.read_at(offset, size)), offset) == expected
+    assert error_of(ParsedZip.load, archive) == expected
+
+
+def test_declared_size_too_large(archive):
+    pz = ParsedZip.load(archive)
+    offset, size = pz.eocd.central_dir_offset, pz.eocd.central_dir_size
+    # The first bytes of the EOCD are left after the last record, too few for another one
+    with open_source(archive) as source:
+        error = error_of(parse_central_directories_bulk, source, offset, size + 10)
+    assert error == "Incomplete CentralDirectory record, found 10 bytes but minimum is 46."
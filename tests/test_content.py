@@ -0,0 +1,93 @@
+import zipfile
+import zlib
+
+import pytest
+
+from src.ziphash.extract import compute_zip_hash
+from src.zipstruct.utils.content import ContentStream, DEFLATED, STORED
+from src.zipstruct.utils.sources import open_source
+from src.zipstruct.utils.zipentry import ParsedZip
+
+# Deflated to about 10 KB, a ratio of about 1000
+BOMB = b'\x00' * (10 * 1024 * 1024)
+
+
+def write_zip(path, contents: dict, compression: int = zipfile.ZIP_DEFLATED, reverse: bool = False) -> str:
+    with zipfile.ZipFile(path, 'w') as zf:
+        for name in sorted(contents, reverse=reverse):
+            info = zipfile.ZipInfo(name, date_time=(2020, 1, 1, 0, 0, 0))
+            info.compress_type = compression
+            zf.writestr(info, contents[name])
+    return str(path)
+
+
+@pytest.mark.parametrize("backend", ['file', 'mmap'])
+@pytest.mark.parametrize("chunk_size", [1024, 4096, 65536])
+def test_inflate_output_is_bounded(tmp_path, backend, chunk_size):
+    path = write_zip(tmp_path / "bomb.zip", {"bomb": BOMB})
+    entry = ParsedZip.load(path).entries[0]
+    assert entry.body_compressed_size * 500 < len(BOMB)
+
+    with open_source(path, backend) as source:
+        stream = ContentStream(source, entry.body_offset, entry.body_compressed_size, DEFLATED, bytearray(chunk_size))
+        largest, chunks = 0, 0
+        for chunk in stream:
+            largest, chunks = max(largest, len(chunk)), chunks + 1
+    assert largest <= chunk_size
+    assert chunks >= len(BOMB) // chunk_size
+    assert (stream.size, stream.read, stream.error) == (len(BOMB), entry.body_compressed_size, None)
+    assert stream.crc32 == zlib.crc32(BOMB)
+
+
+def test_fed_stream_is_bounded(tmp_path):
+    path = write_zip(tmp_path / "bomb.zip", {"bomb": BOMB})
+    entry = ParsedZip.load(path).entries[0]
+    with open(path, 'rb') as f:
+        f.seek(entry.body_offset)
+        body = f.read(entry.body_compressed_size)
+
+    stream = ContentStream(None, entry.body_offset, len(body), DEFLATED)
+    # The whole body at once still gives bounded chunks
+    sizes = [len(chunk) for chunk in stream.feed(body, 8192)] + [len(chunk) for chunk in stream.flush()]
+    assert max(sizes) <= 8192
+    assert sum(sizes) == len(BOMB) and stream.error is None
+
+
+def test_stored_and_invalid_streams(tmp_path):
+    path = write_zip(tmp_path / "archive.zip", {"a": b"stored content"}, zipfile.ZIP_STORED)
+    entry = ParsedZip.load(path).entries[0]
+    with open_source(path) as source:
+        stream = ContentStream(source, entry.body_offset, entry.body_compressed_size, STORED, bytearray(4))
+        assert [bytes(chunk) for chunk in stream] == [b"stor", b"ed c", b"onte", b"nt"]
+
+        # Stored bytes are not a valid deflate stream
+        stream = ContentStream(source, entry.body_offset, entry.body_compressed_size, DEFLATED)
+        with pytest.raises(zlib.error):
+            list(stream)
+
+        # Past the end of the file
+        stream = ContentStream(source, entry.body_offset, source.size, STORED)
+        list(stream)
+        assert stream.error.startswith("truncated body")
+
+    with pytest.raises(ValueError, match="Unsupported compression method"):
+        ContentStream(None, 0, 0, 12)
+
+
+def test_content_digest_ignores_compression_and_order(tmp_path):
+    contents = {f"file-{i}": f"content {i}\n".encode() * 100 for i in range(10)}
+    digest = compute_zip_hash(ParsedZip.load(write_zip(tmp_path / "a.zip", contents)), mode='content')[0]
+
+    stored = ParsedZip.load(write_zip(tmp_path / "b.zip", contents, zipfile.ZIP_STORED, reverse=True))
+    assert compute_zip_hash(stored, mode='content')[0] == digest
+    assert compute_zip_hash(stored)[0] != compute_zip_hash(ParsedZip.load(str(tmp_path / "a.zip")))[0]
+
+    contents["file-3"] = b"other"
+    changed = ParsedZip.load(write_zip(tmp_path / "c.zip", contents))
+    assert compute_zip_hash(changed, mode='content')[0] != digest
+
+
+def test_content_digest_of_unsupported_method(tmp_path):
+    pz = ParsedZip.load(write_zip(tmp_path / "a.zip", {"a": b"content"}, zipfile.ZIP_BZIP2))
+    with pytest.raises(ValueError):
+        compute_zip_hash(pz, mode='content')
@@ -0,0 +1,68 @@
+import asyncio
+import warnings
+import zipfile
+
+import pytest
+
+from src.ziphash.manifest import compute_digest_manifest, verify_digest_manifest
+from src.zipstruct.utils.zipentry import ParsedZip
+
+
+def write_zip(path, entries: list):
+    with warnings.catch_warnings():
+        # 'zipfile' warns about duplicated names
+        warnings.simplefilter("ignore", UserWarning)
+        with zipfile.ZipFile(path, 'w') as zf:
+            for name, content in entries:
+                zf.writestr(zipfile.ZipInfo(name, date_time=(2020, 1, 1, 0, 0, 0)), content)
+    return str(path)
+
+
+LOADERS = {
+    'eager'  : lambda path: ParsedZip.load(path),
+    'lazy'   : lambda path: ParsedZip.load(path, lazy=True),
+    'async'  : lambda path: asyncio.run(ParsedZip.aload(path)),
+    'recover': lambda path: ParsedZip.recover(path),
+}
+
+
+@pytest.mark.parametrize("loader", sorted(LOADERS))
+def test_duplicated_names_are_kept(tmp_path, loader):
+    path = write_zip(tmp_path / "dup.zip", [("x", b"first"), ("x", b"second"), ("y", b"other")])
+    pz = LOADERS[loader](path)
+
+    assert [entry.central_directory.file_name for entry in pz.entries] == ["x", "x", "y"]
+    offsets = [entry.body_offset for entry in pz.entries]
+    assert offsets == sorted(set(offsets))
+
+
+def test_diff_pairs_duplicates_by_occurrence(tmp_path):
+    old = ParsedZip.load(write_zip(tmp_path / "old.zip", [("x", b"first"), ("x", b"second"), ("y", b"other")]))
+    new = ParsedZip.load(write_zip(tmp_path / "new.zip", [("x", b"first"), ("y", b"other")]))
+
+    zip_diff = old.diff(new)
+    assert [(entry.name, entry.occurrence) for entry in zip_diff.removed] == [("x", 1)]
+    assert not zip_diff.added
+    assert new.diff(old).added[0].occurrence == 1
+
+
+def test_manifest_pairs_duplicates_by_occurrence(tmp_path):
+    entries = [("x", b"first"), ("x", b"second"), ("y", b"other")]
+    manifest = compute_digest_manifest(ParsedZip.load(write_zip(tmp_path / "old.zip", entries)))
+
+    same = verify_digest_manifest(ParsedZip.load(write_zip(tmp_path / "same.zip", entries)), manifest)
+    assert same.root_matches and not same.regions and not same.rehashed
+
+    # Same sizes, so only the CRC-32 and the body of the second 'x' differ
+    changed = [("x", b"first"), ("x", b"SECOND"), ("y", b"other")]
+    verification = verify_digest_manifest(ParsedZip.load(write_zip(tmp_path / "changed.zip", changed)), manifest)
+    assert not verification.root_matches
+    assert not verification.added and not verification.removed
+    second = ParsedZip.load(str(tmp_path / "changed.zip")).entries[1]
+    assert {region.region for region in verification.regions} >= {'CD', 'LFH', 'BODY'}
+    assert all(region.file_name == "x" for region in verification.regions)
+    assert all(region.begin >= second.local_file_header.interval.begin for region in verification.regions)
+
+    removed = [("x", b"first"), ("y", b"other")]
+    verification = verify_digest_manifest(ParsedZip.load(write_zip(tmp_path / "removed.zip", removed)), manifest)
+    assert verification.removed == ["x"] and not verification.added
@@ -0,0 +1,107 @@
+import zipfile
+
+import pytest
+
+from src.zipstruct.eocd.parsing import find_eocd, EOCD_SEARCH_GROWTH, EOCD_SIGNATURE
+from src.zipstruct.eocd.eocd import EOCD_MIN_LENGTH
+from src.zipstruct.utils.instrument import Instrumentation
+from src.zipstruct.utils.sources import open_source
+from src.zipstruct.utils.zipentry import ParsedZip
+
+
+def write_zip(path, comment: bytes = b'') -> str:
+    with zipfile.ZipFile(path, 'w') as zf:
+        zf.comment = comment
+        for i in range(3):
+            zf.writestr(zipfile.ZipInfo(f"file-{i}.txt", date_time=(2020, 1, 1, 0, 0, 0)), f"content {i}")
+    return str(path)
+
+
+def search(path: str, backend: str = 'file'):
+    """ Offset and bytes of the EOCD, and the stats of the reads done to find it """
+    instrument = Instrumentation()
+    with open_source(path, backend) as source:
+        offset, data = find_eocd(instrument.wrap(source))
+    return offset, data, instrument.summary()['other']
+
+
+def expected_offset(path: str, comment: bytes) -> int:
+    with open(path, 'rb') as f:
+        return len(f.read()) - EOCD_MIN_LENGTH - len(comment)
+
+
+@pytest.mark.parametrize("backend", ['file', 'mmap'])
+def test_without_comment_reads_only_the_eocd(tmp_path, backend):
+    path = write_zip(tmp_path / "archive.zip")
+    offset, data, stats = search(path, backend)
+    assert offset == expected_offset(path, b'')
+    assert len(data) == EOCD_MIN_LENGTH
+    assert (stats.reads, stats.bytes) == (1, EOCD_MIN_LENGTH)
+
+
+@pytest.mark.parametrize("position", [0, 10, 40])
+def test_fake_signature_in_comment(tmp_path, position):
+    # A signature followed by a plausible comment length and offsets, but not ending at the end of the file
+    comment = b'x' * position + EOCD_SIGNATURE + b'\x00' * 16 + b'\x05\x00' + b'y' * 30
+    path = write_zip(tmp_path / "archive.zip", comment)
+    offset, data, _ = search(path)
+    assert offset == expected_offset(path, comment)
+    assert data[EOCD_MIN_LENGTH:] == comment
+    assert ParsedZip.load(path).eocd.comment == comment.decode()
+
+
+def test_longest_comment(tmp_path):
+    comment = (EOCD_SIGNATURE + b'comment ') * (0xFFFF // 12) + b'x' * (0xFFFF % 12)
+    assert len(comment) == 0xFFFF
+    path = write_zip(tmp_path / "archive.zip", comment)
+    offset, data, stats = search(path)
+    assert offset == expected_offset(path, comment)
+    assert len(data) == EOCD_MIN_LENGTH + 0xFFFF
+    # Every byte of the tail is read once
+    assert stats.bytes <= EOCD_MIN_LENGTH + 0xFFFF
+    assert len(ParsedZip.load(path).entries) == 3
+
+
+def test_eocd_beyond_longest_comment(tmp_path):
+    # Junk after the comment: the EOCD cannot be found within the longest EOCD from the end of the file
+    path = write_zip(tmp_path / "archive.zip")
+    with open(path, 'ab') as f:
+        f.write(b'x' * 0x10000)
+    with pytest.raises(ValueError, match="not found"):
+        search(path)
+
+
+@pytest.mark.parametrize("data", [b'', b'PK', EOCD_SIGNATURE, EOCD_SIGNATURE + b'\x00' * 10, b'x' * 21])
+def test_shorter_than_eocd(tmp_path, data):
+    path = tmp_path / "short.zip"
+    path.write_bytes(data)
+    with pytest.raises(ValueError):
+        search(str(path))
+    with pytest.raises(ValueError):
+        ParsedZip.load(str(path))
+
+
+def window_boundaries(amount: int = 4):
+    length = EOCD_MIN_LENGTH
+    for _ in range(amount):
+        yield length
+        length *= EOCD_SEARCH_GROWTH
+
+
+@pytest.mark.parametrize("boundary", list(window_boundaries()))
+@pytest.mark.parametrize("inside", [1, 2, 3])
+def test_signature_straddling_window_boundary(tmp_path, boundary, inside):
+    # The EOCD starts 'inside' bytes before the beginning of a search window
+    comment = b'c' * (boundary + inside - EOCD_MIN_LENGTH)
+    path = write_zip(tmp_path / "archive.zip", comment)
+    offset, _, _ = search(path)
+    assert offset == expected_offset(path, comment)
+
+
+@pytest.mark.parametrize("boundary", list(window_boundaries())[1:])
+def test_fake_signature_straddling_window_boundary(tmp_path, boundary):
+    # A fake signature split by the beginning of a window is skipped, the real EOCD is further back
+    comment = b'c' * 200 + EOCD_SIGNATURE + b'c' * (boundary - 2 - EOCD_MIN_LENGTH)
+    path = write_zip(tmp_path / "archive.zip", comment)
+    offset, _, _ = search(path)
+    assert offset == expected_offset(path, comment)
@@ -0,0 +1,99 @@
+import zipfile
+
+import pytest
+
+from src.zipstruct.utils.zipentry import ParsedZip
+
+DATE = (2020, 1, 1, 0, 0, 0)
+
+
+def write_entries(zf: zipfile.ZipFile, entries: list):
+    for name, content in entries:
+        zf.writestr(zipfile.ZipInfo(name, date_time=DATE), content)
+
+
+def write_zip(path, entries: list):
+    with zipfile.ZipFile(path, 'w') as zf:
+        write_entries(zf, entries)
+    return str(path)
+
+
+def append_zip(path, entries: list):
+    with zipfile.ZipFile(path, 'a') as zf:
+        write_entries(zf, entries)
+
+
+ORIGINAL = [(f"file-{i}", f"content {i}".encode() * (i + 1)) for i in range(10)]
+
+
+def load(path: str, lazy: bool, previous: ParsedZip = None) -> ParsedZip:
+    pz = ParsedZip.load(path, lazy=lazy, previous=previous)
+    for entry in pz.entries:
+        entry.local_file_header
+    return pz
+
+
+def assert_same_entries(pz: ParsedZip, fresh: ParsedZip):
+    assert pz.diff(fresh).is_identical
+    for entry, expected in zip(pz.entries, fresh.entries):
+        assert bytes(entry.local_file_header.data) == bytes(expected.local_file_header.data)
+        assert entry.local_file_header.interval == expected.local_file_header.interval
+        assert entry.body_offset == expected.body_offset
+
+
+def reused(pz: ParsedZip, previous: ParsedZip) -> list:
+    old = {id(entry.local_file_header) for entry in previous.entries}
+    return [entry.central_directory.file_name for entry in pz.entries if id(entry.local_file_header) in old]
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_append_only(tmp_path, lazy):
+    path = write_zip(tmp_path / "archive.zip", ORIGINAL)
+    previous = load(path, lazy=False)
+    append_zip(path, [("manifest", b"appended")])
+
+    pz = load(path, lazy, previous)
+    assert_same_entries(pz, ParsedZip.load(path))
+    assert reused(pz, previous) == [name for name, _ in ORIGINAL]
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_entry_edited_in_place(tmp_path, lazy):
+    path = write_zip(tmp_path / "archive.zip", ORIGINAL)
+    previous = load(path, lazy=False)
+
+    # Change the modification time inside the LFH of a middle entry, its CD record is left untouched
+    offset = previous.entries[5].central_directory.relative_offset_of_local_header
+    with open(path, 'r+b') as f:
+        f.seek(offset + 10)
+        f.write(b'\x21\x43')
+    append_zip(path, [("manifest", b"appended")])
+
+    pz = load(path, lazy, previous)
+    assert_same_entries(pz, ParsedZip.load(path))
+    assert "file-5" not in reused(pz, previous)
+    assert len(reused(pz, previous)) == len(ORIGINAL) - 1
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_truncated_then_appended(tmp_path, lazy):
+    path = write_zip(tmp_path / "archive.zip", ORIGINAL)
+    previous = load(path, lazy=False)
+
+    # Same first entries, then other entries (same names, other contents) written at the old offsets
+    changed = ORIGINAL[:4] + [(name, content.upper() + b"!") for name, content in ORIGINAL[4:]]
+    write_zip(path, changed)
+
+    pz = load(path, lazy, previous)
+    assert_same_entries(pz, ParsedZip.load(path))
+    assert reused(pz, previous) == [name for name, _ in ORIGINAL[:4]]
+
+
+def test_shorter_file_reuses_nothing(tmp_path):
+    path = write_zip(tmp_path / "archive.zip", ORIGINAL)
+    previous = load(path, lazy=False)
+    write_zip(path, ORIGINAL[:2])
+
+    pz = load(path, False, previous)
+    assert_same_entries(pz, ParsedZip.load(path))
+    assert reused(pz, previous) == []
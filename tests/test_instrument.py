@@ -0,0 +1,126 @@
+import json
+import os
+
+import pytest
+
+from benchmarks.generator import ArchiveSpec, generate
+from src.ziphash.extract import compute_zip_hash
+from src.zipstruct.utils.instrument import Instrumentation, read_syscalls, HASH_PHASES, LOAD_PHASES
+from src.zipstruct.utils.sources import open_source
+from src.zipstruct.utils.zipentry import ParsedZip
+
+
+@pytest.fixture(scope='module')
+def archive(tmp_path_factory):
+    spec = ArchiveSpec(entries=50, compression='deflated', data_descriptor=True)
+    return generate(spec, str(tmp_path_factory.mktemp("archives")))
+
+
+def test_load_phases(archive):
+    occurrences = []
+    instrument = Instrumentation(callback=lambda name, stats: occurrences.append(name))
+    pz = ParsedZip.load(archive, instrument=instrument)
+
+    summary = instrument.summary()
+    assert set(summary) == set(LOAD_PHASES)
+    assert summary['dd'].calls == 50 and occurrences.count('dd') == 50
+    assert all(summary[name].calls == 1 for name in ('eocd', 'cd', 'lfh'))
+    # The central directory is read in bulk with a single read
+    assert summary['cd'].reads == 1 and summary['cd'].bytes == pz.eocd.central_dir_size
+    assert summary['dd'].bytes > 0
+    assert instrument.totals.calls == 53
+    assert all(stats.wall >= 0 and stats.cpu >= 0 for stats in summary.values())
+    assert "dd" in str(instrument)
+
+
+def test_hash_phases(archive):
+    pz = ParsedZip.load(archive)
+    instrument = Instrumentation()
+    compute_zip_hash(pz, instrument=instrument)
+
+    summary = instrument.summary()
+    assert set(summary) == set(HASH_PHASES)
+    assert summary['bodies'].bytes == sum(entry.body_compressed_size for entry in pz.entries)
+    # Metadata has already been parsed, it is not read again
+    assert summary['metadata'].reads == 0
+
+
+def test_nested_phases_are_exclusive(archive):
+    instrument = Instrumentation()
+    with open_source(archive) as f:
+        source = instrument.wrap(f)
+        source.read_at(0, 10)
+        with source.phase('outer'):
+            source.read_at(10, 10)
+            with source.phase('inner'):
+                source.read_at(100, 5)
+                source.read_at(105, 5)
+            with source.phase('inner'):
+                pass
+
+    summary = instrument.summary()
+    assert (summary['outer'].calls, summary['outer'].reads, summary['outer'].bytes) == (1, 1, 10)
+    assert (summary['inner'].calls, summary['inner'].reads, summary['inner'].bytes) == (2, 2, 10)
+    # The first read of 'inner' does not start where the previous one ended
+    assert summary['inner'].seeks == 1
+    assert summary['other'].reads == 1
+    assert summary['outer'].wall <= sum(stats.wall for stats in summary.values())
+
+
+@pytest.mark.skipif(read_syscalls() is None, reason="/proc/self/io is not available")
+def test_syscalls_are_measured(archive):
+    instrument = Instrumentation()
+    fd = os.open(archive, os.O_RDONLY)
+    try:
+        with instrument.phase('outer'):
+            for _ in range(2):
+                os.pread(fd, 10, 0)
+            with instrument.phase('inner'):
+                for _ in range(3):
+                    os.pread(fd, 10, 0)
+    finally:
+        os.close(fd)
+
+    summary = instrument.summary()
+    assert summary['outer'].syscalls == 2
+    assert summary['inner'].syscalls == 3
+    # Calls to the source are not system calls
+    assert summary['outer'].reads == summary['inner'].reads == 0
+
+
+@pytest.mark.skipif(read_syscalls() is None, reason="/proc/self/io is not available")
+def test_mmap_reads_need_no_syscalls(archive):
+    instrument = Instrumentation()
+    ParsedZip.load(archive, backend='mmap', instrument=instrument)
+    summary = instrument.summary()
+    assert summary['dd'].reads == 50
+    assert summary['dd'].syscalls == 0
+
+
+def test_chrome_trace(archive, tmp_path):
+    instrument = Instrumentation(trace=True)
+    pz = ParsedZip.load(archive, instrument=instrument)
+    compute_zip_hash(pz, instrument=instrument)
+
+    trace = instrument.to_chrome_trace()
+    events = trace["traceEvents"]
+    assert [event["name"] for event in events].count('dd') == 50
+    assert {event["name"] for event in events} == set(LOAD_PHASES) | set(HASH_PHASES)
+    assert all(event["ph"] == "X" and event["dur"] >= 0 and event["pid"] == os.getpid() for event in events)
+    assert set(events[0]["args"]) == {'calls', 'reads', 'seeks', 'bytes', 'syscalls', 'wall', 'cpu'}
+
+    # Nested occurrences are inside the one of their phase
+    lfh = next(event for event in events if event["name"] == 'lfh')
+    for event in (event for event in events if event["name"] == 'dd'):
+        assert lfh["ts"] <= event["ts"] and event["ts"] + event["dur"] <= lfh["ts"] + lfh["dur"]
+
+    path = tmp_path / "trace.json"
+    instrument.save_chrome_trace(str(path))
+    assert json.loads(path.read_text()) == json.loads(json.dumps(trace))
+
+
+def test_chrome_trace_not_recorded(archive):
+    instrument = Instrumentation()
+    ParsedZip.load(archive, instrument=instrument)
+    with pytest.raises(ValueError):
+        instrument.to_chrome_trace()
@@ -0,0 +1,38 @@
+import hashlib
+import zipfile
+
+from src.ziphash.extract import HASH_ALGORITHM
+from src.ziphash.manifest import compute_digest_manifest, verify_digest_manifest
+from src.zipstruct.utils.zipentry import ParsedZip
+
+
+def write_zip(path, contents: dict):
+    # Fixed timestamps, so that archives with the same contents are identical
+    with zipfile.ZipFile(path, 'w') as zf:
+        for name, content in contents.items():
+            zf.writestr(zipfile.ZipInfo(name, date_time=(2020, 1, 1, 0, 0, 0)), content)
+    return str(path)
+
+
+def test_leaf_is_digest_of_record_digests(tmp_path):
+    path = write_zip(tmp_path / "archive.zip", {f"file-{i}": b"x" * i for i in range(10)})
+    manifest = compute_digest_manifest(ParsedZip.load(path))
+
+    size = hashlib.new(HASH_ALGORITHM).digest_size
+    for entry in manifest.entries:
+        concatenation = bytes.fromhex(entry.central_directory + entry.local_file_header + entry.body)
+        assert entry.leaf == hashlib.new(HASH_ALGORITHM, concatenation).hexdigest()
+        assert len(bytes.fromhex(entry.leaf)) == size
+
+
+def test_verify_manifest(tmp_path):
+    contents = {f"file-{i}": b"x" * i for i in range(10)}
+    manifest = compute_digest_manifest(ParsedZip.load(write_zip(tmp_path / "old.zip", contents)))
+
+    same = verify_digest_manifest(ParsedZip.load(write_zip(tmp_path / "same.zip", contents)), manifest)
+    assert same.root_matches and not same.regions and not same.rehashed
+
+    contents["file-3"] = b"y" * 3
+    changed = verify_digest_manifest(ParsedZip.load(write_zip(tmp_path / "new.zip", contents)), manifest)
+    assert not changed.root_matches
+    assert {region.file_name for region in changed.regions} == {"file-3"}
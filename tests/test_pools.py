@@ -0,0 +1,37 @@
+import pytest
+
+from src.zipstruct.utils.pools import create_pool, split_in_batches
+
+
+def test_split_in_batches():
+    items = list(range(10))
+    sizes = [1, 1, 1, 1, 10, 1, 1, 1, 1, 1]
+    batches = split_in_batches(items, sizes, 4)
+    assert [item for batch in batches for item in batch] == items
+    assert len(batches) <= 4
+    assert split_in_batches([], [], 4) == []
+    assert split_in_batches(items, [0] * 10, 4) == [items]
+
+
+@pytest.mark.parametrize("sizes, amount", [
+    ([1, 1, 1], 2),
+    ([1, 1, 0], 2),
+    ([1] * 10, 3),
+    ([5, 0, 0, 0], 1),
+    ([3, 3, 3, 3, 3, 3, 3], 6),
+])
+def test_split_in_batches_at_most_amount(sizes, amount):
+    items = list(range(len(sizes)))
+    batches = split_in_batches(items, sizes, amount)
+    assert [item for batch in batches for item in batch] == items
+    assert 0 < len(batches) <= amount
+
+
+def test_split_in_batches_balanced():
+    assert split_in_batches(list(range(3)), [1, 1, 1], 2) == [[0, 1], [2]]
+    assert split_in_batches(list(range(6)), [1] * 6, 3) == [[0, 1], [2, 3], [4, 5]]
+
+
+def test_create_pool_unknown_executor():
+    with pytest.raises(ValueError):
+        create_pool('fiber', 2)
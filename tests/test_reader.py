@@ -0,0 +1,78 @@
+import random
+import zipfile
+
+import pytest
+
+from src.zipstruct.utils.zipentry import ParsedZip
+
+CONTENT = random.Random(0).randbytes(100_000)
+
+
+@pytest.fixture
+def archive(tmp_path):
+    path = tmp_path / "archive.zip"
+    with zipfile.ZipFile(path, 'w') as zf:
+        for name, compression in (("stored.bin", zipfile.ZIP_STORED), ("deflated.txt", zipfile.ZIP_DEFLATED)):
+            info = zipfile.ZipInfo(name, date_time=(2020, 1, 1, 0, 0, 0))
+            info.compress_type = compression
+            zf.writestr(info, CONTENT if compression == zipfile.ZIP_STORED else CONTENT.hex().encode())
+        zf.writestr(zipfile.ZipInfo("empty", date_time=(2020, 1, 1, 0, 0, 0)), b'')
+    return str(path)
+
+
+def test_stored_entry_of_mapping_is_zero_copy(archive):
+    pz = ParsedZip.load(archive, backend='mmap')
+    with pz.open("stored.bin", chunk_size=4096) as reader:
+        assert reader.zero_copy
+        chunks = list(reader)
+        source = pz._get_source()
+        assert all(isinstance(chunk, memoryview) and chunk.obj is source.mmap for chunk in chunks)
+        assert b''.join(chunks) == CONTENT
+        for chunk in chunks:
+            chunk.release()
+    pz.close()
+
+
+@pytest.mark.parametrize("backend, name", [('file', "stored.bin"), ('file', "deflated.txt"), ('mmap', "deflated.txt")])
+def test_other_entries_are_copied(archive, backend, name):
+    pz = ParsedZip.load(archive, backend=backend)
+    with pz.open(name, chunk_size=4096) as reader:
+        assert not reader.zero_copy
+        chunks = list(reader)
+    # The read buffer is reused by each chunk, so returned chunks must be copies of it
+    assert all(isinstance(chunk, bytes) for chunk in chunks)
+    assert b''.join(chunks) == (CONTENT if name == "stored.bin" else CONTENT.hex().encode())
+    pz.close()
+
+
+@pytest.mark.parametrize("backend", ['file', 'mmap'])
+def test_partial_reads(archive, backend):
+    with ParsedZip.load(archive, backend=backend) as pz:
+        with pz.open("stored.bin", chunk_size=1000) as reader:
+            first = reader.read(10)
+            second = reader.read(2000)
+            # Up to the requested size, chunks of the mapping are not bounded by 'chunk_size'
+            assert 0 < len(second) <= (2000 if backend == 'mmap' else 990)
+            assert reader.tell() == 10 + len(second)
+            rest = reader.read()
+            # Returned chunks stay valid while reading the next ones
+            assert bytes(first) + bytes(second) + bytes(rest) == CONTENT
+            del first, second, rest
+            assert reader.read(10) == b''
+            assert reader.tell() == len(CONTENT)
+        assert reader.closed
+        with pz.open("empty") as reader:
+            assert reader.read() == b''
+
+
+def test_corrupted_body_is_detected(archive):
+    with ParsedZip.load(archive) as pz:
+        offset = pz.get_entry("stored.bin").body_offset
+    with open(archive, 'r+b') as f:
+        f.seek(offset + 5000)
+        f.write(b'\x00' if CONTENT[5000] else b'\x01')
+
+    with ParsedZip.load(archive, backend='mmap') as pz:
+        with pz.open("stored.bin") as reader:
+            with pytest.raises(ValueError, match="does not match its central directory"):
+                reader.read()
@@ -0,0 +1,105 @@
+import zipfile
+
+import pytest
+
+from benchmarks.generator import ArchiveSpec, generate
+from src.ziphash.extract import compute_zip_hash
+from src.zipstruct.utils.zipentry import ParsedZip
+
+SPECS = {
+    'plain'   : ArchiveSpec(entries=30, compression='deflated', entry_comment=3),
+    'zip64'   : ArchiveSpec(entries=30, zip64=True),
+    'zip64-dd': ArchiveSpec(entries=30, zip64=True, data_descriptor=True, compression='deflated'),
+    'cp437-dd': ArchiveSpec(entries=30, encoding='cp437', data_descriptor=True),
+}
+
+
+@pytest.fixture(scope='module', params=sorted(SPECS))
+def archive(request, tmp_path_factory):
+    return request.param, generate(SPECS[request.param], str(tmp_path_factory.getbasetemp() / "archives"))
+
+
+def test_records_match_zipfile(archive):
+    name, path = archive
+    spec = SPECS[name]
+    pz = ParsedZip.load(path)
+    with zipfile.ZipFile(path) as zf:
+        infos = zf.infolist()
+
+    assert len(pz.entries) == len(infos) == spec.entries
+    for entry, info in zip(pz.entries, infos):
+        cd, lfh, dd = entry.central_directory, entry.local_file_header, entry.data_descriptor
+        assert cd.file_name == lfh.file_name == info.filename
+        assert cd.zip64 == lfh.zip64 == spec.zip64
+        assert cd.compressed_size == entry.body_compressed_size == info.compress_size
+        assert cd.uncompressed_size == info.file_size
+        assert cd.relative_offset_of_local_header == info.header_offset == lfh.interval.begin
+        assert int.from_bytes(cd.crc32, 'little') == info.CRC
+        assert entry.body_offset == lfh.interval.end
+        if spec.data_descriptor:
+            assert (dd.compressed_size, dd.uncompressed_size) == (info.compress_size, info.file_size)
+            assert dd.crc32 == cd.crc32
+            assert len(dd) == (24 if spec.zip64 else 16)
+            assert dd.interval.begin == entry.body_offset + entry.body_compressed_size
+        else:
+            assert dd is None
+            assert (lfh.compressed_size, lfh.uncompressed_size) == (info.compress_size, info.file_size)
+
+
+def test_zip64_end_of_central_directory(archive):
+    name, path = archive
+    eocd = ParsedZip.load(path).eocd
+    if not SPECS[name].zip64:
+        assert eocd.zip64 is None and eocd.zip64_locator is None
+        return
+
+    zip64, locator = eocd.zip64, eocd.zip64_locator
+    # Zip64 EOCD, its locator and the EOCD are contiguous, the central directory ends at the Zip64 EOCD
+    assert zip64.interval.end == locator.interval.begin
+    assert locator.interval.end == eocd.interval.begin
+    assert locator.offset_of_zip64_eocd == zip64.interval.begin
+    assert eocd.central_dir_offset + eocd.central_dir_size == zip64.interval.begin
+    assert zip64.total_entries_in_central_dir == SPECS[name].entries
+    # The EOCD only holds the placeholders, actual values are taken from the Zip64 record
+    assert eocd.size_of_central_dir == 0xFFFFFFFF
+    assert eocd.offset_of_start_of_central_directory == 0xFFFFFFFF
+
+
+def test_whole_file_is_covered(archive):
+    _, path = archive
+    pz = ParsedZip.load(path)
+    assert not pz.parsing_state.unknown_intervals
+    assert pz.verify().ok
+
+
+def test_digest_does_not_depend_on_the_loader(archive):
+    _, path = archive
+    digests = {
+        compute_zip_hash(ParsedZip.load(path, backend=backend, lazy=lazy, validation=validation))[0]
+        for backend in ('file', 'mmap') for lazy in (False, True) for validation in ('full', 'off')
+    }
+    assert len(digests) == 1
+
+
+def test_record_views_are_slotted(archive):
+    _, path = archive
+    entry = ParsedZip.load(path).entries[0]
+    records = [entry.central_directory, entry.local_file_header]
+    if entry.data_descriptor is not None:
+        records.append(entry.data_descriptor)
+
+    for record in records:
+        assert not hasattr(record, '__dict__')
+        with pytest.raises(AttributeError):
+            record.unknown = 1
+        assert len(record) == len(record.data) == record.interval.end - record.interval.begin
+
+        # The pydantic model has the same values of the view
+        model = record.to_model()
+        for field in type(model).model_fields:
+            if field not in ('raw', 'interval') and hasattr(record, field):
+                assert getattr(model, field) == getattr(record, field), field
+
+    again = ParsedZip.load(path).entries[0]
+    assert again.central_directory == entry.central_directory
+    assert hash(again.local_file_header) == hash(entry.local_file_header)
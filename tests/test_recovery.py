@@ -0,0 +1,71 @@
+import zipfile
+
+import pytest
+
+from src.ziphash.extract import compute_zip_hash
+from src.zipstruct.utils.zipentry import ParsedZip
+
+
+def write_zip(path, entries: int = 50):
+    with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+        for i in range(entries):
+            zf.writestr(f"dir/file-{i:03}.txt", f"content of file {i}\n" * (i + 1))
+    return path
+
+
+@pytest.fixture
+def truncated(tmp_path):
+    """ First half of a 50-entry archive, as left by an interrupted upload """
+    path = write_zip(tmp_path / "full.zip")
+    data = path.read_bytes()
+    truncated = tmp_path / "truncated.zip"
+    truncated.write_bytes(data[:len(data) // 2])
+    return path, truncated
+
+
+@pytest.mark.parametrize("backend", ['mmap', 'file'])
+def test_recover_truncated_archive(truncated, backend):
+    full, path = truncated
+    pz = ParsedZip.recover(str(path), backend=backend)
+
+    assert pz.recovered
+    assert 0 < len(pz.entries) < 50
+    assert not any(entry.confirmed for entry in pz.entries)
+    # Rebuilt records are laid out after the end of the file, the EOCD last
+    size = path.stat().st_size
+    assert all(entry.central_directory.interval.begin >= size for entry in pz.entries)
+    assert pz.eocd.interval.begin == pz.entries[-1].central_directory.interval.end
+    assert pz.eocd.total_entries_in_central_dir == len(pz.entries)
+    assert pz.verify().ok
+
+
+@pytest.mark.parametrize("validation", ['full', 'summary', 'off'])
+@pytest.mark.parametrize("mode", ['linear', 'tree', 'content'])
+def test_hash_recovered_archive(truncated, validation, mode):
+    _, path = truncated
+    pz = ParsedZip.recover(str(path), validation=validation)
+    digest, _ = compute_zip_hash(pz, mode=mode, validation=validation)
+    again, _ = compute_zip_hash(ParsedZip.recover(str(path), validation=validation), mode=mode,
+                                validation=validation)
+    assert digest == again
+
+
+def test_diff_recovered_archive(truncated):
+    full, path = truncated
+    recovered = ParsedZip.recover(str(path))
+    loaded = ParsedZip.load(str(full))
+
+    zip_diff = recovered.diff(loaded)
+    assert not zip_diff.is_identical
+    assert len(zip_diff.added) == 50 - len(recovered.entries)
+    assert str(zip_diff)
+    assert loaded.diff(recovered).to_json()
+
+
+def test_recover_intact_archive(tmp_path):
+    path = str(write_zip(tmp_path / "full.zip"))
+    recovered, loaded = ParsedZip.recover(path), ParsedZip.load(path)
+
+    assert all(entry.confirmed for entry in recovered.entries)
+    assert recovered.diff(loaded).is_identical
+    assert compute_zip_hash(recovered)[0] == compute_zip_hash(loaded)[0]
@@ -0,0 +1,182 @@
+import http.server
+import random
+import threading
+import zipfile
+
+import pytest
+
+from src.ziphash.extract import compute_zip_hash
+from src.zipstruct.utils.remote import HttpRangeSource, TAIL_LENGTH, coalesce_ranges
+from src.zipstruct.utils.zipentry import ParsedZip
+
+
+class RangeHandler(http.server.BaseHTTPRequestHandler):
+    """ Serve 'server.data' honouring single 'Range' requests, unless 'server.ignore_range' is set """
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        data = self.server.data
+        byte_range = self.headers.get('Range')
+        self.server.ranges.append(byte_range)
+        if self.server.ignore_range or byte_range is None:
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+
+        begin, end = byte_range[len('bytes='):].split('-')
+        if not begin:
+            begin, end = max(0, len(data) - int(end)), len(data) - 1
+        else:
+            begin, end = int(begin), min(int(end), len(data) - 1)
+        self.send_response(206)
+        self.send_header('Content-Range', f"bytes {begin}-{end}/{len(data)}")
+        self.send_header('Content-Length', str(end - begin + 1))
+        self.end_headers()
+        self.wfile.write(data[begin:end + 1])
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def serve():
+    """ Start a local server of the passed bytes, the URL of the file is set as 'server.url' """
+    servers = []
+
+    def serve(data: bytes, ignore_range: bool = False) -> http.server.ThreadingHTTPServer:
+        server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), RangeHandler)
+        server.daemon_threads = True
+        server.data, server.ranges, server.ignore_range = data, [], ignore_range
+        server.url = f"http://127.0.0.1:{server.server_address[1]}/archive.zip"
+        threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield serve
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def archive(tmp_path):
+    path = tmp_path / "archive.zip"
+    rng = random.Random(0)
+    with zipfile.ZipFile(path, 'w') as zf:
+        for i in range(200):
+            info = zipfile.ZipInfo(f"dir/file-{i:03}.txt", date_time=(2020, 1, 1, 0, 0, 0))
+            info.compress_type = zipfile.ZIP_DEFLATED if i % 2 else zipfile.ZIP_STORED
+            zf.writestr(info, rng.randbytes(rng.randint(0, 4096)))
+    return str(path)
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+@pytest.mark.parametrize("mode", ['linear', 'tree', 'content'])
+def test_digest_matches_local(serve, archive, mode, lazy):
+    server = serve(open(archive, 'rb').read())
+    remote = ParsedZip.load(server.url, backend='http', lazy=lazy)
+    local = ParsedZip.load(archive)
+
+    assert remote.diff(local).is_identical
+    assert compute_zip_hash(remote, mode=mode, workers=2)[0] == compute_zip_hash(local, mode=mode)[0]
+    assert remote.verify(workers=2).ok
+    with remote.open("dir/file-001.txt") as reader, local.open("dir/file-001.txt") as expected:
+        assert reader.read() == expected.read()
+    remote.close()
+
+
+def test_load_uses_few_requests(serve, archive):
+    server = serve(open(archive, 'rb').read())
+    ParsedZip.load(server.url, backend='http')
+    # Tail (EOCD and central directory), then the local file headers coalesced by 'prefetch'
+    assert server.ranges[0].startswith("bytes=-")
+    assert len(server.ranges) <= 3
+
+
+def test_suffix_range_tail_read(serve):
+    data = random.Random(1).randbytes(300_000)
+    server = serve(data)
+    source = HttpRangeSource(server.url, block_size=1024)
+
+    assert source.size == len(data)
+    assert server.ranges == [f"bytes=-{TAIL_LENGTH + 1024}"]
+    # The aligned blocks of the tail are cached, a partial block at its beginning is dropped
+    tail_begin = len(data) - TAIL_LENGTH - 1024
+    aligned = -(-tail_begin // 1024) * 1024
+    assert source.read_at(aligned, len(data) - aligned) == data[aligned:]
+    assert source.requests == 1
+    assert source.read_at(aligned - 10, 20) == data[aligned - 10:aligned + 10]
+    assert source.requests == 2
+    source.close()
+
+
+def test_suffix_range_of_small_file(serve):
+    server = serve(b"tiny file")
+    with HttpRangeSource(server.url) as source:
+        assert source.size == 9
+        assert source.read_at(0) == b"tiny file"
+        assert source.read_at(5, 100) == b"file"
+        assert source.read_at(20, 5) == b''
+        assert source.requests == 1
+
+
+def test_prefetch_coalesces_ranges(serve):
+    data = random.Random(2).randbytes(1_000_000)
+    server = serve(data)
+    source = HttpRangeSource(server.url, block_size=1000, max_gap=5000, max_request_size=100_000)
+    source.size
+    server.ranges.clear()
+
+    # Near ranges are fetched together (gaps included), far ones with another request
+    source.prefetch([(0, 10), (3000, 10), (7000, 10), (500_000, 10), (502_000, 10)])
+    assert server.ranges == ["bytes=0-7999", "bytes=500000-502999"]
+    # Cached blocks are not fetched again
+    source.prefetch([(0, 8000), (9000, 10)])
+    assert server.ranges[2:] == ["bytes=9000-9999"]
+    # A single read fetches its missing blocks with one request
+    assert source.read_at(0, 20_000) == data[:20_000]
+    assert server.ranges[3:] == ["bytes=8000-19999"]
+    # Requests are split once 'max_request_size' is reached
+    source.prefetch([(100_000, 250_000)])
+    assert len(server.ranges[4:]) == 3
+    source.close()
+
+
+def test_coalesce_ranges():
+    assert coalesce_ranges([(10, 20), (0, 5), (5, 5), (25, 30)], max_gap=5, max_length=100) == [(0, 30)]
+    assert coalesce_ranges([(0, 10), (20, 30)], max_gap=5, max_length=100) == [(0, 10), (20, 30)]
+    assert coalesce_ranges([(0, 10), (10, 20), (20, 30)], max_gap=0, max_length=20) == [(0, 20), (20, 30)]
+    assert coalesce_ranges([(0, 50)], max_gap=0, max_length=20) == [(0, 50)]
+
+
+def test_lru_block_cache(serve):
+    data = random.Random(3).randbytes(300_000)
+    server = serve(data)
+    source = HttpRangeSource(server.url, block_size=1024, cache_size=2 * 1024)
+    source.size
+    assert len(source.blocks) == 2
+
+    def read(block: int) -> int:
+        """ Read a few bytes of 'block', return the amount of requests sent """
+        before = source.requests
+        assert source.read_at(block * 1024 + 100, 10) == data[block * 1024 + 100:block * 1024 + 110]
+        return source.requests - before
+
+    assert read(0) == 1 and read(1) == 1
+    assert read(0) == 0
+    # Block 1 is the least recently used one
+    assert read(2) == 1
+    assert list(source.blocks) == [0, 2]
+    assert read(0) == 0 and read(1) == 1
+    assert list(source.blocks) == [0, 1]
+    source.close()
+
+
+def test_server_ignoring_range(serve, archive):
+    server = serve(open(archive, 'rb').read(), ignore_range=True)
+    with pytest.raises(ValueError, match="status 200"):
+        ParsedZip.load(server.url, backend='http')
+    with pytest.raises(ValueError, match="'Range' requests"):
+        HttpRangeSource(server.url).size
@@ -0,0 +1,137 @@
+import random
+import zipfile
+
+import pytest
+from intervaltree import Interval, IntervalTree
+
+from src.ziphash.extract import compute_zip_hash
+from src.zipstruct.utils.state import ReadCounter, ReadState, create_read_state
+from src.zipstruct.utils.zipentry import ParsedZip
+
+
+def random_intervals(rng: random.Random, amount: int, size: int):
+    for _ in range(amount):
+        begin = rng.randrange(size)
+        yield begin, min(size, begin + rng.randint(1, 50))
+
+
+def register_both(state: ReadState, tree: IntervalTree, begin: int, end: int, title: str):
+    """ Register the interval in both, checking that an overlap is detected as 'IntervalTree' does """
+    if tree.overlap(begin, end):
+        with pytest.raises(ValueError, match="overlapping"):
+            state.registeri(begin, end, title)
+    else:
+        state.registeri(begin, end, title)
+        tree.addi(begin, end, title)
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("order", ['random', 'increasing', 'decreasing'])
+def test_matches_interval_tree(seed, order):
+    rng = random.Random(seed)
+    size = 20_000
+    intervals = list(random_intervals(rng, 2000, size))
+    if order != 'random':
+        intervals.sort(reverse=order == 'decreasing')
+
+    state, tree = ReadState(size), IntervalTree()
+    for index, (begin, end) in enumerate(intervals):
+        register_both(state, tree, begin, end, f"interval {index}")
+
+    assert state.parsed_intervals == sorted(tree)
+    assert state.bytes_read == sum(interval.length() for interval in tree)
+    unknown = IntervalTree([Interval(0, size)])
+    for interval in tree:
+        unknown.chop(interval.begin, interval.end)
+    assert state.unknown_intervals == sorted(unknown)
+    # Runs are merged as they grow, so few of them are left
+    assert len(state._runs) <= len(tree).bit_length()
+
+    for begin, end in random_intervals(rng, 500, size):
+        assert state.overlapping(begin, end) == sorted(tree.overlap(begin, end))
+        enveloped = len(tree.envelop(begin, end))
+        if enveloped == 1:
+            state.raise_for_not_existing(begin, end)
+        else:
+            with pytest.raises(ValueError, match="does not exists" if enveloped == 0 else "envelops multiple"):
+                state.raise_for_not_existing(begin, end)
+
+
+def test_out_of_order_registration():
+    state = ReadState(100)
+    for begin in (50, 10, 80, 0, 30, 90):
+        state.registeri(begin, begin + 10, f"at {begin}")
+    assert [interval.begin for interval in state.parsed_intervals] == [0, 10, 30, 50, 80, 90]
+
+    for begin, end in ((45, 51), (0, 100), (19, 20), (85, 95)):
+        with pytest.raises(ValueError, match="overlapping"):
+            state.registeri(begin, end, "overlapping")
+    # Adjacent intervals do not overlap
+    state.registeri(20, 30, "between")
+    state.registeri(60, 80, "between")
+    assert state.unknown_intervals == [Interval(40, 50)]
+    assert state.bytes_read == 90
+
+
+def test_empty_and_negative_intervals():
+    state = ReadState(10)
+    state.registeri(5, 5, "empty")
+    state.registeri(0, 10, "whole")
+    state.registeri(5, 5, "empty inside")
+    state.raise_for_not_existing(3, 3)
+    with pytest.raises(ValueError, match="negative length"):
+        state.registeri(5, 4, "negative")
+    assert state.parsed_intervals == [Interval(0, 10, "whole")]
+
+
+def test_read_counter_does_not_check():
+    counter = create_read_state(100, 'summary')
+    assert isinstance(counter, ReadCounter)
+    counter.registeri(50, 60, "a")
+    counter.registeri(0, 10, "b")
+    counter.registeri(55, 65, "overlapping")
+    counter.raise_for_not_existing(0, 100)
+    assert counter.bytes_read == 30
+    assert counter.summary() == {"full_size": 100, "read_amount": "30/100", "read_rate": "30.00%"}
+
+    state = create_read_state(100, 'full')
+    state.registeri(50, 60, "a")
+    state.registeri(0, 10, "b")
+    assert state.summary()["read_amount"] == "20/100"
+    assert create_read_state(100, 'off') is None
+    with pytest.raises(ValueError):
+        create_read_state(100, 'partial')
+
+
+@pytest.fixture
+def archive(tmp_path):
+    path = tmp_path / "archive.zip"
+    with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+        for i in range(30):
+            zf.writestr(f"dir/file-{i:02}.txt", f"content of file {i}\n" * (i + 1))
+    return str(path)
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+@pytest.mark.parametrize("mode", ['linear', 'tree', 'content'])
+def test_validation_levels_same_digest(archive, lazy, mode):
+    results = {}
+    for validation in ('full', 'summary', 'off'):
+        pz = ParsedZip.load(archive, lazy=lazy, validation=validation)
+        assert pz.validation == validation
+        results[validation] = (pz.parsing_state, *compute_zip_hash(pz, mode=mode))
+
+    assert len({digest for _, digest, _ in results.values()}) == 1
+    assert isinstance(results['full'][0], ReadState) and isinstance(results['full'][2], ReadState)
+    assert isinstance(results['summary'][0], ReadCounter) and isinstance(results['summary'][2], ReadCounter)
+    assert results['off'][0] is None and results['off'][2] is None
+    # Both levels account for the same bytes, only the checks differ
+    assert results['full'][0].bytes_read == results['summary'][0].bytes_read
+    assert results['full'][2].bytes_read == results['summary'][2].bytes_read
+
+
+def test_hash_validation_overrides_load(archive):
+    pz = ParsedZip.load(archive, validation='off')
+    digest, state = compute_zip_hash(pz, validation='full')
+    assert isinstance(state, ReadState) and state.bytes_read > 0
+    assert digest == compute_zip_hash(pz)[0]
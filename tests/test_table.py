@@ -0,0 +1,56 @@
+import pytest
+
+from benchmarks.generator import ArchiveSpec, generate
+from src.ziphash.extract import compute_zip_hash
+from src.zipstruct.centraldirs.parsing import parse_central_directories
+from src.zipstruct.centraldirs.table import CentralDirectoryTable
+from src.zipstruct.utils.sources import open_source
+from src.zipstruct.utils.zipentry import ParsedZip
+
+
+SPECS = {
+    'utf-8'   : ArchiveSpec(entries=40, compression='deflated', data_descriptor=True, entry_comment=5),
+    'cp437'   : ArchiveSpec(entries=40, encoding='cp437'),
+    'zip64'   : ArchiveSpec(entries=40, zip64=True, data_descriptor=True),
+}
+
+
+@pytest.fixture(params=sorted(SPECS))
+def archive(request, tmp_path_factory):
+    return generate(SPECS[request.param], str(tmp_path_factory.getbasetemp() / "archives"))
+
+
+def column_value(cd, column: str) -> int:
+    """ Some fields of 'CentralDirectory' are kept as raw little-endian bytes """
+    value = getattr(cd, column)
+    return int.from_bytes(value, 'little') if isinstance(value, bytes) else value
+
+
+def test_columns_match_parsed_records(archive):
+    pz = ParsedZip.load(archive)
+    offset, size = pz.eocd.central_dir_offset, pz.eocd.central_dir_size
+    with open_source(archive) as source:
+        centraldirs = parse_central_directories(source, offset)
+        table = CentralDirectoryTable(bytes(source.read_at(offset, size)), start_offset=offset)
+
+    assert len(table) == len(centraldirs) == 40
+    for column in CentralDirectoryTable.COLUMNS:
+        assert list(getattr(table, column)) == [column_value(cd, column) for cd in centraldirs], column
+    assert table.names() == [cd.file_name for cd in centraldirs]
+    assert [table.raw_name(index) for index in range(len(table))] == [cd.raw.file_name for cd in centraldirs]
+    assert [cd.raw for cd in table] == [cd.raw for cd in centraldirs]
+    assert table.total_compressed_size() == sum(cd.compressed_size for cd in centraldirs)
+    # Names are sliced from the buffer, only the columns are stored on top of it
+    assert table.nbytes() < size + 64 * len(table)
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_load_with_table(archive, lazy):
+    loaded = ParsedZip.load(archive)
+    pz = ParsedZip.load(archive, lazy=lazy, table=True)
+
+    assert loaded.table is None
+    assert len(pz.table) == len(pz.entries)
+    assert sorted(pz.table.names()) == sorted(entry.central_directory.file_name for entry in pz.entries)
+    assert loaded.diff(pz).is_identical
+    assert compute_zip_hash(pz)[0] == compute_zip_hash(loaded)[0]
@@ -0,0 +1,84 @@
+import zipfile
+
+import pytest
+
+from src.ziphash.extract import compute_zip_hash
+from src.zipstruct.utils.instrument import Instrumentation
+from src.zipstruct.utils.verify import VerificationReport
+from src.zipstruct.utils.zipentry import ParsedZip
+
+
+def write_zip(path, compression: int = zipfile.ZIP_DEFLATED, entries: int = 10):
+    with zipfile.ZipFile(path, 'w') as zf:
+        for i in range(entries):
+            info = zipfile.ZipInfo(f"file-{i}.txt", date_time=(2020, 1, 1, 0, 0, 0))
+            info.compress_type = compression
+            zf.writestr(info, f"content {i}\n" * 50)
+    return str(path)
+
+
+def corrupt(path: str, name: str, delta: int = 0) -> str:
+    """ Flip a byte of the body of the entry 'name', 'delta' bytes after its beginning """
+    entry = ParsedZip.load(path).get_entry(name)
+    data = bytearray(open(path, 'rb').read())
+    data[entry.body_offset + delta] ^= 0xFF
+    with open(path, 'wb') as f:
+        f.write(data)
+    return path
+
+
+@pytest.mark.parametrize("executor", ['thread', 'process'])
+def test_valid_archive(tmp_path, executor):
+    report = ParsedZip.load(write_zip(tmp_path / "archive.zip")).verify(workers=2, executor=executor)
+    assert report.ok
+    assert report.summary() == {'ok': 10, 'failed': 0, 'skipped': 0}
+
+
+def test_crc_mismatch(tmp_path):
+    path = corrupt(write_zip(tmp_path / "archive.zip", zipfile.ZIP_STORED), "file-3.txt", delta=5)
+    report = ParsedZip.load(path).verify(workers=2)
+
+    assert not report.ok
+    assert [entry.name for entry in report.failed] == ["file-3.txt"]
+    errors = report.failed[0].errors
+    assert {error.split(" does not match the ")[1].split()[0] for error in errors} == {'CD', 'LFH'}
+    assert all(error.startswith("CRC-32") for error in errors)
+    assert "FAILED 'file-3.txt'" in str(report)
+
+
+def test_invalid_deflate_stream(tmp_path):
+    path = corrupt(write_zip(tmp_path / "archive.zip"), "file-7.txt")
+    report = ParsedZip.load(path).verify()
+    assert [entry.name for entry in report.failed] == ["file-7.txt"]
+
+
+def test_fail_fast(tmp_path):
+    path = corrupt(write_zip(tmp_path / "archive.zip", zipfile.ZIP_STORED), "file-3.txt")
+    with pytest.raises(ValueError, match="file-3.txt"):
+        ParsedZip.load(path).verify(workers=2, fail_fast=True)
+
+
+def test_unsupported_method_is_skipped(tmp_path):
+    report = ParsedZip.load(write_zip(tmp_path / "archive.zip", zipfile.ZIP_BZIP2)).verify()
+    assert report.ok
+    assert len(report.skipped) == 10
+    assert all("unsupported compression method 12" in entry.errors[0] for entry in report.skipped)
+
+
+@pytest.mark.parametrize("compression", [zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED, zipfile.ZIP_BZIP2])
+def test_verify_while_hashing(tmp_path, compression):
+    path = corrupt(write_zip(tmp_path / "archive.zip", compression), "file-3.txt", delta=5)
+    pz = ParsedZip.load(path)
+    instrument, report = Instrumentation(), VerificationReport()
+
+    digest, _ = compute_zip_hash(pz, instrument=instrument, report=report, chunk_size=64)
+    assert digest == compute_zip_hash(pz)[0]
+    assert report.entries == pz.verify().entries
+    # Bodies have been read once, by the hash
+    assert instrument.summary()['bodies'].bytes == sum(entry.body_compressed_size for entry in pz.entries)
+
+
+def test_verify_while_hashing_linear_only(tmp_path):
+    pz = ParsedZip.load(write_zip(tmp_path / "archive.zip"))
+    with pytest.raises(ValueError):
+        compute_zip_hash(pz, mode='tree', report=VerificationReport())